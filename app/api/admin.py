@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.auth import verify_admin_key
+from app.core.config import settings
+from app.core.database import database
+from app.core.query_profiler import query_profiler
+
+router = APIRouter()
+
+@router.get("/admin/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(default=None, ge=1, le=200, description="Entries per list (default SLOW_QUERY_REPORT_SIZE)"),
+    admin_key: str = Depends(verify_admin_key)
+):
+    """
+    Top-N query report of the worker that serves the request
+    Queries by total time (with their latest sampled EXPLAIN plan), the slowest
+    individual executions and pool acquire waits
+    """
+    if not settings.query_profiling_enabled:
+        raise HTTPException(status_code=404, detail="Query profiling is disabled (QUERY_PROFILING_ENABLED=false)")
+    
+    report = query_profiler.report(limit)
+    report["pool"]["shards"] = [
+        {"shard": shard, "size": pool.get_size(), "idle": pool.get_idle_size()}
+        for shard, pool in enumerate(database.pools)
+    ]
+    return report
+
+@router.delete("/admin/slow-queries", status_code=204)
+async def reset_slow_queries(admin_key: str = Depends(verify_admin_key)):
+    """Clear this worker's statistics, e.g. right after a schema or index change"""
+    query_profiler.reset()
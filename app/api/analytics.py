@@ -0,0 +1,94 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Depends
+
+from app.schemas.glucose import CohortAnalytics
+from app.core.auth import verify_admin_key, verify_jwt
+from app.core.redis_client import RedisUnavailableError, redis_client
+from redis.exceptions import RedisError
+from app.services.cohort import compute_cohort_analytics, get_latest_cohort_analytics
+
+router = APIRouter()
+
+PERIOD_DAYS = {"7d": 7, "30d": 30, "90d": 90}
+
+# A refresh holds a Redis lock so only one worker process computes a period at
+# a time; while Redis is unavailable, periods being refreshed by this process
+REFRESH_LOCK_KEY = "cohort_refresh:{period_days}"
+REFRESH_LOCK_TTL = 3600  # seconds; released early when the refresh finishes
+_refreshing = {}  # period_days -> whether the Redis lock is held
+
+async def _acquire_refresh(period_days: int) -> bool:
+    if period_days in _refreshing:
+        return False
+    locked = False
+    if redis_client.available:
+        try:
+            acquired = await redis_client.run(lambda client: client.set(
+                REFRESH_LOCK_KEY.format(period_days=period_days), "1", nx=True, ex=REFRESH_LOCK_TTL
+            ))
+            if not acquired:
+                return False
+            locked = True
+        except (RedisUnavailableError, RedisError) as e:
+            print(f"⚠️ Cohort refresh lock unavailable, locking per worker: {e}")
+    _refreshing[period_days] = locked
+    return True
+
+async def _release_refresh(period_days: int):
+    if _refreshing.pop(period_days, False):
+        await redis_client.run(lambda client: client.delete(REFRESH_LOCK_KEY.format(period_days=period_days)))
+
+def parse_period(period: str) -> int:
+    if period not in PERIOD_DAYS:
+        raise HTTPException(status_code=400, detail=f"Invalid period '{period}'. Use one of: {', '.join(PERIOD_DAYS)}")
+    return PERIOD_DAYS[period]
+
+async def _refresh(period_days: int):
+    try:
+        await compute_cohort_analytics(period_days)
+    except Exception as e:
+        print(f"Error computing cohort analytics: {e}")
+    finally:
+        try:
+            await _release_refresh(period_days)
+        except Exception as e:
+            print(f"⚠️ Error releasing cohort refresh lock: {e}")
+
+@router.get("/analytics/cohort", response_model=CohortAnalytics)
+async def get_cohort_analytics(
+    period: str = Query(default="30d", description="Time period (7d, 30d, 90d)"),
+    token: str = Depends(verify_jwt)
+):
+    """
+    Latest persisted population metrics (TIR distribution, hypo rates by
+    demographics, error rates by firmware). Never computed on the request path
+    """
+    period_days = parse_period(period)
+    try:
+        snapshot = await get_latest_cohort_analytics(period_days)
+    except Exception as e:
+        print(f"Error getting cohort analytics: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get cohort analytics: {str(e)}")
+    
+    if not snapshot:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No cohort analytics computed for {period} yet. POST /api/v1/analytics/cohort/refresh to start one."
+        )
+    return snapshot
+
+@router.post("/analytics/cohort/refresh", status_code=202)
+async def refresh_cohort_analytics(
+    background_tasks: BackgroundTasks,
+    period: str = Query(default="30d", description="Time period (7d, 30d, 90d)"),
+    admin_key: str = Depends(verify_admin_key)
+):
+    """
+    Start recomputing cohort analytics in the background
+    Scheduled runs should use: python -m app.tools.cohort_analytics
+    """
+    period_days = parse_period(period)
+    if not await _acquire_refresh(period_days):
+        return {"status": "already_running", "period": period}
+    
+    background_tasks.add_task(_refresh, period_days)
+    return {"status": "started", "period": period}
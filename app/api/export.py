@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timedelta
+
+from app.core.auth import verify_jwt
+from app.services.export import EXPORT_FORMATS, export_schema, parse_user_ids, stream_export, to_naive_utc
+
+router = APIRouter()
+
+# Upper bound on users per request; larger cohorts should use the export CLI
+MAX_EXPORT_USERS = 1000
+
+@router.get("/exports/readings")
+async def export_readings(
+    user_ids: str = Query(..., description="Comma-separated user IDs"),
+    start: datetime = Query(default=None, description="Start of range (inclusive, UTC). Defaults to 30 days before end"),
+    end: datetime = Query(default=None, description="End of range (exclusive, UTC). Defaults to now"),
+    format: str = Query(default="parquet", description="Export format (parquet, arrow)"),
+    chunk_size: int = Query(default=50000, ge=1000, le=500000, description="Rows per record batch"),
+    token: str = Depends(verify_jwt)
+):
+    """
+    Stream readings for a set of users as Parquet or an Arrow IPC stream
+    Sensor channels are flattened into columns; the result is never held in memory
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    
+    users = parse_user_ids(user_ids)
+    if not users:
+        raise HTTPException(status_code=400, detail="At least one user ID is required")
+    if len(users) > MAX_EXPORT_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_EXPORT_USERS} users per export request")
+    
+    # Timestamps are stored as naive UTC; offsets are converted, not dropped
+    end = to_naive_utc(end) if end else datetime.utcnow()
+    start = to_naive_utc(start) if start else end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    try:
+        export_schema()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    extension = "parquet" if format == "parquet" else "arrows"
+    filename = f"readings_{start:%Y%m%d}_{end:%Y%m%d}.{extension}"
+    return StreamingResponse(
+        stream_export(users, start, end, format, chunk_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
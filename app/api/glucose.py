@@ -1,14 +1,31 @@
-from fastapi import APIRouter, HTTPException, Path, Query, Depends
+from fastapi import APIRouter, HTTPException, Path, Query, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from redis.exceptions import RedisError
 from datetime import datetime, timedelta
+import asyncio
 import uuid
-from typing import List
+from typing import List, Optional
 import json
 import logging
+import msgpack
 
-from app.schemas.glucose import GlucoseReadingCreate, GlucoseReadingResponse, CurrentGlucoseReading, AnalyticsSummary
+from app.schemas.glucose import (
+    GlucoseReadingCreate, GlucoseReadingResponse, CurrentGlucoseReading, AnalyticsSummary,
+    PatientDashboardRequest, PatientSnapshot, GlucoseBatchResponse, RejectedReading
+)
+from app.schemas.compact import MSGPACK_CONTENT_TYPES, ReadingValidationError, decode_compact_reading
+from app.core.config import settings
 from app.core.database import database
-from app.core.redis_client import redis_client
+from app.core.redis_client import RedisUnavailableError, redis_client
 from app.core.auth import verify_api_key, verify_jwt
+from app.services.telemetry import telemetry
+from app.services.device_monitor import device_monitor
+from app.services.signal_processing import ProcessedReading, signal_processor
+from app.services.warmup import cache_warmer
+from app.services.read_cache import (
+    aligned_now, cache_analytics, data_versions, get_cached_analytics, not_modified, validators
+)
 
 router = APIRouter()
 
@@ -19,33 +36,118 @@ MEDICAL_THRESHOLDS = {
     "default": {"low": 70, "high": 180, "rapid_change": 4.0}
 }
 
-async def check_medical_alerts(reading: GlucoseReadingCreate, reading_id: str):
-    """Check for medical alerts and log them"""
+# Trend arrows by rate of change (mg/dL/min), CGM convention
+TREND_BANDS = [
+    (3.0, "rising_rapidly", "↑↑"),
+    (2.0, "rising", "↑"),
+    (1.0, "rising_slowly", "↗"),
+    (-1.0, "steady", "→"),
+    (-2.0, "falling_slowly", "↘"),
+    (-3.0, "falling", "↓"),
+]
+
+# Readings at least this confident and free of motion artifacts are trusted for
+# LOW/HIGH alerts as measured; the filter estimate lags real excursions
+TRUSTED_CONFIDENCE = 0.75
+
+# Readings further apart than this are not used for a trend
+TREND_MAX_GAP_MINUTES = 15
+
+# Largest number of buffered readings accepted in one batch request
+MAX_BATCH_READINGS = 500
+
+# Duplicates (same device and timestamp) are skipped; RETURNING lists only new rows
+BATCH_INSERT_QUERY = """
+    INSERT INTO glucose_readings (
+        user_id, device_id, timestamp, glucose_value,
+        confidence, sensor_data, battery_level, signal_quality
+    )
+    SELECT * FROM unnest(
+        $1::varchar[], $2::varchar[], $3::timestamp[], $4::integer[],
+        $5::numeric[], $6::jsonb[], $7::integer[], $8::varchar[]
+    )
+    ON CONFLICT (device_id, timestamp) DO NOTHING
+    RETURNING id, timestamp
+"""
+
+# Hot read queries, prepared on every pool connection at startup (cache_warmer)
+USER_EXISTS_QUERY = "SELECT 1 FROM users WHERE user_id = $1"
+DEVICE_OWNED_QUERY = "SELECT 1 FROM devices WHERE device_id = $1 AND user_id = $2"
+PREVIOUS_READING_QUERY = """
+    SELECT glucose_value, timestamp
+    FROM glucose_readings
+    WHERE user_id = $1 AND timestamp < $2
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
+# Uses idx_glucose_readings_user_timestamp
+CURRENT_READING_QUERY = """
+    SELECT id, user_id, device_id, timestamp, glucose_value,
+           confidence, sensor_data, battery_level, signal_quality, created_at
+    FROM glucose_readings
+    WHERE user_id = $1
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
+
+cache_warmer.add_statement(USER_EXISTS_QUERY, "")
+cache_warmer.add_statement(DEVICE_OWNED_QUERY, "", "")
+cache_warmer.add_statement(PREVIOUS_READING_QUERY, "", datetime(1970, 1, 1))
+cache_warmer.add_statement(CURRENT_READING_QUERY, "")
+
+def classify_trend(rate: float):
+    """Map a rate of change in mg/dL/min to a (trend, arrow) pair"""
+    for lower_bound, trend, arrow in TREND_BANDS:
+        if rate >= lower_bound:
+            return trend, arrow
+    return "falling_rapidly", "↓↓"
+
+async def check_medical_alerts(reading: GlucoseReadingCreate, reading_id: str, processed: Optional[ProcessedReading] = None):
+    """
+    Check for medical alerts and log them
+    Rapid change uses the calibrated/filtered signal. LOW/HIGH use the measured
+    value of trusted readings (LOW also fires on a lower filtered value) and the
+    filtered value only for low-confidence or motion-affected readings
+    """
     user_thresholds = MEDICAL_THRESHOLDS.get(reading.userId, MEDICAL_THRESHOLDS["default"])
+    low_value = high_value = reading.glucoseValue
+    if processed:
+        filtered_value = round(processed.filtered_value)
+        trusted = reading.confidence >= TRUSTED_CONFIDENCE and not reading.sensorData.motionArtifact
+        low_value = min(reading.glucoseValue, filtered_value) if trusted else filtered_value
+        high_value = reading.glucoseValue if trusted else filtered_value
+    
+    def raw_note(value: int) -> str:
+        return f" (raw {reading.glucoseValue} mg/dL)" if value != reading.glucoseValue else ""
     
     # Low glucose alert (Hypoglycemia)
-    if reading.glucoseValue < user_thresholds["low"]:
-        alert_msg = f"🚨 LOW GLUCOSE ALERT for {reading.userId}: {reading.glucoseValue} mg/dL (threshold: {user_thresholds['low']})"
+    if low_value < user_thresholds["low"]:
+        alert_msg = f"🚨 LOW GLUCOSE ALERT for {reading.userId}: {low_value} mg/dL{raw_note(low_value)} (threshold: {user_thresholds['low']})"
         logging.warning(alert_msg)
     
     # High glucose alert (Hyperglycemia)
-    elif reading.glucoseValue > user_thresholds["high"]:
-        alert_msg = f"🚨 HIGH GLUCOSE ALERT for {reading.userId}: {reading.glucoseValue} mg/dL (threshold: {user_thresholds['high']})"
+    elif high_value > user_thresholds["high"]:
+        alert_msg = f"🚨 HIGH GLUCOSE ALERT for {reading.userId}: {high_value} mg/dL{raw_note(high_value)} (threshold: {user_thresholds['high']})"
         logging.warning(alert_msg)
     
-    # Check for rapid change
+    # Check for rapid change on the filtered signal when the filter has history
+    if processed and processed.rate_of_change is not None:
+        time_diff = (reading.timestamp - processed.previous_timestamp).total_seconds() / 60  # minutes
+        glucose_diff = abs(processed.filtered_value - processed.previous_value)
+        change_rate = abs(processed.rate_of_change)  # mg/dL per minute
+        
+        if change_rate >= user_thresholds["rapid_change"]:
+            alert_msg = f"🚨 RAPID GLUCOSE CHANGE ALERT for {reading.userId}: filtered change of {glucose_diff:.0f} mg/dL over {time_diff:.1f} minutes ({change_rate:.1f} mg/dL/min > {user_thresholds['rapid_change']} threshold)"
+            logging.warning(alert_msg)
+        _log_low_quality(reading)
+        return
+    
+    # Otherwise compare against the previous stored reading
     try:
-        async with database.pool.acquire() as connection:
+        async with database.pool_for(reading.userId).acquire() as connection:
             # Get the most recent reading before this one
             previous_reading = await connection.fetchrow(
-                """
-                SELECT glucose_value, timestamp 
-                FROM glucose_readings 
-                WHERE user_id = $1 AND timestamp < $2 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-                """,
-                reading.userId, reading.timestamp
+                PREVIOUS_READING_QUERY, reading.userId, reading.timestamp
             )
             
             if previous_reading:
@@ -59,22 +161,178 @@ async def check_medical_alerts(reading: GlucoseReadingCreate, reading_id: str):
     except Exception as e:
         print(f"⚠️ Error checking rapid change alerts: {e}")
 
-    # Low quality reading audit log
+    _log_low_quality(reading)
+
+def _log_low_quality(reading: GlucoseReadingCreate):
+    """Low quality reading audit log"""
     if reading.confidence < 0.75 or reading.signalQuality in ["poor", "fair"]:
         audit_msg = f"📝 Low quality reading received for {reading.userId}: confidence={reading.confidence}, signal={reading.signalQuality}"
         logging.info(audit_msg)
 
-@router.post("/devices/{device_id}/readings", response_model=GlucoseReadingResponse, status_code=201)
+def _validation_errors(error: ValidationError, loc: tuple) -> List[dict]:
+    """Pydantic errors in the 422 detail shape, prefixed with the location of the reading"""
+    return [
+        {"type": e["type"], "loc": list(loc + tuple(e["loc"])), "msg": e["msg"]}
+        for e in error.errors(include_url=False)
+    ]
+
+async def _decode_body(request: Request):
+    """
+    Parse a JSON or MessagePack request body
+    Returns (payload, compact) where compact means the positional MessagePack format
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in MSGPACK_CONTENT_TYPES:
+        try:
+            return msgpack.unpackb(body), True
+        except Exception as e:
+            raise RequestValidationError([{"type": "value_error", "loc": ["body"], "msg": f"Invalid MessagePack body: {str(e) or type(e).__name__}"}])
+    try:
+        return json.loads(body), False
+    except ValueError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ["body"], "msg": f"Invalid JSON body: {e}"}])
+
+def _validate_reading(item, compact: bool, loc: tuple) -> GlucoseReadingCreate:
+    """Validate one reading with the compact fast path or the Pydantic model"""
+    if compact:
+        return decode_compact_reading(item, loc)
+    try:
+        return GlucoseReadingCreate.model_validate(item)
+    except ValidationError as e:
+        raise ReadingValidationError(_validation_errors(e, loc))
+
+def _inline_schema(model) -> dict:
+    """JSON schema of a model with $defs references resolved (for openapi_extra)"""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+    
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"].split("/")[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+    
+    return resolve(schema)
+
+def _reading_request_body(batch: bool) -> dict:
+    """OpenAPI request body for endpoints that accept JSON or compact MessagePack readings"""
+    json_schema = _inline_schema(GlucoseReadingCreate)
+    if batch:
+        json_schema = {"type": "array", "items": json_schema, "maxItems": MAX_BATCH_READINGS}
+    compact_layout = "[deviceId, userId, epochSeconds, glucoseValue, confidencePermille, [red, infrared, green, temperature, motionArtifact], batteryLevel, signalQualityCode]"
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": json_schema},
+                "application/msgpack": {
+                    "schema": {"type": "string", "format": "binary"},
+                    "description": f"MessagePack {'array of readings' if batch else 'reading'}, each {compact_layout}; signalQualityCode 0=excellent 1=good 2=fair 3=poor",
+                },
+            },
+        }
+    }
+
+async def _verify_device_owner(connection, user_id: str, device_id: str):
+    """Foreign key validation: the user exists and owns the device"""
+    # Check if user exists
+    user_exists = await connection.fetchval(USER_EXISTS_QUERY, user_id)
+    if not user_exists:
+        raise HTTPException(
+            status_code=400,
+            detail=f"User {user_id} does not exist. Please ensure user is registered."
+        )
+    
+    # Check if device exists and belongs to user
+    device_exists = await connection.fetchval(DEVICE_OWNED_QUERY, device_id, user_id)
+    if not device_exists:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Device {device_id} does not exist or does not belong to user {user_id}"
+        )
+    # Requests that only name the device are routed to its owner's shard
+    database.device_owners[device_id] = user_id
+
+async def _check_rate_limit(device_id: str):
+    """Allow one submission per device every MAX_GLUCOSE_READING_RATE seconds"""
+    rate_limit_key = f"rate_limit:{device_id}"
+    
+    # One round trip: the key is only created if the device has no open window
+    try:
+        window_opened = await redis_client.run(
+            lambda client: client.set(rate_limit_key, "1", nx=True, ex=settings.max_glucose_reading_rate)
+        )
+    except RedisUnavailableError:
+        # Circuit open: ingest keeps working without rate limiting (see /health)
+        return
+    except RedisError as e:
+        print(f"⚠️ Warning: Redis not available for rate limiting: {e}")
+        return
+    
+    if not window_opened:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded. Device {device_id} can only submit one reading every {settings.max_glucose_reading_rate} seconds."
+        )
+
+def _sensor_data_json(reading: GlucoseReadingCreate) -> str:
+    return json.dumps({
+        "red": reading.sensorData.red,
+        "infrared": reading.sensorData.infrared,
+        "green": reading.sensorData.green,
+        "temperature": reading.sensorData.temperature,
+        "motionArtifact": reading.sensorData.motionArtifact
+    })
+
+async def _after_insert(reading: GlucoseReadingCreate, reading_id: str, track_device: bool = True):
+    """Telemetry, signal processing and medical alerting for a stored reading"""
+    # Device liveness and battery are flushed to devices/device_battery_info in batches
+    telemetry.observe(reading.deviceId, reading.timestamp, reading.batteryLevel)
+    
+    # Offline / low battery tracking (Redis sorted sets, swept in the background)
+    if track_device:
+        try:
+            await device_monitor.record_reading(reading.deviceId, reading.batteryLevel)
+        except Exception as e:
+            print(f"⚠️ Error updating device monitor: {e}")
+    
+    # Calibrate and smooth before alerting; the raw reading is what was stored
+    processed = None
+    try:
+        processed = await signal_processor.process(reading)
+    except Exception as e:
+        print(f"⚠️ Error processing signal, alerting on raw value: {e}")
+    
+    # Medical alerting - Real-time alerts for critical glucose values
+    await check_medical_alerts(reading, reading_id, processed)
+
+@router.post(
+    "/devices/{device_id}/readings",
+    response_model=GlucoseReadingResponse,
+    status_code=201,
+    openapi_extra=_reading_request_body(batch=False)
+)
 async def create_glucose_reading(
+    request: Request,
     device_id: str = Path(..., description="Device ID"),
-    reading: GlucoseReadingCreate = None,
     api_key: str = Depends(verify_api_key)
 ):
     """
     Submit a glucose reading from an ARGUS device
-    Includes rate limiting (30 seconds between readings per device)
+    Accepts JSON or compact positional MessagePack (Content-Type: application/msgpack)
+    Includes rate limiting (MAX_GLUCOSE_READING_RATE seconds between readings per device, default 30)
     Validates foreign key constraints for users and devices
     """
+    payload, compact = await _decode_body(request)
+    try:
+        reading = _validate_reading(payload, compact, ("body",))
+    except ReadingValidationError as e:
+        raise RequestValidationError(e.errors)
+    
     try:
         # Validate device_id matches the one in the request body
         if reading.deviceId != device_id:
@@ -83,56 +341,15 @@ async def create_glucose_reading(
                 detail="Device ID in URL must match deviceId in request body"
             )
         
+        # Everything about the user lives on the shard that owns it
+        pool = database.pool_for(reading.userId)
+        
         # Check if user and device exist (foreign key validation)
-        async with database.pool.acquire() as connection:
-            # Check if user exists
-            user_exists = await connection.fetchval(
-                "SELECT 1 FROM users WHERE user_id = $1", 
-                reading.userId
-            )
-            if not user_exists:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"User {reading.userId} does not exist. Please ensure user is registered."
-                )
-            
-            # Check if device exists and belongs to user
-            device_exists = await connection.fetchval(
-                "SELECT 1 FROM devices WHERE device_id = $1 AND user_id = $2", 
-                reading.deviceId, reading.userId
-            )
-            if not device_exists:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Device {reading.deviceId} does not exist or does not belong to user {reading.userId}"
-                )
+        async with pool.acquire() as connection:
+            await _verify_device_owner(connection, reading.userId, reading.deviceId)
         
         # Rate limiting check using Redis
-        rate_limit_key = f"rate_limit:{device_id}"
-        
-        # Check if device has submitted a reading recently
-        if redis_client.client:
-            existing_limit = await redis_client.client.get(rate_limit_key)
-            if existing_limit:
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Rate limit exceeded. Device {device_id} can only submit one reading every 30 seconds."
-                )
-        
-            # Set rate limit for 30 seconds
-            await redis_client.client.setex(rate_limit_key, 30, "1")
-        else:
-            # If Redis is not available, log warning but continue
-            print("⚠️ Warning: Redis not available for rate limiting")
-        
-        # Prepare sensor data JSON
-        sensor_data_json = {
-            "red": reading.sensorData.red,
-            "infrared": reading.sensorData.infrared,
-            "green": reading.sensorData.green,
-            "temperature": reading.sensorData.temperature,
-            "motionArtifact": reading.sensorData.motionArtifact
-        }
+        await _check_rate_limit(device_id)
         
         # Insert into database using optimized query
         insert_query = """
@@ -144,7 +361,7 @@ async def create_glucose_reading(
         """
         
         # Timestamp is already converted to naive by the validator
-        async with database.pool.acquire() as connection:
+        async with pool.acquire() as connection:
             result = await connection.fetchval(
                 insert_query,
                 reading.userId,
@@ -152,14 +369,15 @@ async def create_glucose_reading(
                 reading.timestamp,  # Already naive from validator
                 reading.glucoseValue,
                 reading.confidence,
-                json.dumps(sensor_data_json),
+                _sensor_data_json(reading),
                 reading.batteryLevel,
                 reading.signalQuality.value  # Use .value for Enum
             )
             reading_id = str(result)
         
-        # Medical alerting - Real-time alerts for critical glucose values
-        await check_medical_alerts(reading, reading_id)
+        # Invalidate ETags and cached analytics of the user
+        await data_versions.bump([reading.userId])
+        await _after_insert(reading, reading_id)
         
         return GlucoseReadingResponse(
             status="processed",
@@ -184,6 +402,98 @@ async def create_glucose_reading(
         
         raise HTTPException(status_code=500, detail=f"Failed to save glucose reading: {str(e)}")
 
+@router.post(
+    "/devices/{device_id}/readings/batch",
+    response_model=GlucoseBatchResponse,
+    status_code=201,
+    openapi_extra=_reading_request_body(batch=True)
+)
+async def create_glucose_readings_batch(
+    request: Request,
+    device_id: str = Path(..., description="Device ID"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Submit up to MAX_BATCH_READINGS buffered readings from one device in a single request
+    Accepts a JSON array or a MessagePack array of compact positional readings
+    Invalid readings are reported per index and the valid ones are stored;
+    readings already stored (same device and timestamp) are counted as duplicates.
+    The rate limit applies once per batch.
+    """
+    payload, compact = await _decode_body(request)
+    if not isinstance(payload, list):
+        raise RequestValidationError([{"type": "list_type", "loc": ["body"], "msg": "Batch body should be an array of readings"}])
+    if not 1 <= len(payload) <= MAX_BATCH_READINGS:
+        raise RequestValidationError([{
+            "type": "too_long" if payload else "too_short", "loc": ["body"],
+            "msg": f"Batch should contain between 1 and {MAX_BATCH_READINGS} readings"
+        }])
+    
+    readings = []
+    rejected = []
+    for index, item in enumerate(payload):
+        try:
+            reading = _validate_reading(item, compact, ("body", index))
+        except ReadingValidationError as e:
+            rejected.append(RejectedReading(index=index, errors=e.errors))
+            continue
+        if reading.deviceId != device_id:
+            rejected.append(RejectedReading(index=index, errors=[{
+                "type": "value_error", "loc": ["body", index, "deviceId"],
+                "msg": "Device ID in URL must match deviceId in request body"
+            }]))
+            continue
+        readings.append(reading)
+    
+    if not readings:
+        raise RequestValidationError([error for item in rejected for error in item.errors])
+    
+    try:
+        # A device belongs to one user, so one foreign key check covers the batch
+        for user_id in dict.fromkeys(reading.userId for reading in readings):
+            async with database.pool_for(user_id).acquire() as connection:
+                await _verify_device_owner(connection, user_id, device_id)
+        
+        await _check_rate_limit(device_id)
+        
+        # All readings passed the owner check, so they share one user and shard
+        async with database.pool_for(readings[0].userId).acquire() as connection:
+            rows = await connection.fetch(
+                BATCH_INSERT_QUERY,
+                [r.userId for r in readings],
+                [r.deviceId for r in readings],
+                [r.timestamp for r in readings],
+                [r.glucoseValue for r in readings],
+                [r.confidence for r in readings],
+                [_sensor_data_json(r) for r in readings],
+                [r.batteryLevel for r in readings],
+                [r.signalQuality.value for r in readings]
+            )
+        
+        if rows:
+            await data_versions.bump(reading.userId for reading in readings)
+        
+        # Process in time order so the filter and trends see readings as they happened
+        by_timestamp = {reading.timestamp: reading for reading in readings}
+        inserted = sorted(rows, key=lambda row: row['timestamp'])
+        for position, row in enumerate(inserted):
+            await _after_insert(by_timestamp[row['timestamp']], str(row['id']),
+                                track_device=position == len(inserted) - 1)
+        
+        return GlucoseBatchResponse(
+            status="processed" if not rejected and len(inserted) == len(readings) else "partial",
+            accepted=len(inserted),
+            duplicates=len(readings) - len(inserted),
+            ids=[str(row['id']) for row in rows],
+            rejected=rejected
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error saving glucose reading batch: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to save glucose reading batch: {str(e)}")
+
 @router.get("/devices/{device_id}/readings", response_model=List[CurrentGlucoseReading])
 async def get_device_readings(
     device_id: str = Path(..., description="Device ID"),
@@ -196,6 +506,11 @@ async def get_device_readings(
     Uses optimized index: idx_glucose_readings_device_timestamp
     """
     try:
+        # The device's readings live on its owner's shard
+        shard = await database.shard_for_device(device_id)
+        if shard is None:
+            return []
+        
         # Query optimized to use idx_glucose_readings_device_timestamp index
         query = """
             SELECT id, user_id, device_id, timestamp, glucose_value, 
@@ -206,33 +521,41 @@ async def get_device_readings(
             LIMIT $2 OFFSET $3
         """
         
-        async with database.pool.acquire() as connection:
+        async with database.pools[shard].acquire() as connection:
             rows = await connection.fetch(query, device_id, limit, offset)
+            # No device row here: the cached owner is stale (device reassigned or user moved)
+            stale = not rows and database.shard_count > 1 and not await connection.fetchval(
+                "SELECT 1 FROM devices WHERE device_id = $1", device_id
+            )
+        if stale:
+            moved_to = await database.refresh_device_shard(device_id, shard)
+            if moved_to is not None:
+                async with database.pools[moved_to].acquire() as connection:
+                    rows = await connection.fetch(query, device_id, limit, offset)
+        if not rows:
+            # Return empty array if no readings found
+            return []
+        
+        # Convert the rows to our response model
+        readings = []
+        for row in rows:
+            sensor_data = json.loads(row['sensor_data']) if row['sensor_data'] else {}
             
-            if not rows:
-                # Return empty array if no readings found
-                return []
-            
-            # Convert the rows to our response model
-            readings = []
-            for row in rows:
-                sensor_data = json.loads(row['sensor_data']) if row['sensor_data'] else {}
-                
-                reading = CurrentGlucoseReading(
-                    id=str(row['id']),
-                    userId=row['user_id'],
-                    deviceId=row['device_id'],
-                    timestamp=row['timestamp'],
-                    glucoseValue=row['glucose_value'],
-                    confidence=float(row['confidence']),
-                    sensorData=sensor_data,
-                    batteryLevel=row['battery_level'],
-                    signalQuality=row['signal_quality'],
-                    createdAt=row['created_at']
-                )
-                readings.append(reading)
-            
-            return readings
+            reading = CurrentGlucoseReading(
+                id=str(row['id']),
+                userId=row['user_id'],
+                deviceId=row['device_id'],
+                timestamp=row['timestamp'],
+                glucoseValue=row['glucose_value'],
+                confidence=float(row['confidence']),
+                sensorData=sensor_data,
+                batteryLevel=row['battery_level'],
+                signalQuality=row['signal_quality'],
+                createdAt=row['created_at']
+            )
+            readings.append(reading)
+        
+        return readings
             
     except Exception as e:
         print(f"Error getting device readings: {e}")
@@ -248,18 +571,8 @@ async def get_current_glucose(
     Uses optimized index: idx_glucose_readings_user_timestamp
     """
     try:
-        # Query optimized to use idx_glucose_readings_user_timestamp index
-        query = """
-            SELECT id, user_id, device_id, timestamp, glucose_value, 
-                   confidence, sensor_data, battery_level, signal_quality, created_at
-            FROM glucose_readings 
-            WHERE user_id = $1 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        """
-        
-        async with database.pool.acquire() as connection:
-            row = await connection.fetchrow(query, user_id)
+        async with database.pool_for(user_id).acquire() as connection:
+            row = await connection.fetchrow(CURRENT_READING_QUERY, user_id)
             
             if not row:
                 raise HTTPException(
@@ -292,17 +605,27 @@ async def get_current_glucose(
 
 @router.get("/users/{user_id}/glucose/history", response_model=List[CurrentGlucoseReading])
 async def get_glucose_history(
+    request: Request,
+    response: Response,
     user_id: str = Path(..., description="User ID"),
     period: str = Query(default="7d", description="Time period (7d, 30d, 90d)"),
     token: str = Depends(verify_jwt)
 ):
     """
     Get glucose reading history for a user within a specified period
+    Supports conditional GET: If-None-Match is answered from Redis
     """
     try:
         # Parse period parameter
         period_days = {"7d": 7, "30d": 30, "90d": 90}.get(period, 7)
-        cutoff_time = datetime.utcnow() - timedelta(days=period_days)
+        window_end = aligned_now()
+        cutoff_time = window_end - timedelta(days=period_days)
+        
+        # Unchanged since the client's copy: 304 without touching Postgres
+        cache_headers = validators(await data_versions.get(user_id), window_end, request)
+        if not_modified(request, cache_headers):
+            return Response(status_code=304, headers=cache_headers)
+        response.headers.update(cache_headers)
         
         query = """
             SELECT id, user_id, device_id, timestamp, glucose_value, 
@@ -312,7 +635,7 @@ async def get_glucose_history(
             ORDER BY timestamp DESC
         """
         
-        async with database.pool.acquire() as connection:
+        async with database.pool_for(user_id).acquire() as connection:
             rows = await connection.fetch(query, user_id, cutoff_time)
             
             # Convert the rows to our response model
@@ -342,17 +665,31 @@ async def get_glucose_history(
 
 @router.get("/users/{user_id}/analytics/summary", response_model=AnalyticsSummary)
 async def get_analytics_summary(
+    request: Request,
     user_id: str = Path(..., description="User ID"),
     period: str = Query(default="30d", description="Time period (7d, 30d, 90d)"),
     token: str = Depends(verify_jwt)
 ):
     """
     Get analytics summary for a user
+    Supports conditional GET; serialized responses are cached per (user, period, data version)
     """
     try:
         # Parse period parameter
         period_days = {"7d": 7, "30d": 30, "90d": 90}.get(period, 30)
-        cutoff_time = datetime.utcnow() - timedelta(days=period_days)
+        window_end = aligned_now()
+        cutoff_time = window_end - timedelta(days=period_days)
+        
+        # Unchanged since the client's copy: 304 without touching Postgres
+        version = await data_versions.get(user_id)
+        cache_headers = validators(version, window_end, request)
+        if not_modified(request, cache_headers):
+            return Response(status_code=304, headers=cache_headers)
+        
+        if version:
+            cached = await get_cached_analytics(user_id, period, version, window_end)
+            if cached:
+                return Response(content=cached, media_type="application/json", headers=cache_headers)
         
         query = """
             SELECT glucose_value, COUNT(*) as reading_count, AVG(glucose_value) as avg_glucose
@@ -362,19 +699,19 @@ async def get_analytics_summary(
             ORDER BY glucose_value
         """
         
-        async with database.pool.acquire() as connection:
+        async with database.pool_for(user_id).acquire() as connection:
             rows = await connection.fetch(query, user_id, cutoff_time)
-            
-            if not rows:
-                # Return empty analytics if no data
-                return AnalyticsSummary(
-                    period=period,
-                    averageGlucose=0.0,
-                    timeInRange={"low": 0, "normal": 0, "high": 0},
-                    totalReadings=0,
-                    alertsTriggered=0
-                )
-            
+        
+        if not rows:
+            # Return empty analytics if no data
+            summary = AnalyticsSummary(
+                period=period,
+                averageGlucose=0.0,
+                timeInRange={"low": 0, "normal": 0, "high": 0},
+                totalReadings=0,
+                alertsTriggered=0
+            )
+        else:
             # Calculate analytics
             total_readings = sum(row['reading_count'] for row in rows)
             avg_glucose = sum(row['glucose_value'] * row['reading_count'] for row in rows) / total_readings if total_readings > 0 else 0
@@ -390,14 +727,128 @@ async def get_analytics_summary(
                 "high": round(high_count / total_readings * 100, 1) if total_readings > 0 else 0
             }
             
-            return AnalyticsSummary(
+            summary = AnalyticsSummary(
                 period=period,
                 averageGlucose=round(avg_glucose, 1),
                 timeInRange=time_in_range,
                 totalReadings=total_readings,
                 alertsTriggered=low_count + high_count  # Simplified alert count
             )
+        
+        body = summary.model_dump_json()
+        if version:
+            await cache_analytics(user_id, period, version, window_end, body)
+        return Response(content=body, media_type="application/json", headers=cache_headers)
             
     except Exception as e:
         print(f"Error getting analytics summary: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to get analytics summary: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get analytics summary: {str(e)}")
+
+@router.post("/dashboard/patients", response_model=List[PatientSnapshot])
+async def get_patient_dashboard(
+    request: PatientDashboardRequest,
+    token: str = Depends(verify_jwt)
+):
+    """
+    Latest reading, trend and alert state for many patients in one round trip
+    One LATERAL query over idx_glucose_readings_user_timestamp per shard (run
+    concurrently), results in request order
+    """
+    try:
+        user_ids = list(dict.fromkeys(request.userIds))
+        
+        query = """
+            SELECT u.user_id AS requested_user_id, u.position,
+                   r.id, r.user_id, r.device_id, r.timestamp, r.glucose_value,
+                   r.confidence, r.sensor_data, r.battery_level, r.signal_quality, r.created_at,
+                   prev.glucose_value AS prev_glucose_value, prev.timestamp AS prev_timestamp,
+                   COALESCE(a.alert_types, ARRAY[]::varchar[]) AS alert_types
+            FROM unnest($1::varchar[]) WITH ORDINALITY AS u(user_id, position)
+            LEFT JOIN LATERAL (
+                SELECT id, user_id, device_id, timestamp, glucose_value,
+                       confidence, sensor_data, battery_level, signal_quality, created_at
+                FROM glucose_readings
+                WHERE user_id = u.user_id
+                ORDER BY timestamp DESC
+                LIMIT 1
+            ) r ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT glucose_value, timestamp
+                FROM glucose_readings
+                WHERE user_id = u.user_id AND timestamp < r.timestamp
+                ORDER BY timestamp DESC
+                LIMIT 1
+            ) prev ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT array_agg(DISTINCT alert_type)::varchar[] AS alert_types
+                FROM alert_history
+                WHERE user_id = u.user_id AND acknowledged = FALSE
+                  AND created_at >= NOW() - INTERVAL '24 hours'
+            ) a ON TRUE
+            ORDER BY u.position
+        """
+        
+        async def fetch_shard(shard: int, shard_user_ids: List[str]):
+            async with database.pools[shard].acquire() as connection:
+                return await connection.fetch(query, shard_user_ids)
+        
+        groups = database.router.group(user_ids)
+        results = await asyncio.gather(*[fetch_shard(shard, ids) for shard, ids in groups.items()])
+        order = {user_id: position for position, user_id in enumerate(user_ids)}
+        rows = sorted((row for result in results for row in result), key=lambda row: order[row['requested_user_id']])
+        
+        snapshots = []
+        for row in rows:
+            user_id = row['requested_user_id']
+            active_alerts = list(row['alert_types'])
+            if row['id'] is None:
+                snapshots.append(PatientSnapshot(userId=user_id, activeAlerts=active_alerts))
+                continue
+            
+            user_thresholds = MEDICAL_THRESHOLDS.get(user_id, MEDICAL_THRESHOLDS["default"])
+            glucose_value = row['glucose_value']
+            if glucose_value < user_thresholds["low"]:
+                glucose_status = "low"
+            elif glucose_value > user_thresholds["high"]:
+                glucose_status = "high"
+            else:
+                glucose_status = "normal"
+            if glucose_status != "normal":
+                active_alerts.append(f"{glucose_status}_glucose")
+            
+            rate = trend = arrow = None
+            if row['prev_timestamp'] is not None:
+                time_diff = (row['timestamp'] - row['prev_timestamp']).total_seconds() / 60  # minutes
+                if 0 < time_diff <= TREND_MAX_GAP_MINUTES:
+                    rate = round((glucose_value - row['prev_glucose_value']) / time_diff, 2)
+                    trend, arrow = classify_trend(rate)
+                    if abs(rate) >= user_thresholds["rapid_change"]:
+                        active_alerts.append("rapid_change")
+            
+            sensor_data = json.loads(row['sensor_data']) if row['sensor_data'] else {}
+            snapshots.append(PatientSnapshot(
+                userId=user_id,
+                reading=CurrentGlucoseReading(
+                    id=str(row['id']),
+                    userId=row['user_id'],
+                    deviceId=row['device_id'],
+                    timestamp=row['timestamp'],
+                    glucoseValue=glucose_value,
+                    confidence=float(row['confidence']),
+                    sensorData=sensor_data,
+                    batteryLevel=row['battery_level'],
+                    signalQuality=row['signal_quality'],
+                    createdAt=row['created_at']
+                ),
+                rateOfChange=rate,
+                trend=trend,
+                trendArrow=arrow,
+                glucoseStatus=glucose_status,
+                activeAlerts=list(dict.fromkeys(active_alerts))
+            ))
+        
+        return snapshots
+        
+    except Exception as e:
+        print(f"Error getting patient dashboard: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get patient dashboard: {str(e)}")
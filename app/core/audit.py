@@ -0,0 +1,215 @@
+"""
+API audit logging for the KOS API
+
+Every request is captured by ``AuditLogMiddleware`` into an in-memory ring
+buffer and written to ``api_audit_log`` in batches by a background task using
+``COPY``, so the request path never waits on the database.
+"""
+import asyncio
+import ipaddress
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import database
+
+AUDIT_LOG_COLUMNS = [
+    "user_id", "device_id", "endpoint", "method", "status_code",
+    "request_size", "response_size", "duration_ms", "ip_address",
+    "user_agent", "created_at",
+]
+
+INSERT_AUDIT_LOG_QUERY = (
+    f"INSERT INTO api_audit_log ({', '.join(AUDIT_LOG_COLUMNS)}) "
+    f"VALUES ({', '.join(f'${i}' for i in range(1, len(AUDIT_LOG_COLUMNS) + 1))})"
+)
+
+# Column widths of api_audit_log
+ID_MAX_LENGTH = 50
+ENDPOINT_MAX_LENGTH = 200
+METHOD_MAX_LENGTH = 10
+INTEGER_MAX = 2**31 - 1
+
+
+class AuditLogWriter:
+    """
+    Bounded in-memory buffer of audit records, flushed with COPY
+
+    Per worker process: each worker buffers up to ``buffer_size`` records and
+    flushes what it holds on shutdown. ``stop`` lets a flush in progress
+    finish instead of cancelling it; a flush that is cancelled anyway puts its
+    batch back (it may then be written twice, never lost uncounted).
+    """
+
+    def __init__(self, buffer_size: int, batch_size: int, flush_interval: float):
+        self.buffer: deque = deque()
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, entry: tuple):
+        """Queue an audit record without blocking; drop it if the buffer is full"""
+        if len(self.buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        self.buffer.append(entry)
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self):
+        """Start the background flush task"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            print("✅ Audit log writer started")
+
+    async def stop(self):
+        """Stop the background task and flush everything still buffered"""
+        if self._task:
+            # Wake the loop and let it finish the batch it may be writing
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        while self.buffer:
+            if not await self.flush():
+                break
+        print(f"🔌 Audit log writer stopped (written={self.written}, dropped={self.dropped})")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.buffer and not self._stopping:
+                if not await self.flush() or len(self.buffer) < self.batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        """Write up to one batch of buffered records with COPY"""
+        if not self.buffer or not database.pool:
+            return False
+        batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+        try:
+            async with database.pool.acquire() as connection:
+                try:
+                    await connection.copy_records_to_table(
+                        "api_audit_log", records=batch, columns=AUDIT_LOG_COLUMNS
+                    )
+                except asyncpg.PostgresError as e:
+                    # A record the table rejects fails the whole COPY; keep the others
+                    print(f"⚠️ Audit log COPY failed ({e}); inserting {len(batch)} records one by one")
+                    await self._insert_each(connection, batch)
+                    return True
+            self.written += len(batch)
+            return True
+        except asyncio.CancelledError:
+            self.buffer.extendleft(reversed(batch))
+            raise
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"⚠️ Failed to write {len(batch)} audit log records: {e}")
+            return False
+
+    async def _insert_each(self, connection, batch: list):
+        for record in batch:
+            try:
+                await connection.execute(INSERT_AUDIT_LOG_QUERY, *record)
+                self.written += 1
+            except asyncpg.PostgresError as e:
+                self.dropped += 1
+                print(f"⚠️ Dropped audit log record for {record[2]}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+def _parse_ip(host: Optional[str]):
+    if not host:
+        return None
+    try:
+        return ipaddress.ip_address(host)
+    except ValueError:
+        return None
+
+
+class AuditLogMiddleware:
+    """
+    Pure ASGI middleware that records one audit row per HTTP request
+
+    Sizes are taken from the Content-Length header for requests and from the
+    bytes actually sent for responses, so streaming responses are covered too.
+    """
+
+    def __init__(self, app, writer: AuditLogWriter):
+        self.app = app
+        self.writer = writer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.writer.record(self._build_entry(scope, status_code, response_size, started))
+
+    @staticmethod
+    def _build_entry(scope, status_code: int, response_size: int, started: float) -> tuple:
+        headers = dict(scope.get("headers") or [])
+        path_params = scope.get("path_params") or {}
+        client = scope.get("client")
+        request_size = headers.get(b"content-length")
+        user_agent = headers.get(b"user-agent")
+        user_id = path_params.get("user_id")
+        device_id = path_params.get("device_id")
+        return (
+            user_id[:ID_MAX_LENGTH] if user_id else None,
+            device_id[:ID_MAX_LENGTH] if device_id else None,
+            scope.get("path", "")[:ENDPOINT_MAX_LENGTH],
+            scope.get("method", "")[:METHOD_MAX_LENGTH],
+            status_code,
+            min(int(request_size), INTEGER_MAX) if request_size and request_size.isdigit() else None,
+            response_size,
+            int((time.perf_counter() - started) * 1000),
+            _parse_ip(client[0] if client else None),
+            user_agent.decode("latin-1") if user_agent else None,
+            datetime.utcnow(),
+        )
+
+
+# Global audit log writer instance
+audit_writer = AuditLogWriter(
+    buffer_size=settings.audit_buffer_size,
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval,
+)
@@ -5,6 +5,9 @@ from fastapi import HTTPException, Header, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 import os
+import secrets
+
+from app.core.config import settings
 
 # Security scheme for JWT Bearer tokens
 security = HTTPBearer()
@@ -16,6 +19,9 @@ VALID_API_KEYS = {
     "test-api-key-abcde": "testing"
 }
 
+# Shipped ADMIN_API_KEY placeholder; admin endpoints refuse to work with it
+DEFAULT_ADMIN_API_KEY = "admin-api-key-change-this"
+
 async def verify_api_key(x_api_key: Optional[str] = Header(None)):
     """
     Verify API key for device endpoints
@@ -43,6 +49,37 @@ async def verify_api_key(x_api_key: Optional[str] = Header(None)):
     
     return x_api_key
 
+async def verify_admin_key(x_admin_key: Optional[str] = Header(None)):
+    """
+    Verify the admin key for operational endpoints (/api/v1/admin, cohort refresh)
+    
+    Args:
+        x_admin_key: Admin key from X-Admin-Key header
+        
+    Raises:
+        HTTPException: 503 while ADMIN_API_KEY is unset or the shipped default,
+            401 if the key is missing, 403 if it is wrong
+        
+    Returns:
+        str: The validated admin key
+    """
+    if settings.admin_api_key in ("", DEFAULT_ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=503,
+            detail="Admin endpoints are disabled until ADMIN_API_KEY is set to a non-default value."
+        )
+    
+    if not x_admin_key:
+        raise HTTPException(
+            status_code=401,
+            detail="Missing admin key. Please include X-Admin-Key header."
+        )
+    
+    if not secrets.compare_digest(x_admin_key, settings.admin_api_key):
+        raise HTTPException(status_code=403, detail="Invalid admin key.")
+    
+    return x_admin_key
+
 async def verify_jwt(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Verify JWT token for user endpoints (placeholder implementation)
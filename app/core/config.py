@@ -9,27 +9,84 @@ class Settings(BaseSettings):
     db_name: str = "glucose_db"
     db_user: str = "glucose_user"
     db_password: str = "glucose_pass"
+    db_shard_dsns: str = ""             # comma-separated postgresql:// URLs, one per shard; empty = the DB_* database
+    db_shard_virtual_nodes: int = 128   # points per shard on the consistent hash ring
+    device_owner_cache_size: int = 200000  # per worker; device -> owner entries for shard routing
+    device_owner_cache_ttl: float = 3600.0 # seconds before a cached owner is looked up again
     
     # Redis Configuration
     redis_url: str = "redis://:redis_pass@localhost:6379"
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_password: str = "redis_pass"
+    redis_max_connections: int = 20                # per worker
+    redis_socket_timeout: float = 0.25              # seconds per command
+    redis_connect_timeout: float = 0.5              # seconds
+    redis_pool_timeout: float = 0.5                 # seconds to get a pooled connection (includes connecting)
+    redis_breaker_failure_threshold: int = 5        # consecutive failures before failing fast
+    redis_breaker_recovery_timeout: float = 5.0     # seconds before a probe is let through
     
     # Application Configuration
     port: int = 8080
     host: str = "0.0.0.0"
     debug: bool = True
     
+    # Process Model / Connection Budget
+    web_concurrency: int = 1                # worker processes (gunicorn sets this from -w)
+    db_connection_budget: int = 40          # Postgres connections shared by all workers
+    db_pool_min_size: int = 1               # per worker
+    db_pool_max_size: Optional[int] = None  # per worker; default is budget / workers
+    
+    # Startup / Readiness (GET /health/ready)
+    startup_warm_enabled: bool = True
+    startup_warm_devices: int = 50000    # most recently seen devices whose owner and calibration are preloaded
+    startup_warm_timeout: float = 20.0   # seconds; the worker reports ready afterwards even if warming is unfinished
+    
+    # Slow Query Profiling (per worker, in memory)
+    query_profiling_enabled: bool = True
+    slow_query_threshold_ms: float = 250.0        # statements at least this slow are reported
+    slow_query_explain_sample_rate: float = 0.1   # share of slow statements that get an EXPLAIN
+    slow_query_explain_interval: float = 300.0    # seconds between EXPLAINs of the same query
+    slow_query_explain_timeout: float = 30.0      # seconds; statement_timeout for the EXPLAIN
+    slow_query_report_size: int = 20              # entries in the top-N report
+    
     # Security
     jwt_secret: str = "your-super-secret-jwt-key-change-this-in-production"
     api_key_secret: str = "dev-api-key-12345"
+    admin_api_key: str = "admin-api-key-change-this"
     
     # Medical Device Specific
     max_glucose_reading_rate: int = 30  # seconds
     glucose_min_value: int = 40
     glucose_max_value: int = 400
     
+    # API Audit Logging
+    audit_log_enabled: bool = True
+    audit_buffer_size: int = 10000    # records held in memory before dropping
+    audit_batch_size: int = 500       # rows per COPY
+    audit_flush_interval: float = 1.0 # seconds
+    
+    # Device Telemetry (last_seen / battery)
+    telemetry_flush_interval: float = 5.0  # seconds between batched device updates
+    
+    # Device Offline / Low Battery Detection
+    device_monitor_interval: float = 30.0  # seconds between sweeps
+    device_offline_after: int = 600        # seconds without readings before a device is offline
+    battery_low_threshold: int = 20        # battery percentage
+    battery_alert_cooldown: int = 21600    # seconds before re-alerting the same device
+    
+    # Signal Processing (calibration + Kalman smoothing before alerting)
+    calibration_cache_ttl: float = 300.0      # seconds
+    filter_process_noise: float = 4.0         # (mg/dL)^2 per minute of glucose drift
+    filter_measurement_noise: float = 25.0    # (mg/dL)^2 at confidence 1.0
+    filter_motion_noise_factor: float = 9.0   # noise multiplier for motion artifacts
+    filter_max_gap_minutes: float = 30.0      # restart the filter after longer gaps
+    
+    # Conditional GET / response caching (history and analytics)
+    read_window_alignment: int = 300   # seconds; "last N days" windows end on these boundaries
+    analytics_cache_ttl: int = 900     # seconds a serialized analytics response is kept
+    data_version_read_ttl: int = 86400 # seconds a version created by a read (never bumped) is kept
+    
     class Config:
         env_file = "config.env"
         case_sensitive = False
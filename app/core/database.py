@@ -1,48 +1,239 @@
 import asyncpg
 import asyncio
-from typing import Optional
+import bisect
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
 from app.core.config import settings
+from app.core.query_profiler import ProfiledPool, query_profiler
+
+T = TypeVar("T")
+
+def worker_pool_size() -> int:
+    """Per-worker pool size: the global connection budget split across worker processes"""
+    if settings.db_pool_max_size:
+        return settings.db_pool_max_size
+    return max(2, settings.db_connection_budget // max(settings.web_concurrency, 1))
+
+def shard_connect_args() -> List[dict]:
+    """Connection arguments per shard: DB_SHARD_DSNS, or the single DB_* database"""
+    dsns = [dsn.strip() for dsn in settings.db_shard_dsns.split(",") if dsn.strip()]
+    if dsns:
+        return [{"dsn": dsn} for dsn in dsns]
+    return [dict(
+        host=settings.db_host,
+        port=settings.db_port,
+        database=settings.db_name,
+        user=settings.db_user,
+        password=settings.db_password,
+    )]
+
+class ShardRouter:
+    """
+    Consistent hash ring mapping user IDs to shard indexes
+
+    Each shard owns ``virtual_nodes`` points on the ring, named by its position
+    in DB_SHARD_DSNS. Appending a shard only moves the users whose nearest point
+    now belongs to the new shard (about 1/N of them); shards must therefore
+    only ever be appended, never reordered or removed from the middle.
+    """
+
+    def __init__(self, shard_count: int, virtual_nodes: int):
+        self.shard_count = shard_count
+        points = sorted(
+            (self._hash(f"shard-{shard}#{node}"), shard)
+            for shard in range(shard_count)
+            for node in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def shard_for(self, user_id: str) -> int:
+        if self.shard_count == 1:
+            return 0
+        position = bisect.bisect(self._hashes, self._hash(user_id)) % len(self._hashes)
+        return self._shards[position]
+
+    def group(self, user_ids: Iterable[str]) -> Dict[int, List[str]]:
+        """User IDs grouped by owning shard, keeping their order within each group"""
+        groups: Dict[int, List[str]] = {}
+        for user_id in user_ids:
+            groups.setdefault(self.shard_for(user_id), []).append(user_id)
+        return groups
+
+class DeviceOwnerCache:
+    """
+    Bounded device_id -> user_id map (LRU with a time-to-live)
+
+    Per worker process. Entries expire after ``ttl`` seconds so a reassigned
+    device or a user moved by rebalance_shards is picked up eventually; callers
+    that notice a device missing on its cached shard drop it right away.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, device_id: str) -> Optional[str]:
+        entry = self.entries.get(device_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self.entries[device_id]
+            return None
+        self.entries.move_to_end(device_id)
+        return entry[1]
+
+    def __setitem__(self, device_id: str, user_id: str):
+        self.entries[device_id] = (time.monotonic(), user_id)
+        self.entries.move_to_end(device_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, device_id: str):
+        self.entries.pop(device_id, None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
 
 class Database:
+    """
+    One asyncpg pool per shard
+
+    Everything belonging to a user (profile, devices, readings, alerts, daily
+    rollups) lives on the shard that owns the user; use ``pool_for``. Global
+    tables (cohort_analytics, api_audit_log) live on the first shard, which is
+    also what ``pool`` returns. With a single database every call resolves to
+    the same pool.
+    """
+
     def __init__(self):
-        self.pool: Optional[asyncpg.Pool] = None
-    
+        self.pools: List[asyncpg.Pool] = []
+        self.shard_args = shard_connect_args()
+        self.router = ShardRouter(len(self.shard_args), settings.db_shard_virtual_nodes)
+        # device_id -> user_id, for requests that only name a device
+        self.device_owners = DeviceOwnerCache(settings.device_owner_cache_size, settings.device_owner_cache_ttl)
+        # Run in order on every new pool connection (the pool init hook)
+        self.connection_init: List[Callable[[asyncpg.Connection], Awaitable[None]]] = []
+
+    @property
+    def pool(self) -> Optional[asyncpg.Pool]:
+        """Pool of the primary shard (global tables, single-database setups)"""
+        return self.pools[0] if self.pools else None
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shard_args)
+
+    def pool_for(self, user_id: str) -> asyncpg.Pool:
+        """Pool of the shard that owns the user"""
+        return self.pools[self.router.shard_for(user_id)]
+
+    async def device_owner(self, device_id: str) -> Optional[str]:
+        """User that owns a device (cached; looked up on every shard on a miss)"""
+        owner = self.device_owners.get(device_id)
+        if owner is None:
+            owners = await self.fan_out(
+                lambda pool: pool.fetchval("SELECT user_id FROM devices WHERE device_id = $1", device_id)
+            )
+            owner = next((owner for owner in owners if owner), None)
+            if owner:
+                self.device_owners[device_id] = owner
+        return owner
+
+    async def shard_for_device(self, device_id: str) -> Optional[int]:
+        """Shard holding a device's data, or None for an unknown device"""
+        if self.shard_count == 1:
+            return 0
+        owner = await self.device_owner(device_id)
+        return self.router.shard_for(owner) if owner else None
+
+    async def refresh_device_shard(self, device_id: str, stale_shard: int) -> Optional[int]:
+        """
+        Look a device up again after it was not found on its cached shard
+
+        Returns the device's shard if it moved, None if it is unknown or still
+        on stale_shard (its data simply is not there)
+        """
+        if self.shard_count == 1:
+            return None
+        self.device_owners.discard(device_id)
+        shard = await self.shard_for_device(device_id)
+        return shard if shard != stale_shard else None
+
+    async def fan_out(self, operation: Callable[[asyncpg.Pool], Awaitable[T]]) -> List[T]:
+        """Run an operation against every shard concurrently; results in shard order"""
+        return list(await asyncio.gather(*[operation(pool) for pool in self.pools]))
+
+    async def _create_pool(self, shard: int, max_size: int) -> asyncpg.Pool:
+        connect_args = dict(
+            **self.shard_args[shard],
+            min_size=min(settings.db_pool_min_size, max_size),
+            max_size=max_size,
+        )
+        steps = list(self.connection_init)
+        if settings.query_profiling_enabled:
+            # Statements are timed by a logger on each connection, acquires by the wrapper
+            steps.append(query_profiler.attach_for(shard))
+
+        async def init(connection: asyncpg.Connection):
+            for step in steps:
+                await step(connection)
+
+        pool = await asyncpg.create_pool(**connect_args, init=init if steps else None)
+        if settings.query_profiling_enabled:
+            return ProfiledPool(pool, query_profiler)
+        return pool
+
     async def connect(self):
-        """Create database connection pool"""
+        """Create the connection pools of all shards concurrently"""
+        # Every shard is its own Postgres server with its own connection budget
+        max_size = worker_pool_size()
         try:
-            self.pool = await asyncpg.create_pool(
-                host=settings.db_host,
-                port=settings.db_port,
-                database=settings.db_name,
-                user=settings.db_user,
-                password=settings.db_password,
-                min_size=1,
-                max_size=10,
-            )
-            print("✅ Database connected successfully")
+            pools = await asyncio.gather(*[
+                self._create_pool(shard, max_size) for shard in range(self.shard_count)
+            ], return_exceptions=True)
+            self.pools = [pool for pool in pools if not isinstance(pool, BaseException)]
+            failed = [pool for pool in pools if isinstance(pool, BaseException)]
+            if failed:
+                raise failed[0]
+            shards = f", {self.shard_count} shards" if self.shard_count > 1 else ""
+            print(f"✅ Database connected successfully (pool max {max_size}, {settings.web_concurrency} worker(s){shards})")
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
+            await self.disconnect()
             return False
-    
+
+    async def open_connection(self, shard: int = 0) -> asyncpg.Connection:
+        """Open a standalone connection outside the pool (offline tools, worker processes)"""
+        return await asyncpg.connect(**self.shard_args[shard])
+
     async def disconnect(self):
-        """Close database connection pool"""
-        if self.pool:
-            await self.pool.close()
+        """Close all database connection pools"""
+        if self.pools:
+            await asyncio.gather(*[pool.close() for pool in self.pools], return_exceptions=True)
+            self.pools = []
             print("🔌 Database disconnected")
-    
+
     async def test_connection(self):
-        """Test database connection"""
-        if not self.pool:
+        """Test the connection to every shard"""
+        if not self.pools:
             return False
         try:
-            async with self.pool.acquire() as connection:
-                result = await connection.fetchval("SELECT NOW()")
-                print(f"✅ Database test successful: {result}")
-                return True
+            results = await self.fan_out(lambda pool: pool.fetchval("SELECT NOW()"))
+            print(f"✅ Database test successful: {results[0]}" +
+                  (f" ({len(results)} shards)" if len(results) > 1 else ""))
+            return True
         except Exception as e:
             print(f"❌ Database test failed: {e}")
             return False
 
 # Global database instance
-database = Database() 
\ No newline at end of file
+database = Database()
@@ -0,0 +1,373 @@
+"""
+Slow query profiling for the Postgres pools
+
+Every connection in the pools gets an asyncpg query logger (attached by the
+pool ``init`` hook) that records the duration of each statement under its
+normalized text: whitespace collapsed and literals replaced by ``?``, so the
+same query from different call sites and with different values shares one
+entry. Pool acquires are timed as well, which separates "the query is slow"
+from "the query waited for a connection".
+
+Statements slower than ``slow_query_threshold_ms`` are sampled for an
+``EXPLAIN (ANALYZE, BUFFERS)`` that runs in the background on another
+connection of the same shard, at most one at a time and once per
+``slow_query_explain_interval`` for the same query. Only plain SELECTs are
+executed by ``ANALYZE`` (in a read-only transaction); data-modifying
+statements get their plan without execution. When the captured plan's shape
+(node types, tables, indexes) differs from the previous capture,
+``plan_changed_at`` is set, which makes a plan regression after a schema or
+index change stand out in the report.
+
+The EXPLAIN runs with the statement's real parameters, so conditions, sort
+keys and output lists in the plan can contain patient data. Only the plan
+shape and its numbers are kept (``plan_without_values``).
+
+Statistics are per worker process and in memory only.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+import asyncpg
+
+from app.core.config import settings
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+_WRITE = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+DURATION_SAMPLES = 512  # recent durations kept per query for percentiles
+
+
+def normalize_query(query: str) -> str:
+    """Query text with literals replaced by ? and whitespace collapsed"""
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def query_name(normalized: str) -> str:
+    """Short readable name: statement verb and the first table, e.g. 'SELECT glucose_readings'"""
+    verb = normalized.split(" ", 1)[0].upper()
+    table = _TABLE.search(normalized)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+# Plan node fields that name the operation or an object, never a value
+PLAN_TEXT_FIELDS = {
+    "Node Type", "Parent Relationship", "Relation Name", "Schema", "Alias", "Index Name", "CTE Name",
+    "Subplan Name", "Join Type", "Strategy", "Partial Mode", "Scan Direction", "Operation", "Sort Method",
+    "Sort Space Type",
+}
+
+
+def plan_without_values(node: dict) -> dict:
+    """
+    A plan node with everything that can hold query values removed
+
+    Keeps numbers (costs, rows, timings, buffers), booleans and the fields in
+    PLAN_TEXT_FIELDS; conditions, filters, keys and output lists are dropped.
+    """
+    kept = {}
+    for key, value in node.items():
+        if key == "Plans":
+            kept[key] = [plan_without_values(child) for child in value]
+        elif isinstance(value, (int, float)) or key in PLAN_TEXT_FIELDS:
+            kept[key] = value
+    return kept
+
+
+def _plan_shape(node: dict, parts: list) -> list:
+    parts.append("/".join(str(node.get(key, "")) for key in ("Node Type", "Relation Name", "Index Name")))
+    for child in node.get("Plans", []):
+        _plan_shape(child, parts)
+    return parts
+
+
+class QueryStats:
+    def __init__(self, normalized: str):
+        self.id = hashlib.sha1(normalized.encode()).hexdigest()[:12]
+        self.name = query_name(normalized)
+        self.query = normalized
+        self.calls = 0
+        self.errors = 0
+        self.slow_calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.durations: deque = deque(maxlen=DURATION_SAMPLES)
+        self.explained_at = 0.0  # monotonic
+        self.plan: Optional[dict] = None
+
+    def report(self) -> dict:
+        durations = list(self.durations)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "query": self.query[:1000],
+            "calls": self.calls,
+            "errors": self.errors,
+            "slow_calls": self.slow_calls,
+            "total_ms": round(self.total_ms, 1),
+            "mean_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "p95_ms": round(_percentile(durations, 95), 2),
+            "max_ms": round(self.max_ms, 2),
+            "plan": self.plan,
+        }
+
+
+class QueryProfiler:
+    """
+    Per-statement timings, pool acquire waits and sampled EXPLAIN plans
+
+    ``attach_for(shard)`` is run by the pool ``init`` hook; ``record_acquire``
+    is called by ``ProfiledPool``. Statistics are aggregated over all shards.
+    """
+
+    def __init__(self, threshold_ms: float, explain_sample_rate: float, explain_interval: float,
+                 explain_timeout: float, report_size: int):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self.report_size = report_size
+        self._loggers: Dict[int, Callable] = {}
+        self.reset()
+
+    def reset(self):
+        """Forget all statistics, e.g. after deploying an index change"""
+        self.queries: Dict[str, QueryStats] = {}
+        self.slowest: list = []  # min-heap of (duration_ms, seq, entry)
+        self.acquires = 0
+        self.acquire_wait_ms: deque = deque(maxlen=DURATION_SAMPLES)
+        self.acquire_wait_max_ms = 0.0
+        self.explains = 0
+        self.explain_failures = 0
+        self.since = datetime.utcnow()
+        self._seq = itertools.count()
+        self._explaining: Optional[asyncio.Task] = None
+
+    def _logger(self, shard: int) -> Callable:
+        # One callable per shard so remove_query_logger finds it again
+        if shard not in self._loggers:
+            self._loggers[shard] = partial(self._on_query, shard)
+        return self._loggers[shard]
+
+    def attach_for(self, shard: int):
+        """Pool init hook step that adds the query logger to each new connection of a shard"""
+        async def attach(connection: asyncpg.Connection):
+            connection.add_query_logger(self._logger(shard))
+        return attach
+
+    def record_acquire(self, elapsed: float):
+        wait_ms = elapsed * 1000
+        self.acquires += 1
+        self.acquire_wait_ms.append(wait_ms)
+        self.acquire_wait_max_ms = max(self.acquire_wait_max_ms, wait_ms)
+
+    def _on_query(self, shard: int, record):
+        normalized = normalize_query(record.query)
+        stats = self.queries.get(normalized)
+        if stats is None:
+            stats = self.queries[normalized] = QueryStats(normalized)
+        duration_ms = record.elapsed * 1000
+        stats.calls += 1
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+        stats.durations.append(duration_ms)
+        if record.exception is not None:
+            stats.errors += 1
+        if duration_ms < self.threshold_ms:
+            return
+
+        stats.slow_calls += 1
+        entry = {
+            "id": stats.id,
+            "name": stats.name,
+            "duration_ms": round(duration_ms, 2),
+            "at": datetime.utcnow().isoformat() + "Z",
+            "error": type(record.exception).__name__ if record.exception is not None else None,
+        }
+        item = (duration_ms, next(self._seq), entry)
+        if len(self.slowest) < self.report_size:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+        if self._should_explain(stats, record):
+            stats.explained_at = time.monotonic()
+            self._explaining = asyncio.get_running_loop().create_task(
+                self._explain(shard, stats, record.query, record.args)
+            )
+
+    def _should_explain(self, stats: QueryStats, record) -> bool:
+        if record.exception is not None or ";" in record.query.strip().rstrip(";"):
+            return False
+        if not stats.name.startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+            return False
+        if self._explaining is not None and not self._explaining.done():
+            return False
+        if time.monotonic() - stats.explained_at < self.explain_interval:
+            return False
+        return random.random() < self.explain_sample_rate
+
+    async def _explain(self, shard: int, stats: QueryStats, query: str, args):
+        # Imported here: the database module attaches this profiler to its pools
+        from app.core.database import database
+
+        analyze = not _WRITE.search(query)
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        try:
+            async with database.pools[shard].acquire(timeout=self.explain_timeout) as connection:
+                # Keep the EXPLAIN itself out of the statistics
+                connection.remove_query_logger(self._logger(shard))
+                try:
+                    async with connection.transaction(readonly=analyze):
+                        await connection.execute(f"SET LOCAL statement_timeout = {int(self.explain_timeout * 1000)}")
+                        result = await connection.fetchval(f"EXPLAIN ({options}) {query}", *(args or ()))
+                finally:
+                    connection.add_query_logger(self._logger(shard))
+        except Exception as e:
+            self.explain_failures += 1
+            print(f"⚠️ EXPLAIN failed for slow query {stats.name} ({stats.id}): {e}")
+            return
+
+        explained = (json.loads(result) if isinstance(result, str) else result)[0]
+        root = plan_without_values(explained["Plan"])
+        shape = hashlib.sha1("|".join(_plan_shape(root, [])).encode()).hexdigest()[:12]
+        captured_at = datetime.utcnow().isoformat() + "Z"
+        previous = stats.plan
+        changed_at = previous["plan_changed_at"] if previous else None
+        if previous and previous["shape"] != shape:
+            changed_at = captured_at
+            print(f"⚠️ Plan changed for slow query {stats.name} ({stats.id}): "
+                  f"{previous['root_node']} -> {root['Node Type']}")
+        stats.plan = {
+            "captured_at": captured_at,
+            "analyzed": analyze,
+            "shape": shape,
+            "plan_changed_at": changed_at,
+            "shard": shard,
+            "root_node": root["Node Type"],
+            "total_cost": root.get("Total Cost"),
+            "execution_ms": explained.get("Execution Time"),
+            "shared_hit_blocks": root.get("Shared Hit Blocks"),
+            "shared_read_blocks": root.get("Shared Read Blocks"),
+            "explain": {"Plan": root, "Planning Time": explained.get("Planning Time"),
+                        "Execution Time": explained.get("Execution Time")},
+        }
+        self.explains += 1
+
+    def report(self, limit: Optional[int] = None) -> dict:
+        """Top queries by total time and the slowest individual executions"""
+        limit = limit or self.report_size
+        waits = list(self.acquire_wait_ms)
+        queries = sorted(self.queries.values(), key=lambda stats: stats.total_ms, reverse=True)
+        return {
+            "worker_pid": os.getpid(),
+            "since": self.since.isoformat() + "Z",
+            "threshold_ms": self.threshold_ms,
+            "pool": {
+                "acquires": self.acquires,
+                "acquire_wait_p50_ms": round(_percentile(waits, 50), 2),
+                "acquire_wait_p95_ms": round(_percentile(waits, 95), 2),
+                "acquire_wait_max_ms": round(self.acquire_wait_max_ms, 2),
+            },
+            "explains": self.explains,
+            "explain_failures": self.explain_failures,
+            "slowest": [entry for _, _, entry in sorted(self.slowest, reverse=True)][:limit],
+            "queries": [stats.report() for stats in queries[:limit]],
+        }
+
+
+class _TimedAcquire:
+    """``async with`` / ``await`` wrapper around ``Pool.acquire()`` that times the wait"""
+
+    def __init__(self, pool: asyncpg.Pool, profiler: QueryProfiler, timeout: Optional[float]):
+        self._pool = pool
+        self._profiler = profiler
+        self._timeout = timeout
+        self._connection = None
+
+    async def _acquire(self):
+        started = time.monotonic()
+        try:
+            return await self._pool.acquire(timeout=self._timeout)
+        finally:
+            self._profiler.record_acquire(time.monotonic() - started)
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self):
+        self._connection = await self._acquire()
+        return self._connection
+
+    async def __aexit__(self, *exc):
+        connection, self._connection = self._connection, None
+        await self._pool.release(connection)
+
+
+def _through_acquire(name: str):
+    async def method(self, *args, **kwargs):
+        async with self.acquire() as connection:
+            return await getattr(connection, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class ProfiledPool:
+    """
+    asyncpg pool wrapper that reports how long each acquire waited for a connection
+
+    Only uses the public Pool API: ``acquire()`` is timed, the query shortcuts
+    (``fetch``, ``execute``, ...) go through it, everything else is the pool's own.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, profiler: QueryProfiler):
+        self._pool = pool
+        self._profiler = profiler
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _TimedAcquire:
+        return _TimedAcquire(self._pool, self._profiler, timeout)
+
+    execute = _through_acquire("execute")
+    executemany = _through_acquire("executemany")
+    fetch = _through_acquire("fetch")
+    fetchval = _through_acquire("fetchval")
+    fetchrow = _through_acquire("fetchrow")
+    copy_from_table = _through_acquire("copy_from_table")
+    copy_from_query = _through_acquire("copy_from_query")
+    copy_to_table = _through_acquire("copy_to_table")
+    copy_records_to_table = _through_acquire("copy_records_to_table")
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+# Global query profiler
+query_profiler = QueryProfiler(
+    threshold_ms=settings.slow_query_threshold_ms,
+    explain_sample_rate=settings.slow_query_explain_sample_rate,
+    explain_interval=settings.slow_query_explain_interval,
+    explain_timeout=settings.slow_query_explain_timeout,
+    report_size=settings.slow_query_report_size,
+)
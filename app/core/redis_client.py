@@ -1,47 +1,206 @@
+import time
 import redis.asyncio as redis
-from typing import Optional
+from redis.exceptions import ConnectionError as RedisConnectionError, RedisError, TimeoutError as RedisTimeoutError
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
 from app.core.config import settings
 
+T = TypeVar("T")
+
+
+class RedisUnavailableError(Exception):
+    """Redis is not connected or the circuit breaker is open; the call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    closed: calls go through; ``failure_threshold`` consecutive connection
+    errors or timeouts open the circuit.
+    open: calls fail immediately for ``recovery_timeout`` seconds.
+    half_open: a single probe call is let through; success closes the
+    circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            print("✅ Redis recovered, circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def trip(self):
+        """Open the circuit immediately (e.g. Redis unreachable at startup)"""
+        if self.state != self.OPEN:
+            self.times_opened += 1
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"⚠️ Redis circuit opened after {self.failures} failure(s); retrying in {self.recovery_timeout}s")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        status = {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected,
+        }
+        if self.state == self.OPEN:
+            status["retry_in_s"] = round(max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at)), 1)
+        return status
+
+
 class RedisClient:
     def __init__(self):
         self.client: Optional[redis.Redis] = None
-    
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.redis_breaker_failure_threshold,
+            recovery_timeout=settings.redis_breaker_recovery_timeout,
+        )
+        self._scripts: Dict[str, object] = {}
+
     async def connect(self):
-        """Create Redis connection"""
+        """
+        Create the Redis connection pool
+        The client is kept even if Redis is down: calls fail fast through the
+        circuit breaker until a probe succeeds
+        """
+        pool = redis.BlockingConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            decode_responses=True,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,              # wait for (and open) a connection
+            socket_timeout=settings.redis_socket_timeout,     # per command
+            socket_connect_timeout=settings.redis_connect_timeout,
+            socket_keepalive=True,
+        )
+        self.client = redis.Redis(connection_pool=pool)
+        self._scripts = {}
         try:
-            self.client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                decode_responses=True,
-                socket_keepalive=True,
-                socket_keepalive_options={},
-            )
             # Test the connection
-            await self.client.ping()
+            await self.run(lambda client: client.ping())
             print("✅ Redis connected successfully")
             return True
         except Exception as e:
             print(f"❌ Redis connection failed: {e}")
+            # Fail fast from the first request instead of waiting on connect timeouts
+            self.breaker.trip()
             return False
-    
+
     async def disconnect(self):
         """Close Redis connection"""
         if self.client:
             await self.client.close()
+            await self.client.connection_pool.disconnect()
             print("🔌 Redis disconnected")
-    
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would currently be attempted (does not use up a half-open probe)"""
+        if not self.client:
+            return False
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return time.monotonic() - self.breaker.opened_at >= self.breaker.recovery_timeout
+        return True
+
+    async def run(self, operation: Callable[[redis.Redis], Awaitable[T]]) -> T:
+        """
+        Run one Redis operation (a command, pipeline or script) through the circuit breaker
+
+        Raises:
+            RedisUnavailableError: Not connected or circuit open; nothing was sent
+            redis.exceptions.RedisError: The operation failed
+        """
+        if not self.client:
+            raise RedisUnavailableError("Redis is not configured")
+        if not self.breaker.allow():
+            raise RedisUnavailableError("Redis circuit breaker is open")
+        try:
+            result = await operation(self.client)
+        except (RedisConnectionError, RedisTimeoutError, OSError):
+            self.breaker.record_failure()
+            raise
+        except RedisError:
+            # Redis answered with an error, so it is reachable
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled or failed before an answer: no evidence either way
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def eval(self, source: str, keys: list, args: list):
+        """Run a Lua script (cached by SHA on the server) through the circuit breaker"""
+        return await self.run(lambda client: self.script(source)(keys=keys, args=args, client=client))
+
+    def script(self, source: str):
+        """Registered script object for use inside run(), e.g. in a pipeline"""
+        script = self._scripts.get(source)
+        if script is None:
+            script = self.client.register_script(source)
+            self._scripts[source] = script
+        return script
+
     async def test_connection(self):
         """Test Redis connection"""
         if not self.client:
             return False
         try:
-            result = await self.client.ping()
+            result = await self.run(lambda client: client.ping())
             print(f"✅ Redis test successful: PONG = {result}")
             return True
         except Exception as e:
             print(f"❌ Redis test failed: {e}")
             return False
 
+    def status(self) -> dict:
+        return {
+            "configured": self.client is not None,
+            "available": self.available,
+            "circuit": self.breaker.status(),
+        }
+
 # Global Redis instance
-redis_client = RedisClient() 
\ No newline at end of file
+redis_client = RedisClient()
@@ -19,13 +19,23 @@ Version: 1.0.0
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from datetime import datetime
+import asyncio
+import time
 import uvicorn
 
 from app.core.config import settings
 from app.core.database import database
 from app.core.redis_client import redis_client
+from app.core.audit import AuditLogMiddleware, audit_writer
+from app.services.telemetry import telemetry
+from app.services.device_monitor import device_monitor
+from app.services.warmup import cache_warmer
 from app.api.glucose import router as glucose_router
+from app.api.export import router as export_router
+from app.api.analytics import router as analytics_router
+from app.api.admin import router as admin_router
 
 # Create FastAPI app with comprehensive metadata
 app = FastAPI(
@@ -46,8 +56,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record every request in api_audit_log (buffered, written in the background)
+if settings.audit_log_enabled:
+    app.add_middleware(AuditLogMiddleware, writer=audit_writer)
+
 # Register API route modules
 app.include_router(glucose_router, prefix="/api/v1", tags=["glucose"])
+app.include_router(export_router, prefix="/api/v1", tags=["export"])
+app.include_router(analytics_router, prefix="/api/v1", tags=["analytics"])
+app.include_router(admin_router, prefix="/api/v1", tags=["admin"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -55,34 +72,44 @@ async def startup_event():
     Application startup event handler
     
     Initializes all required services and connections:
-    1. PostgreSQL database connection pool
-    2. Redis cache connection
-    3. Connection health checks
+    1. PostgreSQL connection pools and Redis, concurrently (Redis is optional:
+       without it the API runs degraded)
+    2. Background audit log writer, telemetry aggregator and device monitor
+    3. Background cache warming; /health/ready reports ready once it is done
     
     Raises:
-        Exception: If any critical service fails to connect
+        Exception: If the database fails to connect
     """
     print("🚀 Starting KOS Glucose Monitoring API...")
+    started = time.perf_counter()
     
-    # Initialize PostgreSQL connection pool
-    db_connected = await database.connect()
+    # Creating the pools opens connections and creating the Redis client pings
+    # it, so neither needs a separate test query
+    db_connected, redis_connected = await asyncio.gather(database.connect(), redis_client.connect())
     if not db_connected:
         print("❌ Failed to connect to database. Exiting...")
+        await redis_client.disconnect()
         raise Exception("Database connection failed")
     
-    # Verify database connectivity with test query
-    await database.test_connection()
-    
-    # Initialize Redis connection for caching and rate limiting
-    redis_connected = await redis_client.connect()
+    # Without Redis the circuit breaker starts open: rate limiting, caching and
+    # device monitoring are skipped until a probe reconnects
     if not redis_connected:
-        print("❌ Failed to connect to Redis. Exiting...")
-        raise Exception("Redis connection failed")
+        print("⚠️ Redis unavailable, starting in degraded mode")
+    
+    # Start flushing buffered audit records to api_audit_log
+    if settings.audit_log_enabled:
+        await audit_writer.start()
+    
+    # Start batched devices.last_seen / battery updates
+    await telemetry.start()
+    
+    # Start the device offline / low battery sweep
+    await device_monitor.start()
     
-    # Verify Redis connectivity
-    await redis_client.test_connection()
+    # Preload device owners and calibrations (statements are prepared by the pool init hook)
+    await cache_warmer.start(settings.startup_warm_enabled)
     
-    print("✅ All services connected successfully")
+    print(f"✅ All services connected in {(time.perf_counter() - started) * 1000:.0f} ms")
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -90,11 +117,18 @@ async def shutdown_event():
     Application shutdown event handler
     
     Gracefully closes all connections and cleans up resources:
-    1. Closes database connection pool
-    2. Closes Redis connection
-    3. Logs shutdown completion
+    1. Reports not ready and stops cache warming
+    2. Flushes buffered audit log records and device telemetry
+    3. Closes database connection pool
+    4. Closes Redis connection
+    5. Logs shutdown completion
     """
     print("🔄 Shutting down...")
+    await cache_warmer.stop()
+    await device_monitor.stop()
+    await telemetry.stop()
+    if settings.audit_log_enabled:
+        await audit_writer.stop()
     await database.disconnect()
     await redis_client.disconnect()
     print("👋 Goodbye!")
@@ -104,16 +138,56 @@ async def health_check():
     """
     Health check endpoint for monitoring and load balancers
     
+    Reports DEGRADED (still HTTP 200) while Redis is unavailable: the API keeps
+    serving readings without rate limiting and caching
+    
     Returns:
-        dict: Service status information including timestamp and version
+        dict: Service status information including timestamp, version and Redis state
     """
+    redis_status = redis_client.status()
+    degraded = not redis_status["available"] or redis_status["circuit"]["state"] != "closed"
     return {
-        "status": "OK",
+        "status": "DEGRADED" if degraded else "OK",
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "service": "KOS Glucose Monitoring API",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "ready": cache_warmer.ready,
+        "redis": redis_status
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe: the process is up and serving its event loop
+    
+    Never checks dependencies, so a database or Redis outage does not get
+    healthy workers restarted
+    """
+    return {"status": "ALIVE", "timestamp": datetime.utcnow().isoformat() + "Z"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe for load balancers
+    
+    HTTP 200 once the database pools are connected and caches are warm, 503
+    before that and during shutdown. Redis is not required (degraded mode).
+    
+    Returns:
+        JSONResponse: Readiness with database, Redis and cache warming state
+    """
+    ready = cache_warmer.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "READY" if ready else "NOT_READY",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "database": {"shards": database.shard_count, "connected": len(database.pools)},
+            "redis": {"available": redis_client.available},
+            "caches": cache_warmer.status(),
+        },
+    )
+
 @app.get("/")
 async def root():
     """
@@ -127,6 +201,8 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "docs": "/docs",
             "redoc": "/redoc",
             "api": "/api/v1"
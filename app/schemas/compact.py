@@ -0,0 +1,207 @@
+"""
+Compact positional reading format for devices (MessagePack)
+
+Instead of a JSON object with camelCase keys, a reading is a MessagePack
+array in a fixed order:
+
+    [deviceId, userId, timestamp, glucoseValue, confidence,
+     [red, infrared, green, temperature, motionArtifact],
+     batteryLevel, signalQuality]
+
+- timestamp: UTC epoch seconds (int or float)
+- confidence: integer per mille (0-1000), i.e. confidence * 1000
+- signalQuality: 0 excellent, 1 good, 2 fair, 3 poor
+
+A batch is a MessagePack array of such readings.
+
+``decode_compact_reading`` is a validation fast path: it applies the checks of
+``GlucoseReadingCreate`` (ranges, lengths, timestamp window, enum) by hand and
+builds the model with ``model_construct``, without running Pydantic's generic
+validation. Types are strict: MessagePack is typed, so no string-to-number
+coercion is done.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from app.schemas.glucose import (
+    READING_MAX_AGE, GlucoseReadingCreate, SensorData, SignalQuality, normalize_reading_timestamp
+)
+
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+SIGNAL_QUALITY_CODES = [SignalQuality.EXCELLENT, SignalQuality.GOOD, SignalQuality.FAIR, SignalQuality.POOR]
+
+READING_FIELDS = ["deviceId", "userId", "timestamp", "glucoseValue", "confidence",
+                  "sensorData", "batteryLevel", "signalQuality"]
+SENSOR_FIELDS = ["red", "infrared", "green", "temperature", "motionArtifact"]
+
+# Same limits as the Field(...) constraints on GlucoseReadingCreate / SensorData
+ID_MAX_LENGTH = 50
+GLUCOSE_RANGE = (40, 400)
+BATTERY_RANGE = (0, 100)
+TEMPERATURE_RANGE = (30, 45)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class ReadingValidationError(ValueError):
+    """Raised with a list of errors in the same shape as Pydantic/FastAPI 422 details"""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+def _error(errors: list, loc: tuple, msg: str, error_type: str = "value_error"):
+    errors.append({"type": error_type, "loc": list(loc), "msg": msg})
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _check_id(errors: list, loc: tuple, value):
+    if not isinstance(value, str):
+        _error(errors, loc, "Input should be a valid string", "string_type")
+    elif not 1 <= len(value) <= ID_MAX_LENGTH:
+        _error(errors, loc, f"String should have between 1 and {ID_MAX_LENGTH} characters", "string_length")
+
+
+def _check_range(errors: list, loc: tuple, value, low, high, integer: bool = False):
+    if not (_is_int(value) if integer else _is_number(value)):
+        kind = "integer" if integer else "number"
+        _error(errors, loc, f"Input should be a valid {kind}", "int_type" if integer else "float_type")
+        return False
+    # Written as failed comparisons so NaN fails them too, as in Pydantic
+    if low is not None and not value >= low:
+        _error(errors, loc, f"Input should be greater than or equal to {low}", "greater_than_equal")
+        return False
+    if high is not None and not value <= high:
+        _error(errors, loc, f"Input should be less than or equal to {high}", "less_than_equal")
+        return False
+    return True
+
+
+def _timestamp(value) -> datetime:
+    """Epoch seconds to naive UTC, with the live-ingest future/age checks"""
+    return normalize_reading_timestamp(EPOCH + timedelta(seconds=value), max_age=READING_MAX_AGE)
+
+
+def _reading_errors(item, loc: tuple) -> List[dict]:
+    """Full per-field error list for a reading that failed the fast check"""
+    if not isinstance(item, (list, tuple)) or len(item) != len(READING_FIELDS):
+        return [{
+            "type": "list_type", "loc": list(loc),
+            "msg": f"Reading should be an array of {len(READING_FIELDS)} fields: {', '.join(READING_FIELDS)}",
+        }]
+
+    errors = []
+    device_id, user_id, timestamp, glucose, confidence, sensor, battery, quality = item
+
+    _check_id(errors, loc + ("deviceId",), device_id)
+    _check_id(errors, loc + ("userId",), user_id)
+
+    if not _is_number(timestamp):
+        _error(errors, loc + ("timestamp",), "Input should be UTC epoch seconds", "datetime_type")
+    else:
+        try:
+            _timestamp(timestamp)
+        except (ValueError, OverflowError) as e:
+            _error(errors, loc + ("timestamp",), f"Value error, {e}")
+
+    _check_range(errors, loc + ("glucoseValue",), glucose, *GLUCOSE_RANGE, integer=True)
+    # Per mille integer: never more than 3 decimal places once scaled
+    _check_range(errors, loc + ("confidence",), confidence, 0, 1000, integer=True)
+    _check_range(errors, loc + ("batteryLevel",), battery, *BATTERY_RANGE, integer=True)
+
+    if not _is_int(quality) or not 0 <= quality < len(SIGNAL_QUALITY_CODES):
+        _error(errors, loc + ("signalQuality",), "Input should be 0 (excellent), 1 (good), 2 (fair) or 3 (poor)", "enum")
+
+    sensor_loc = loc + ("sensorData",)
+    if not isinstance(sensor, (list, tuple)) or len(sensor) != len(SENSOR_FIELDS):
+        _error(errors, sensor_loc, f"sensorData should be an array of {len(SENSOR_FIELDS)} fields: {', '.join(SENSOR_FIELDS)}", "list_type")
+    else:
+        red, infrared, green, temperature, motion = sensor
+        _check_range(errors, sensor_loc + ("red",), red, 0, None)
+        _check_range(errors, sensor_loc + ("infrared",), infrared, 0, None)
+        _check_range(errors, sensor_loc + ("green",), green, 0, None)
+        _check_range(errors, sensor_loc + ("temperature",), temperature, *TEMPERATURE_RANGE)
+        if not isinstance(motion, bool):
+            _error(errors, sensor_loc + ("motionArtifact",), "Input should be a valid boolean", "bool_type")
+    return errors
+
+
+def _number(value) -> bool:
+    return type(value) is float or type(value) is int
+
+
+def decode_compact_reading(item, loc: tuple = ("body",)) -> GlucoseReadingCreate:
+    """
+    Validate one positional reading and return an equivalent GlucoseReadingCreate
+
+    The common case (a valid reading) is one chain of exact type and range
+    comparisons; the detailed per-field errors are only built on failure.
+    """
+    try:
+        device_id, user_id, timestamp, glucose, confidence, sensor, battery, quality = item
+        red, infrared, green, temperature, motion = sensor
+    except (TypeError, ValueError):
+        raise ReadingValidationError(_reading_errors(item, loc))
+
+    if not (
+        type(device_id) is str and 0 < len(device_id) <= ID_MAX_LENGTH
+        and type(user_id) is str and 0 < len(user_id) <= ID_MAX_LENGTH
+        and _number(timestamp)
+        and type(glucose) is int and GLUCOSE_RANGE[0] <= glucose <= GLUCOSE_RANGE[1]
+        and type(confidence) is int and 0 <= confidence <= 1000
+        and type(battery) is int and BATTERY_RANGE[0] <= battery <= BATTERY_RANGE[1]
+        and type(quality) is int and 0 <= quality < len(SIGNAL_QUALITY_CODES)
+        and _number(red) and red >= 0
+        and _number(infrared) and infrared >= 0
+        and _number(green) and green >= 0
+        and _number(temperature) and TEMPERATURE_RANGE[0] <= temperature <= TEMPERATURE_RANGE[1]
+        and type(motion) is bool
+    ):
+        raise ReadingValidationError(_reading_errors(item, loc))
+    try:
+        timestamp_value = _timestamp(timestamp)
+    except (ValueError, OverflowError):
+        raise ReadingValidationError(_reading_errors(item, loc))
+
+    return GlucoseReadingCreate.model_construct(
+        deviceId=device_id,
+        userId=user_id,
+        timestamp=timestamp_value,
+        glucoseValue=glucose,
+        confidence=confidence / 1000,
+        sensorData=SensorData.model_construct(
+            red=float(red), infrared=float(infrared), green=float(green),
+            temperature=float(temperature), motionArtifact=motion,
+        ),
+        batteryLevel=battery,
+        signalQuality=SIGNAL_QUALITY_CODES[quality],
+    )
+
+
+def encode_compact_reading(reading: dict) -> list:
+    """Convert a JSON-style reading dict into the positional form (for clients and tests)"""
+    timestamp = reading["timestamp"]
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    sensor = reading["sensorData"]
+    return [
+        reading["deviceId"],
+        reading["userId"],
+        timestamp.timestamp(),
+        reading["glucoseValue"],
+        round(reading["confidence"] * 1000),
+        [sensor[field] for field in SENSOR_FIELDS],
+        reading["batteryLevel"],
+        SIGNAL_QUALITY_CODES.index(SignalQuality(reading["signalQuality"])),
+    ]
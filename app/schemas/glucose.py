@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
 from enum import Enum
 
 class SignalQuality(str, Enum):
@@ -16,6 +16,37 @@ class SensorData(BaseModel):
     temperature: float = Field(..., ge=30, le=45, description="Temperature in Celsius (30-45°C)")
     motionArtifact: bool = Field(..., description="Whether motion artifact was detected")
 
+# Live ingest rejects readings older than this (bulk import has no limit)
+READING_MAX_AGE = timedelta(hours=72)
+
+def normalize_reading_timestamp(v: datetime, max_age: Optional[timedelta] = None) -> datetime:
+    """
+    Convert a reading timestamp to naive UTC and reject future (or, if max_age
+    is given, too old) values
+    """
+    # Convert both timestamps to UTC naive for comparison
+    if v.tzinfo is not None:
+        # If timezone-aware, convert to UTC then make naive
+        v_naive = v.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        # If naive, assume it's already in UTC
+        v_naive = v
+        
+    current_time = datetime.utcnow()
+    
+    # Check if timestamp is in the future (allowing small buffer for clock skew)
+    if v_naive > (current_time + timedelta(minutes=5)):
+        raise ValueError(f'timestamp {v_naive} cannot be in the future (current UTC: {current_time})')
+    
+    # Check if timestamp is too old (older than 72 hours for live ingest)
+    if max_age is not None:
+        oldest_allowed = current_time - max_age
+        if v_naive < oldest_allowed:
+            hours = int(max_age.total_seconds() // 3600)
+            raise ValueError(f'timestamp {v_naive} is too old. Readings older than {hours} hours are not accepted (oldest allowed: {oldest_allowed})')
+    
+    return v_naive  # Return naive datetime for database compatibility
+
 class GlucoseReadingCreate(BaseModel):
     deviceId: str = Field(..., min_length=1, max_length=50, description="Device identifier")
     userId: str = Field(..., min_length=1, max_length=50, description="User identifier")
@@ -29,28 +60,7 @@ class GlucoseReadingCreate(BaseModel):
     @validator('timestamp')
     def validate_timestamp_not_future_or_too_old(cls, v):
         """Ensure timestamp is not in the future and not too old - handle both naive and aware datetimes"""
-        from datetime import timezone, timedelta
-        
-        # Convert both timestamps to UTC naive for comparison
-        if v.tzinfo is not None:
-            # If timezone-aware, convert to UTC then make naive
-            v_naive = v.astimezone(timezone.utc).replace(tzinfo=None)
-        else:
-            # If naive, assume it's already in UTC
-            v_naive = v
-            
-        current_time = datetime.utcnow()
-        
-        # Check if timestamp is in the future (allowing small buffer for clock skew)
-        if v_naive > (current_time + timedelta(minutes=5)):
-            raise ValueError(f'timestamp {v_naive} cannot be in the future (current UTC: {current_time})')
-        
-        # Check if timestamp is too old (older than 72 hours)
-        oldest_allowed = current_time - timedelta(hours=72)
-        if v_naive < oldest_allowed:
-            raise ValueError(f'timestamp {v_naive} is too old. Readings older than 72 hours are not accepted (oldest allowed: {oldest_allowed})')
-        
-        return v_naive  # Return naive datetime for database compatibility
+        return normalize_reading_timestamp(v, max_age=READING_MAX_AGE)
     
     @validator('glucoseValue')
     def validate_glucose_range(cls, v):
@@ -68,11 +78,30 @@ class GlucoseReadingCreate(BaseModel):
             raise ValueError('confidence should not have more than 3 decimal places')
         return v
 
+class GlucoseReadingImport(GlucoseReadingCreate):
+    """Historical reading for bulk import: same rules as live ingest without the 72 hour age limit"""
+
+    @validator('timestamp')
+    def validate_timestamp_not_future_or_too_old(cls, v):
+        """Ensure timestamp is not in the future; any age is accepted for backfill"""
+        return normalize_reading_timestamp(v)
+
 class GlucoseReadingResponse(BaseModel):
     status: str
     id: Optional[str] = None
     message: Optional[str] = None
 
+class RejectedReading(BaseModel):
+    index: int
+    errors: List[dict]
+
+class GlucoseBatchResponse(BaseModel):
+    status: str
+    accepted: int
+    duplicates: int
+    ids: List[str] = []
+    rejected: List[RejectedReading] = []
+
 class CurrentGlucoseReading(BaseModel):
     id: str
     userId: str
@@ -91,4 +120,28 @@ class AnalyticsSummary(BaseModel):
     averageGlucose: float
     timeInRange: dict
     totalReadings: int
-    alertsTriggered: int 
\ No newline at end of file
+    alertsTriggered: int
+
+class PatientDashboardRequest(BaseModel):
+    """Clinician dashboard request: the patients currently being watched"""
+    userIds: List[str] = Field(..., min_length=1, max_length=500, description="User IDs (1-500)")
+
+class PatientSnapshot(BaseModel):
+    """Latest state of one patient for the clinician dashboard"""
+    userId: str
+    reading: Optional[CurrentGlucoseReading] = None
+    rateOfChange: Optional[float] = None      # mg/dL per minute vs. previous reading
+    trend: Optional[str] = None               # e.g. rising_rapidly, steady, falling
+    trendArrow: Optional[str] = None          # ↑↑ ↑ ↗ → ↘ ↓ ↓↓
+    glucoseStatus: Optional[str] = None       # low, normal, high
+    activeAlerts: List[str] = []              # unacknowledged + current threshold alerts
+
+class CohortAnalytics(BaseModel):
+    """Persisted population metrics snapshot"""
+    periodDays: int
+    periodStart: date
+    periodEnd: date
+    usersCount: int
+    readingsCount: int
+    metrics: dict
+    computedAt: datetime
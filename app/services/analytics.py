@@ -0,0 +1,66 @@
+"""
+Daily glucose analytics rollups
+
+Maintains the ``glucose_analytics`` table (one row per user per day) from the
+raw readings in ``glucose_readings``. A rebuilt day without readings gets a
+row with ``readings_count = 0`` (and NULL statistics), so it is known to be
+empty instead of looking unbuilt.
+"""
+from datetime import date
+from typing import Iterable, Tuple
+
+# Normal glucose range used for time-in-range (mg/dL)
+TARGET_RANGE_LOW = 70
+TARGET_RANGE_HIGH = 180
+
+REBUILD_DAILY_ANALYTICS_QUERY = f"""
+    INSERT INTO glucose_analytics (
+        user_id, date, avg_glucose, min_glucose, max_glucose,
+        time_in_range_percent, readings_count, estimated_a1c, glucose_variability
+    )
+    SELECT
+        a.user_id,
+        a.day,
+        ROUND(AVG(r.glucose_value), 2),
+        MIN(r.glucose_value),
+        MAX(r.glucose_value),
+        ROUND(COUNT(r.glucose_value) FILTER (WHERE r.glucose_value BETWEEN {TARGET_RANGE_LOW} AND {TARGET_RANGE_HIGH}) * 100.0
+              / NULLIF(COUNT(r.glucose_value), 0), 2),
+        COUNT(r.glucose_value),
+        ROUND((AVG(r.glucose_value) + 46.7) / 28.7, 2),  -- ADAG estimated A1c
+        CASE WHEN COUNT(r.glucose_value) > 0 THEN ROUND(COALESCE(STDDEV_SAMP(r.glucose_value), 0), 2) END
+    FROM unnest($1::varchar[], $2::date[]) AS a(user_id, day)
+    LEFT JOIN glucose_readings r
+      ON r.user_id = a.user_id
+     AND r.timestamp >= a.day
+     AND r.timestamp < a.day + 1
+    GROUP BY a.user_id, a.day
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        avg_glucose = EXCLUDED.avg_glucose,
+        min_glucose = EXCLUDED.min_glucose,
+        max_glucose = EXCLUDED.max_glucose,
+        time_in_range_percent = EXCLUDED.time_in_range_percent,
+        readings_count = EXCLUDED.readings_count,
+        estimated_a1c = EXCLUDED.estimated_a1c,
+        glucose_variability = EXCLUDED.glucose_variability
+"""
+
+
+async def rebuild_daily_analytics(connection, user_days: Iterable[Tuple[str, date]], chunk_size: int = 5000) -> int:
+    """
+    Recompute glucose_analytics rows for the given (user_id, date) pairs
+
+    Uses the idx_glucose_readings_user_timestamp index for each day range.
+
+    Returns:
+        int: Number of (user_id, date) pairs processed
+    """
+    pairs = sorted(set(user_days))
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        await connection.execute(
+            REBUILD_DAILY_ANALYTICS_QUERY,
+            [user_id for user_id, _ in chunk],
+            [day for _, day in chunk],
+        )
+    return len(pairs)
@@ -0,0 +1,249 @@
+"""
+Population / cohort analytics
+
+Computes population metrics across all users for a window of complete days:
+- distribution of per-user time in range (TIR)
+- hypoglycemia rates by age band, BMI band and skin tone
+- low-quality reading (error) rates per device firmware version
+
+Users are partitioned into chunks that are aggregated concurrently, each on
+its own pooled connection of the shard that owns them; all shards work at the
+same time and their partial aggregates are merged. Per-user glucose statistics
+come from the daily ``glucose_analytics`` rollups. A chunk first builds the
+rollups it lacks (days without readings get an empty row) and rebuilds the
+last days of the window that late readings can still reach (live ingest
+accepts readings up to ``READING_MAX_AGE`` old). Older complete days are thus
+scanned once; recent ones on every run. Results are persisted in
+``cohort_analytics`` (on the primary shard) and served from there instead of
+being recomputed per request.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.core.database import database
+from app.schemas.glucose import READING_MAX_AGE
+from app.services.analytics import rebuild_daily_analytics
+
+# Thresholds for hypoglycemia (mg/dL)
+HYPO_LEVEL_1 = 70
+HYPO_LEVEL_2 = 54
+
+AGE_BANDS = [(0, 18, "<18"), (18, 40, "18-39"), (40, 65, "40-64"), (65, 200, "65+")]
+BMI_BANDS = [(0, 18.5, "underweight"), (18.5, 25, "normal"), (25, 30, "overweight"), (30, 1000, "obese")]
+
+# Trailing days before today that late live readings can still change
+LATE_READING_DAYS = math.ceil(READING_MAX_AGE / timedelta(days=1))
+
+EXISTING_ROLLUPS_QUERY = """
+    SELECT user_id, date FROM glucose_analytics
+    WHERE user_id = ANY($1::varchar[]) AND date >= $2 AND date < $3
+"""
+
+USER_SUMMARY_QUERY = f"""
+    SELECT u.user_id, u.age, u.bmi::float8 AS bmi, u.skin_tone,
+           COUNT(*) FILTER (WHERE a.readings_count > 0) AS user_days,
+           COALESCE(SUM(a.readings_count), 0) AS readings,
+           SUM(a.avg_glucose * a.readings_count)::float8 AS glucose_sum,
+           SUM(a.time_in_range_percent * a.readings_count)::float8 AS tir_weighted,
+           COUNT(*) FILTER (WHERE a.min_glucose < {HYPO_LEVEL_1}) AS hypo_days,
+           COUNT(*) FILTER (WHERE a.min_glucose < {HYPO_LEVEL_2}) AS severe_hypo_days
+    FROM users u
+    LEFT JOIN glucose_analytics a
+      ON a.user_id = u.user_id AND a.date >= $2 AND a.date < $3
+    WHERE u.user_id = ANY($1::varchar[])
+    GROUP BY u.user_id, u.age, u.bmi, u.skin_tone
+"""
+
+# A reading counts as an error when the device itself flagged it as unreliable
+FIRMWARE_QUERY = """
+    SELECT COALESCE(d.firmware_version, 'unknown') AS firmware_version,
+           COUNT(*) AS readings,
+           COUNT(*) FILTER (WHERE r.signal_quality = 'poor' OR r.confidence < 0.75) AS low_quality,
+           COUNT(*) FILTER (WHERE (r.sensor_data->>'motionArtifact')::boolean) AS motion_artifacts
+    FROM glucose_readings r
+    JOIN devices d ON d.device_id = r.device_id
+    WHERE r.user_id = ANY($1::varchar[]) AND r.timestamp >= $2 AND r.timestamp < $3
+    GROUP BY 1
+"""
+
+
+def _band(value, bands) -> str:
+    if value is None:
+        return "unknown"
+    for low, high, label in bands:
+        if low <= value < high:
+            return label
+    return "unknown"
+
+
+async def _process_chunk(shard: int, user_ids: List[str], start: date, end: date, semaphore: asyncio.Semaphore) -> dict:
+    """Bring rollups up to date for one chunk of users and return its partial aggregates"""
+    settled_until = max(start, end - timedelta(days=LATE_READING_DAYS))
+    async with semaphore:
+        async with database.pools[shard].acquire() as connection:
+            existing = {(r["user_id"], r["date"]) for r in await connection.fetch(EXISTING_ROLLUPS_QUERY, user_ids, start, end)}
+            stale = [
+                (user_id, day)
+                for user_id in user_ids
+                for day in (start + timedelta(days=offset) for offset in range((end - start).days))
+                if day >= settled_until or (user_id, day) not in existing
+            ]
+            if stale:
+                await rebuild_daily_analytics(connection, stale)
+
+            users = await connection.fetch(USER_SUMMARY_QUERY, user_ids, start, end)
+            firmware = await connection.fetch(
+                FIRMWARE_QUERY, user_ids,
+                datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time()),
+            )
+    return {"users": users, "firmware": firmware}
+
+
+def _merge(chunks: List[dict], start: date, end: date) -> dict:
+    """Combine per-chunk partial aggregates into the final metrics document"""
+    tir_histogram = [0] * 10  # 0-10%, ..., 90-100%
+    tir_values = []
+    groups: Dict[str, Dict[str, dict]] = {"age": {}, "bmi": {}, "skin_tone": {}}
+    firmware: Dict[str, dict] = defaultdict(lambda: {"readings": 0, "low_quality": 0, "motion_artifacts": 0})
+    total_readings = 0
+    glucose_sum = 0.0
+    users_with_data = 0
+
+    for chunk in chunks:
+        for row in chunk["users"]:
+            if not row["readings"]:
+                continue
+            users_with_data += 1
+            total_readings += row["readings"]
+            glucose_sum += row["glucose_sum"] or 0.0
+            tir = (row["tir_weighted"] or 0.0) / row["readings"]
+            tir_values.append(tir)
+            tir_histogram[min(int(tir // 10), 9)] += 1
+
+            keys = {
+                "age": _band(row["age"], AGE_BANDS),
+                "bmi": _band(row["bmi"], BMI_BANDS),
+                "skin_tone": row["skin_tone"] or "unknown",
+            }
+            for dimension, key in keys.items():
+                group = groups[dimension].setdefault(key, {"users": 0, "user_days": 0, "hypo_days": 0, "severe_hypo_days": 0})
+                group["users"] += 1
+                group["user_days"] += row["user_days"]
+                group["hypo_days"] += row["hypo_days"]
+                group["severe_hypo_days"] += row["severe_hypo_days"]
+        for row in chunk["firmware"]:
+            stats = firmware[row["firmware_version"]]
+            stats["readings"] += row["readings"]
+            stats["low_quality"] += row["low_quality"]
+            stats["motion_artifacts"] += row["motion_artifacts"]
+
+    hypo_rates = {}
+    for dimension, buckets in groups.items():
+        hypo_rates[dimension] = {
+            key: {
+                **group,
+                # Hypoglycemic days per 100 monitored user-days
+                "hypo_days_per_100": round(group["hypo_days"] * 100 / group["user_days"], 2) if group["user_days"] else 0.0,
+                "severe_hypo_days_per_100": round(group["severe_hypo_days"] * 100 / group["user_days"], 2) if group["user_days"] else 0.0,
+            }
+            for key, group in sorted(buckets.items())
+        }
+
+    tir_values.sort()
+    return {
+        "period_start": start.isoformat(),
+        "period_end": end.isoformat(),
+        "users_with_data": users_with_data,
+        "readings": total_readings,
+        "average_glucose": round(glucose_sum / total_readings, 1) if total_readings else 0.0,
+        "time_in_range": {
+            "mean": round(sum(tir_values) / len(tir_values), 1) if tir_values else 0.0,
+            "median": round(tir_values[len(tir_values) // 2], 1) if tir_values else 0.0,
+            "histogram": {f"{i * 10}-{i * 10 + 10}": count for i, count in enumerate(tir_histogram)},
+        },
+        "hypoglycemia": hypo_rates,
+        "firmware": {
+            version: {
+                **stats,
+                "error_rate": round(stats["low_quality"] / stats["readings"], 4) if stats["readings"] else 0.0,
+            }
+            for version, stats in sorted(firmware.items())
+        },
+    }
+
+
+async def compute_cohort_analytics(period_days: int, chunk_size: int = 500, concurrency: int = 4) -> dict:
+    """
+    Compute and persist population metrics for the last period_days complete days
+
+    Returns:
+        dict: The persisted snapshot (same shape as get_latest_cohort_analytics)
+    """
+    started = time.perf_counter()
+    end = datetime.utcnow().date()  # exclusive: today is still incomplete
+    start = end - timedelta(days=period_days)
+
+    # A user being moved by rebalance_shards can briefly exist on two shards;
+    # only the shard that owns it counts it
+    shard_users = await database.fan_out(
+        lambda pool: pool.fetch("SELECT user_id FROM users ORDER BY user_id")
+    )
+    user_ids_by_shard = {
+        shard: [row["user_id"] for row in rows if database.router.shard_for(row["user_id"]) == shard]
+        for shard, rows in enumerate(shard_users)
+    }
+    user_ids = [user_id for ids in user_ids_by_shard.values() for user_id in ids]
+
+    # concurrency applies per shard: each shard is its own server
+    semaphores = {shard: asyncio.Semaphore(concurrency) for shard in user_ids_by_shard}
+    chunks = await asyncio.gather(*[
+        _process_chunk(shard, ids[i:i + chunk_size], start, end, semaphores[shard])
+        for shard, ids in user_ids_by_shard.items()
+        for i in range(0, len(ids), chunk_size)
+    ])
+    metrics = _merge(chunks, start, end)
+    metrics["elapsed_s"] = round(time.perf_counter() - started, 2)
+
+    async with database.pool.acquire() as connection:
+        row = await connection.fetchrow(
+            """
+            INSERT INTO cohort_analytics (period_days, period_start, period_end, users_count, readings_count, metrics)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING period_days, period_start, period_end, users_count, readings_count, metrics, computed_at
+            """,
+            period_days, start, end, len(user_ids), metrics["readings"], json.dumps(metrics)
+        )
+    print(f"📊 Cohort analytics ({period_days}d) computed for {len(user_ids)} users in {metrics['elapsed_s']}s")
+    return _snapshot(row)
+
+
+async def get_latest_cohort_analytics(period_days: int) -> Optional[dict]:
+    async with database.pool.acquire() as connection:
+        row = await connection.fetchrow(
+            """
+            SELECT period_days, period_start, period_end, users_count, readings_count, metrics, computed_at
+            FROM cohort_analytics
+            WHERE period_days = $1
+            ORDER BY computed_at DESC
+            LIMIT 1
+            """,
+            period_days
+        )
+    return _snapshot(row) if row else None
+
+
+def _snapshot(row) -> dict:
+    return {
+        "periodDays": row["period_days"],
+        "periodStart": row["period_start"],
+        "periodEnd": row["period_end"],
+        "usersCount": row["users_count"],
+        "readingsCount": row["readings_count"],
+        "metrics": json.loads(row["metrics"]),
+        "computedAt": row["computed_at"],
+    }
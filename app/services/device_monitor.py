@@ -0,0 +1,222 @@
+"""
+Device offline and low-battery detection
+
+Ingest records each device in two Redis sorted sets:
+- ``devices:last_seen`` scored by the time the last reading arrived
+- ``devices:battery`` scored by the last reported battery level
+
+A periodic sweep pops members past the offline cutoff or below the battery
+threshold and writes ``device_offline`` / ``battery_low`` rows to
+``alert_history``. Ingest costs O(log n) per reading and a sweep costs
+O(log n + k) for k expired devices, independent of fleet size.
+
+The range read and the removal run in one Lua script, so concurrent sweeps in
+several workers never pop the same member, and a reading recorded during the
+sweep is either seen (new score, not popped) or recorded after the pop. If the
+alerts cannot be stored, the popped members are added back (without
+overwriting newer scores) and the next sweep retries them. Alerts are thus
+stored at least once: a batch that failed on one shard is repeated on all.
+While the Redis circuit breaker is open, tracking and sweeps are skipped. An
+offline device is alerted once until it reports again; low-battery alerts are
+additionally deduplicated for ``battery_alert_cooldown`` seconds.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import database
+from app.core.redis_client import redis_client
+
+LAST_SEEN_KEY = "devices:last_seen"
+BATTERY_KEY = "devices:battery"
+BATTERY_DEDUP_KEY = "alert_dedup:battery_low:{device_id}"
+
+# Atomically remove and return up to ARGV[3] members scored in [ARGV[1], ARGV[2]]
+POP_RANGE_SCRIPT = """
+local popped = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2], 'WITHSCORES', 'LIMIT', 0, ARGV[3])
+for i = 1, #popped, 2 do
+    redis.call('ZREM', KEYS[1], popped[i])
+end
+return popped
+"""
+
+INSERT_ALERTS_QUERY = """
+    INSERT INTO alert_history (user_id, device_id, alert_type, threshold_value, message, severity)
+    SELECT d.user_id, t.device_id, t.alert_type, t.threshold_value, t.message, t.severity
+    FROM unnest($1::varchar[], $2::varchar[], $3::float8[], $4::text[], $5::varchar[])
+         AS t(device_id, alert_type, threshold_value, message, severity)
+    JOIN devices d ON d.device_id = t.device_id
+    RETURNING device_id
+"""
+
+
+class DeviceMonitor:
+    def __init__(self, interval: float, offline_after: int, battery_threshold: int,
+                 battery_cooldown: int, batch_size: int = 1000):
+        self.interval = interval
+        self.offline_after = offline_after
+        self.battery_threshold = battery_threshold
+        self.battery_cooldown = battery_cooldown
+        self.batch_size = batch_size
+        self.alerts_emitted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def record_reading(self, device_id: str, battery_level: int):
+        """Update the device's last-seen time and battery level (one pipelined round trip)"""
+        if not redis_client.available:
+            return
+
+        def record(client):
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(LAST_SEEN_KEY, {device_id: time.time()})
+            pipe.zadd(BATTERY_KEY, {device_id: battery_level})
+            return pipe.execute()
+
+        await redis_client.run(record)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print("✅ Device monitor started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            print("🔌 Device monitor stopped")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Device monitor sweep failed: {e}")
+
+    async def sweep(self) -> int:
+        """Pop expired/low-battery devices and emit their alerts"""
+        if not redis_client.available:
+            return 0
+        emitted = 0
+        cutoff = time.time() - self.offline_after
+        try:
+            while True:
+                offline = await self._pop_range(LAST_SEEN_KEY, "-inf", cutoff)
+                emitted += await self._emit_or_restore(LAST_SEEN_KEY, offline, self._emit_offline)
+                if len(offline) < self.batch_size:
+                    break
+            while True:
+                # Exclusive upper bound: below the threshold
+                low = await self._pop_range(BATTERY_KEY, "-inf", f"({self.battery_threshold}")
+                emitted += await self._emit_or_restore(BATTERY_KEY, low, self._emit_battery_low)
+                if len(low) < self.batch_size:
+                    break
+        finally:
+            self.alerts_emitted += emitted
+        return emitted
+
+    async def _pop_range(self, key: str, low, high) -> List[tuple]:
+        """Atomically remove and return up to batch_size (member, score) pairs in the score range"""
+        popped = await redis_client.eval(POP_RANGE_SCRIPT, keys=[key], args=[low, high, self.batch_size])
+        return [(popped[i], float(popped[i + 1])) for i in range(0, len(popped), 2)]
+
+    async def _emit_or_restore(self, key: str, devices: List[tuple], emit) -> int:
+        """Emit alerts for popped members; put the members back if the alerts could not be stored"""
+        try:
+            return await emit(devices)
+        except Exception:
+            try:
+                # NX: a reading recorded since the pop already re-added the device
+                await redis_client.run(lambda client: client.zadd(key, dict(devices), nx=True))
+            except Exception as e:
+                print(f"⚠️ Could not restore {len(devices)} device(s) to {key}: {e}")
+            raise
+
+    async def _emit_offline(self, devices: List[tuple]) -> int:
+        if not devices:
+            return 0
+        now = time.time()
+        alerts = []
+        for device_id, last_seen in devices:
+            minutes = (now - last_seen) / 60
+            message = f"📴 DEVICE OFFLINE ALERT for {device_id}: no readings for {minutes:.0f} minutes"
+            logging.warning(message)
+            alerts.append((device_id, "device_offline", self.offline_after / 60, message, "high"))
+        return await self._store_alerts(alerts)
+
+    async def _emit_battery_low(self, devices: List[tuple]) -> int:
+        if not devices:
+            return 0
+        def claim(client):
+            pipe = client.pipeline(transaction=False)
+            for device_id, _ in devices:
+                pipe.set(BATTERY_DEDUP_KEY.format(device_id=device_id), "1", nx=True, ex=self.battery_cooldown)
+            return pipe.execute()
+
+        fresh = await redis_client.run(claim)
+        alerts = []
+        for (device_id, level), is_new in zip(devices, fresh):
+            if not is_new:
+                continue
+            severity = "critical" if level < 5 else "medium"
+            message = f"🪫 BATTERY LOW ALERT for {device_id}: {level:.0f}% (threshold: {self.battery_threshold}%)"
+            logging.warning(message)
+            alerts.append((device_id, "battery_low", self.battery_threshold, message, severity))
+        try:
+            return await self._store_alerts(alerts)
+        except Exception:
+            # Release the cooldown so the retried sweep alerts these devices
+            dedup_keys = [BATTERY_DEDUP_KEY.format(device_id=alert[0]) for alert in alerts]
+            if dedup_keys:
+                await redis_client.run(lambda client: client.delete(*dedup_keys))
+            raise
+
+    async def _store_alerts(self, alerts: List[tuple]) -> int:
+        """Insert alert rows; raises unless every shard stored its rows"""
+        if not alerts:
+            return 0
+        if not database.pool:
+            raise RuntimeError("Database is not connected")
+        # Alert rows go to the shard of the device's owner
+        by_shard: Dict[int, List[tuple]] = {}
+        for alert in alerts:
+            shard = await database.shard_for_device(alert[0])
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(alert)
+
+        async def store(shard: int, shard_alerts: List[tuple]) -> List[tuple]:
+            """Insert one shard's alerts; returns those whose device is not on the shard"""
+            columns = list(zip(*shard_alerts))
+            async with database.pools[shard].acquire() as connection:
+                rows = await connection.fetch(INSERT_ALERTS_QUERY, *[list(column) for column in columns])
+            stored = {row["device_id"] for row in rows}
+            return [alert for alert in shard_alerts if alert[0] not in stored]
+
+        missing = await asyncio.gather(*[store(shard, shard_alerts) for shard, shard_alerts in by_shard.items()])
+        stored = sum(len(shard_alerts) for shard_alerts in by_shard.values())
+
+        # A stale cached owner routed these to the wrong shard; store them where the device is now
+        moved: Dict[int, List[tuple]] = {}
+        for shard, shard_missing in zip(by_shard, missing):
+            stored -= len(shard_missing)
+            for alert in shard_missing:
+                moved_to = await database.refresh_device_shard(alert[0], shard)
+                if moved_to is not None:
+                    moved.setdefault(moved_to, []).append(alert)
+        await asyncio.gather(*[store(shard, shard_alerts) for shard, shard_alerts in moved.items()])
+        return stored + sum(len(shard_alerts) for shard_alerts in moved.values())
+
+
+# Global device monitor instance
+device_monitor = DeviceMonitor(
+    interval=settings.device_monitor_interval,
+    offline_after=settings.device_offline_after,
+    battery_threshold=settings.battery_low_threshold,
+    battery_cooldown=settings.battery_alert_cooldown,
+)
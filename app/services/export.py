@@ -0,0 +1,221 @@
+"""
+Columnar export of glucose readings (Arrow IPC / Parquet)
+
+Readings are read in large chunks (asyncpg uses the binary protocol, so
+values arrive already typed), sensor channels are flattened in SQL, and every
+chunk becomes one Arrow record batch that is written out immediately. Memory
+use is bounded by the chunk size, not by the size of the result.
+
+The streamed API export (``stream_export``) is paced by the client, so it
+reads keyset pages, each on a connection that goes back to the pool before
+the page is sent: a slow or stalled download holds neither a connection nor
+an open transaction. Pages are separate snapshots; readings committed during
+the export may or may not be included. File exports (``export_to_file``) run
+on a dedicated connection and use a server-side cursor.
+
+With several shards, each shard's users are read from that shard in turn, so
+rows are ordered by user and time within each shard.
+
+pyarrow is imported lazily so the API process only pays for it when an export
+is actually requested.
+"""
+import io
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+from app.core.database import database
+
+EXPORT_FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = """
+    SELECT user_id,
+           device_id,
+           timestamp,
+           glucose_value,
+           confidence::float8 AS confidence,
+           (sensor_data->>'red')::float8 AS red,
+           (sensor_data->>'infrared')::float8 AS infrared,
+           (sensor_data->>'green')::float8 AS green,
+           (sensor_data->>'temperature')::float8 AS temperature,
+           (sensor_data->>'motionArtifact')::boolean AS motion_artifact,
+           battery_level,
+           signal_quality
+    FROM glucose_readings"""
+
+EXPORT_QUERY = EXPORT_COLUMNS + """
+    WHERE user_id = ANY($1::varchar[])
+      AND timestamp >= $2 AND timestamp < $3
+    ORDER BY user_id, timestamp
+"""
+
+# One page after the (user_id, timestamp, device_id) key of the previous page's
+# last row; the key is unique because (device_id, timestamp) is
+EXPORT_PAGE_QUERY = EXPORT_COLUMNS + """
+    WHERE user_id = ANY($1::varchar[])
+      AND timestamp >= $2 AND timestamp < $3
+      AND (user_id, timestamp, device_id) > ($4, $5, $6)
+    ORDER BY user_id, timestamp, device_id
+    LIMIT $7
+"""
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Columnar export requires pyarrow (pip install pyarrow)") from e
+    return pa, pq
+
+
+def export_schema():
+    pa, _ = _arrow()
+    return pa.schema([
+        ("user_id", pa.string()),
+        ("device_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("glucose_value", pa.int16()),
+        ("confidence", pa.float32()),
+        ("red", pa.float64()),
+        ("infrared", pa.float64()),
+        ("green", pa.float64()),
+        ("temperature", pa.float32()),
+        ("motion_artifact", pa.bool_()),
+        ("battery_level", pa.int8()),
+        ("signal_quality", pa.dictionary(pa.int8(), pa.string())),
+    ])
+
+
+def rows_to_batch(rows, schema):
+    """Convert a chunk of asyncpg records into one Arrow record batch"""
+    pa, _ = _arrow()
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode().cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def iter_reading_batches(connection, user_ids: List[str], start: datetime, end: datetime,
+                               chunk_size: int = 50000) -> AsyncIterator:
+    """Yield Arrow record batches of readings for the users and [start, end) range"""
+    schema = export_schema()
+    # Server-side cursors must live inside a transaction
+    async with connection.transaction(readonly=True):
+        cursor = await connection.cursor(EXPORT_QUERY, user_ids, start, end, prefetch=chunk_size)
+        while True:
+            rows = await cursor.fetch(chunk_size)
+            if not rows:
+                break
+            yield rows_to_batch(rows, schema)
+
+
+async def iter_sharded_batches(user_ids: List[str], start: datetime, end: datetime,
+                               chunk_size: int = 50000) -> AsyncIterator:
+    """Record batches for users on any shard, one keyset page per pool acquire"""
+    schema = export_schema()
+    for shard, shard_user_ids in database.router.group(user_ids).items():
+        after = ("", start, "")  # user IDs are never empty
+        while True:
+            async with database.pools[shard].acquire() as connection:
+                rows = await connection.fetch(EXPORT_PAGE_QUERY, shard_user_ids, start, end, *after, chunk_size)
+            if not rows:
+                break
+            last = rows[-1]
+            after = (last["user_id"], last["timestamp"], last["device_id"])
+            yield rows_to_batch(rows, schema)
+            if len(rows) < chunk_size:
+                break
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class BatchWriter:
+    """Incremental Arrow IPC stream / Parquet writer over any file-like sink"""
+
+    def __init__(self, sink, export_format: str):
+        pa, pq = _arrow()
+        schema = export_schema()
+        if export_format == "parquet":
+            self.writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        elif export_format == "arrow":
+            self.writer = pa.ipc.new_stream(sink, schema)
+        else:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        self.rows = 0
+
+    def write(self, batch):
+        # Parquet gets one row group per batch
+        self.writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        self.writer.close()
+
+
+async def stream_export(user_ids: List[str], start: datetime, end: datetime,
+                        export_format: str, chunk_size: int = 50000) -> AsyncIterator[bytes]:
+    """Yield the encoded export as byte chunks, one per record batch"""
+    sink = _ChunkSink()
+    writer = BatchWriter(sink, export_format)
+    async for batch in iter_sharded_batches(user_ids, start, end, chunk_size):
+        writer.write(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+async def export_to_file(connection, path: str, user_ids: List[str], start: datetime, end: datetime,
+                         export_format: str, chunk_size: int = 50000) -> int:
+    """Write an export to a local file and return the number of rows written"""
+    with open(path, "wb") as sink:
+        writer = BatchWriter(sink, export_format)
+        try:
+            async for batch in iter_reading_batches(connection, user_ids, start, end, chunk_size):
+                writer.write(batch)
+        finally:
+            writer.close()
+    return writer.rows
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC: convert aware values, keep naive ones as UTC"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_user_ids(value: Optional[str]) -> List[str]:
+    return [user_id.strip() for user_id in (value or "").split(",") if user_id.strip()]
@@ -0,0 +1,219 @@
+"""
+Per-user data versions for conditional GET and response caching
+
+Each user has a version in Redis (``data_version:{user_id}``, a hash with the
+version ``v`` and the time of the last change ``ts``) that is bumped after new
+readings are committed. History and analytics responses derive their ``ETag``
+and ``Last-Modified`` from it, so a client's ``If-None-Match`` is answered with
+304 from Redis alone, and serialized analytics are cached under
+(user, period, version, window). The ETag also carries a hash of the request
+path and query, so a tag from one endpoint or period never matches another.
+
+``If-Modified-Since`` is not evaluated: ``Last-Modified`` has one-second
+granularity while a user's version changes several times a second, so a
+304 for the same second could hide new readings. Clients revalidate with the
+ETag; ``Last-Modified`` is informational.
+
+Period windows ("last 7 days") end on ``read_window_alignment`` boundaries.
+A response is then fully determined by the user's version and the window, so
+a cached response or a 304 is never stale: new readings change the version
+and the passage of time moves the window.
+
+Versions start at the current time in microseconds, not at 1, so a version can
+never repeat after Redis loses a key. That also lets the versions a read
+creates for users without one expire after ``data_version_read_ttl``: reads
+for arbitrary user IDs cannot grow Redis without bound. A bump makes the key
+persistent. Without Redis (or while its circuit
+breaker is open) there are no validators and every request goes to Postgres.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from typing import Iterable, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.redis_client import RedisUnavailableError, redis_client
+
+VERSION_KEY = "data_version:{user_id}"
+EPOCH_KEY = "data_version_epoch"
+EPOCH_AT_KEY = "data_version_epoch_at"
+ANALYTICS_CACHE_KEY = "analytics_cache:{user_id}:{period}:{version}:{window}"
+
+EPOCH = datetime(1970, 1, 1)
+
+# Create the version if missing, otherwise increment it; record the change time
+BUMP_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], 'v', ARGV[1]) == 0 then
+    redis.call('HINCRBY', KEYS[1], 'v', 1)
+end
+redis.call('HSET', KEYS[1], 'ts', ARGV[2])
+redis.call('PERSIST', KEYS[1])
+return redis.call('HGET', KEYS[1], 'v')
+"""
+
+# Read the version (creating it, with a TTL, for users without one yet), the
+# global epoch and when it last advanced
+GET_SCRIPT = """
+local epoch = redis.call('GET', KEYS[2]) or '0'
+local epoch_at = redis.call('GET', KEYS[3]) or '0'
+local v = redis.call('HGET', KEYS[1], 'v')
+if not v then
+    redis.call('HSET', KEYS[1], 'v', ARGV[1], 'ts', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return {ARGV[1], ARGV[2], epoch, epoch_at}
+end
+return {v, redis.call('HGET', KEYS[1], 'ts'), epoch, epoch_at}
+"""
+
+
+class DataVersion(NamedTuple):
+    version: int
+    modified_at: float  # epoch seconds of the last change
+    epoch: int = 0      # global; bumped after versions may have missed changes
+    epoch_at: float = 0.0  # epoch seconds when the global epoch last advanced
+
+
+def _epoch(naive_utc: datetime) -> int:
+    return int((naive_utc - EPOCH).total_seconds())
+
+
+def aligned_now(now: Optional[datetime] = None) -> datetime:
+    """Current time (naive UTC) rounded down to read_window_alignment seconds; 'last N days' windows end here"""
+    seconds = _epoch(now or datetime.utcnow())
+    return EPOCH + timedelta(seconds=seconds - seconds % settings.read_window_alignment)
+
+
+class DataVersions:
+    """
+    Per-user data versions in Redis
+
+    A bump that cannot reach Redis (circuit open, timeout) would leave old
+    ETags valid for changed data. The worker remembers the miss and, once
+    Redis answers again, increments the global epoch that is part of every
+    ETag and records when it did, which moves every Last-Modified forward;
+    both validators are invalidated.
+    """
+
+    def __init__(self):
+        self.missed_bumps = False
+
+    @staticmethod
+    def _initial():
+        now = time.time()
+        return int(now * 1_000_000), now
+
+    async def get(self, user_id: str) -> Optional[DataVersion]:
+        """Current version of a user's data, or None when Redis is unavailable"""
+        if not redis_client.available:
+            return None
+        try:
+            if self.missed_bumps:
+                await self._advance_epoch()
+            version, modified_at, epoch, epoch_at = await redis_client.eval(
+                GET_SCRIPT, keys=[VERSION_KEY.format(user_id=user_id), EPOCH_KEY, EPOCH_AT_KEY],
+                args=[*self._initial(), settings.data_version_read_ttl],
+            )
+        except Exception as e:
+            if not isinstance(e, RedisUnavailableError):
+                print(f"⚠️ Error reading data version for {user_id}: {e}")
+            return None
+        return DataVersion(int(version), float(modified_at), int(epoch), float(epoch_at))
+
+    async def bump(self, user_ids: Iterable[str]) -> bool:
+        """Mark users' data as changed; call after the new readings are committed"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return True
+        version, now = self._initial()
+
+        async def bump_all(client):
+            script = redis_client.script(BUMP_SCRIPT)
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                await script(keys=[VERSION_KEY.format(user_id=user_id)], args=[version, now], client=pipe)
+            return await pipe.execute()
+
+        try:
+            if self.missed_bumps:
+                await self._advance_epoch()
+            await redis_client.run(bump_all)
+            return True
+        except Exception as e:
+            self.missed_bumps = True
+            if not isinstance(e, RedisUnavailableError):
+                print(f"⚠️ Error bumping data version: {e}")
+            return False
+
+    async def _advance_epoch(self):
+        def advance(client):
+            pipe = client.pipeline(transaction=True)
+            pipe.incr(EPOCH_KEY)
+            pipe.set(EPOCH_AT_KEY, time.time())
+            return pipe.execute()
+
+        await redis_client.run(advance)
+        self.missed_bumps = False
+        print("🔄 Data version epoch advanced after missed updates")
+
+
+def _resource_tag(request) -> str:
+    """Short hash of the request path and its query parameters (in any order)"""
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return hashlib.sha1(f"{request.url.path}?{query}".encode()).hexdigest()[:10]
+
+
+def validators(version: Optional[DataVersion], window_end: datetime, request) -> dict:
+    """ETag / Last-Modified headers for this request's response over a window ending at window_end, or {} without a version"""
+    if version is None:
+        return {}
+    window_epoch = _epoch(window_end)
+    # Moving the window forward changes the response just like new readings do;
+    # an epoch advance stands in for changes whose version bump was missed
+    modified_at = max(int(version.modified_at), int(version.epoch_at), window_epoch)
+    return {
+        "ETag": f'"{version.epoch}.{version.version}-{window_epoch}-{_resource_tag(request)}"',
+        "Last-Modified": formatdate(modified_at, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+
+
+def not_modified(request, headers: dict) -> bool:
+    """Evaluate If-None-Match against the validators (If-Modified-Since is ignored, see module docstring)"""
+    if not headers:
+        return False
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return headers["ETag"] in tags
+
+
+async def get_cached_analytics(user_id: str, period: str, version: DataVersion, window_end: datetime) -> Optional[str]:
+    key = _analytics_key(user_id, period, version, window_end)
+    try:
+        return await redis_client.run(lambda client: client.get(key))
+    except Exception as e:
+        print(f"⚠️ Error reading analytics cache: {e}")
+        return None
+
+
+async def cache_analytics(user_id: str, period: str, version: DataVersion, window_end: datetime, body: str):
+    key = _analytics_key(user_id, period, version, window_end)
+    try:
+        # Entries for a past window or version are unreachable; let them expire
+        await redis_client.run(lambda client: client.set(key, body, ex=settings.analytics_cache_ttl))
+    except Exception as e:
+        print(f"⚠️ Error writing analytics cache: {e}")
+
+
+def _analytics_key(user_id: str, period: str, version: DataVersion, window_end: datetime) -> str:
+    return ANALYTICS_CACHE_KEY.format(
+        user_id=user_id, period=period, version=f"{version.epoch}.{version.version}", window=_epoch(window_end)
+    )
+
+
+# Global data version store
+data_versions = DataVersions()
@@ -0,0 +1,328 @@
+"""
+Signal calibration and smoothing between validation and alerting
+
+Each ingested reading is passed through:
+1. Temperature calibration: the device's ``temperature_offset`` from
+   ``device_sensor_calibration`` (cached in memory) is added to the skin
+   temperature. Only temperature is calibrated, because it is the only
+   channel read here (it weighs the measurement noise); the optical channel
+   offsets would not change anything.
+2. A per-device scalar Kalman filter (random-walk model) over glucose. The
+   measurement noise grows for low confidence, motion artifacts and
+   implausible skin temperature, so single noisy points barely move the
+   estimate while sustained changes still come through.
+
+The filtered value and its rate of change feed ``check_medical_alerts``; the
+raw reading is stored unchanged. Filter state is shared between worker
+processes through Redis and restarts from the next reading after a long gap.
+
+``reprocess_device_history`` applies the same calibration and filter to a
+device's stored history in bulk with NumPy; both paths keep one filter per
+device, so they agree for users with several devices.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import database
+from app.core.redis_client import RedisUnavailableError, redis_client
+from redis.exceptions import RedisError
+
+CALIBRATION_QUERY = """
+    SELECT DISTINCT ON (device_id) device_id,
+           COALESCE(temperature_offset, 0)::float8 AS temperature
+    FROM device_sensor_calibration
+    WHERE device_id = ANY($1::varchar[])
+    ORDER BY device_id, updated_at DESC
+"""
+
+HISTORY_QUERY = """
+    SELECT timestamp, glucose_value, confidence::float8 AS confidence,
+           (sensor_data->>'temperature')::float8 AS temperature,
+           COALESCE((sensor_data->>'motionArtifact')::boolean, FALSE) AS motion_artifact
+    FROM glucose_readings
+    WHERE device_id = $1 AND timestamp >= $2
+    ORDER BY timestamp
+"""
+
+EPOCH = datetime(1970, 1, 1)
+FILTER_STATE_KEY = "filter_state:{device_id}"
+
+# Store a filter state unless a newer one is already there (two workers can
+# process readings of the same device concurrently)
+SAVE_STATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 't')
+if current and tonumber(current) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'x', ARGV[1], 'p', ARGV[2], 't', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+# Plausible calibrated skin temperature; outside it the sensor has poor contact
+SKIN_TEMPERATURE_RANGE = (32.0, 40.0)
+
+
+class CalibrationCache:
+    """
+    Per-device temperature offsets with a time-to-live, loaded lazily or in bulk
+
+    Per worker process: a calibration change reaches every worker within
+    ``ttl`` seconds; ``invalidate`` only affects the calling worker.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entries: Dict[str, tuple] = {}
+
+    async def get(self, device_id: str) -> float:
+        entry = self.entries.get(device_id)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        await self.load([device_id])
+        return self.entries[device_id][1]
+
+    async def load(self, device_ids):
+        """Load offsets for the given devices (devices without a row get a zero offset)"""
+        device_ids = list(device_ids)
+        # Calibration rows live on the shard of each device's owner
+        by_shard: Dict[int, list] = {}
+        for device_id in device_ids:
+            shard = await database.shard_for_device(device_id)
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(device_id)
+
+        async def fetch(shard: int, shard_device_ids: list):
+            async with database.pools[shard].acquire() as connection:
+                return await connection.fetch(CALIBRATION_QUERY, shard_device_ids)
+
+        results = await asyncio.gather(*[fetch(shard, ids) for shard, ids in by_shard.items()])
+        rows = [row for result in results for row in result]
+        now = time.monotonic()
+        found = {row["device_id"]: row["temperature"] for row in rows}
+        for device_id in device_ids:
+            self.entries[device_id] = (now, found.get(device_id, 0.0))
+
+    def invalidate(self, device_id: Optional[str] = None):
+        if device_id is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(device_id, None)
+
+
+def measurement_variance(confidence: float, motion_artifact: bool, temperature: Optional[float]) -> float:
+    """Measurement noise (mg/dL^2) for one reading given its quality indicators"""
+    variance = settings.filter_measurement_noise / max(confidence, 0.1) ** 2
+    if motion_artifact:
+        variance *= settings.filter_motion_noise_factor
+    if temperature is not None and not SKIN_TEMPERATURE_RANGE[0] <= temperature <= SKIN_TEMPERATURE_RANGE[1]:
+        variance *= 4.0
+    return variance
+
+
+class FilterState(NamedTuple):
+    estimate: float
+    variance: float
+    timestamp: datetime
+
+
+class ProcessedReading(NamedTuple):
+    filtered_value: float
+    rate_of_change: Optional[float]   # mg/dL/min of the filtered signal, None without history
+    previous_value: Optional[float]
+    previous_timestamp: Optional[datetime]
+    calibrated_temperature: float
+
+
+class SignalProcessor:
+    """
+    Per-device Kalman filter over incoming readings
+
+    Filter state is shared through Redis (``filter_state:{device_id}``)
+    because a device's readings can reach any worker process. It expires after
+    ``max_gap_minutes``, when the filter would restart anyway. While Redis is
+    unavailable the state is kept per worker in ``states``.
+    """
+
+    def __init__(self, calibration: CalibrationCache, max_gap_minutes: float):
+        self.calibration = calibration
+        self.max_gap_minutes = max_gap_minutes
+        self.states: Dict[str, FilterState] = {}
+
+    async def _load_state(self, device_id: str) -> Optional[FilterState]:
+        if not redis_client.available:
+            return self.states.get(device_id)
+        try:
+            estimate, variance, timestamp = await redis_client.run(
+                lambda client: client.hmget(FILTER_STATE_KEY.format(device_id=device_id), "x", "p", "t")
+            )
+        except (RedisUnavailableError, RedisError):
+            return self.states.get(device_id)
+        if estimate is None:
+            return None
+        return FilterState(float(estimate), float(variance), EPOCH + timedelta(seconds=float(timestamp)))
+
+    async def _save_state(self, device_id: str, state: FilterState):
+        if redis_client.available:
+            try:
+                await redis_client.eval(
+                    SAVE_STATE_SCRIPT,
+                    keys=[FILTER_STATE_KEY.format(device_id=device_id)],
+                    args=[repr(state.estimate), repr(state.variance), (state.timestamp - EPOCH).total_seconds(),
+                          int(self.max_gap_minutes * 60)],
+                )
+                self.states.pop(device_id, None)
+                return
+            except (RedisUnavailableError, RedisError):
+                pass
+        self.states[device_id] = state
+
+    async def process(self, reading) -> ProcessedReading:
+        """Calibrate and filter one validated GlucoseReadingCreate"""
+        temperature = reading.sensorData.temperature + await self.calibration.get(reading.deviceId)
+        variance_r = measurement_variance(reading.confidence, reading.sensorData.motionArtifact, temperature)
+
+        state = await self._load_state(reading.deviceId)
+        if state is not None:
+            gap = (reading.timestamp - state.timestamp).total_seconds() / 60
+            if gap <= 0:
+                # Late/duplicate reading: the estimate belongs to another time, so
+                # report the reading as measured and leave the filter untouched
+                return ProcessedReading(float(reading.glucoseValue), None, None, None, temperature)
+            if gap > self.max_gap_minutes:
+                state = None
+
+        if state is None:
+            await self._save_state(reading.deviceId, FilterState(float(reading.glucoseValue), variance_r, reading.timestamp))
+            return ProcessedReading(float(reading.glucoseValue), None, None, None, temperature)
+
+        predicted_variance = state.variance + settings.filter_process_noise * gap
+        gain = predicted_variance / (predicted_variance + variance_r)
+        estimate = state.estimate + gain * (reading.glucoseValue - state.estimate)
+        await self._save_state(reading.deviceId, FilterState(estimate, (1 - gain) * predicted_variance, reading.timestamp))
+
+        return ProcessedReading(
+            filtered_value=estimate,
+            rate_of_change=(estimate - state.estimate) / gap,
+            previous_value=state.estimate,
+            previous_timestamp=state.timestamp,
+            calibrated_temperature=temperature,
+        )
+
+
+# ---------- bulk reprocessing ----------
+
+def _linear_recurrence(a, b, x0: float, block: int = 64):
+    """
+    Solve x[t] = a[t] * x[t-1] + b[t] with NumPy, block by block
+
+    Within a block x[t] = P[t] * (x0 + sum(b[i] / P[i])) where P is the
+    cumulative product of a; short blocks keep P far from underflow.
+    """
+    x = np.empty_like(b)
+    for start in range(0, len(b), block):
+        a_block = a[start:start + block]
+        products = np.cumprod(a_block)
+        x[start:start + block] = products * (x0 + np.cumsum(b[start:start + block] / products))
+        x0 = x[start + len(a_block) - 1]
+    return x
+
+
+def filter_series(timestamps, values, confidence, motion, temperature, max_gap_minutes: float):
+    """
+    Vectorized equivalent of SignalProcessor over a whole series
+
+    Only the scalar variance recursion runs in Python; the noise model and
+    the state recursion are NumPy array operations.
+    """
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+    # A repeated timestamp is a late/duplicate reading: as in SignalProcessor it
+    # is reported as measured and leaves the filter untouched
+    kept = np.concatenate([[True], np.diff(timestamps) > np.timedelta64(0)])
+    if not kept.all():
+        filtered = np.array(values, dtype=np.float64)
+        filtered[kept] = filter_series(timestamps[kept], values[kept], confidence[kept], motion[kept],
+                                       temperature[kept], max_gap_minutes)
+        return filtered
+
+    gaps = np.diff(timestamps).astype("timedelta64[s]").astype(np.float64) / 60
+    gaps = np.concatenate([[0.0], gaps])
+
+    variance_r = settings.filter_measurement_noise / np.maximum(confidence, 0.1) ** 2
+    variance_r = np.where(motion, variance_r * settings.filter_motion_noise_factor, variance_r)
+    implausible = (temperature < SKIN_TEMPERATURE_RANGE[0]) | (temperature > SKIN_TEMPERATURE_RANGE[1])
+    variance_r = np.where(implausible, variance_r * 4.0, variance_r)
+
+    gains = np.empty(n)
+    variance = 0.0
+    process_noise = (settings.filter_process_noise * gaps).tolist()
+    r = variance_r.tolist()
+    restarts = np.flatnonzero((gaps > max_gap_minutes) | (gaps <= 0))
+    restart_set = set(restarts.tolist())
+    for t in range(n):
+        if t in restart_set:
+            variance = r[t]
+            continue
+        predicted = variance + process_noise[t]
+        gains[t] = predicted / (predicted + r[t])
+        variance = (1 - gains[t]) * predicted
+
+    # x[t] = (1 - K[t]) * x[t-1] + K[t] * z[t], restarted at the first reading and after long gaps
+    filtered = np.empty(n)
+    bounds = restarts.tolist() + [n]
+    for start, end in zip(bounds, bounds[1:]):
+        filtered[start] = values[start]
+        if end - start > 1:
+            segment = slice(start + 1, end)
+            filtered[segment] = _linear_recurrence(1.0 - gains[segment], gains[segment] * values[segment],
+                                                   float(values[start]))
+    return filtered
+
+
+async def reprocess_device_history(device_id: str, since: datetime) -> dict:
+    """
+    Recompute calibrated temperature and filtered glucose for a device's stored readings
+
+    Returns:
+        dict: NumPy arrays keyed by column (timestamp, raw, filtered, rate, temperature)
+    """
+    rows = []
+    shard = await database.shard_for_device(device_id)
+    if shard is not None:
+        async with database.pools[shard].acquire() as connection:
+            rows = await connection.fetch(HISTORY_QUERY, device_id, since)
+    temperature_offset = await calibration_cache.get(device_id)
+
+    timestamps = np.array([row["timestamp"] for row in rows], dtype="datetime64[us]")
+    raw = np.array([row["glucose_value"] for row in rows], dtype=np.float64)
+    temperature = np.array([row["temperature"] for row in rows], dtype=np.float64) + temperature_offset
+    confidence = np.array([row["confidence"] for row in rows], dtype=np.float64)
+    motion = np.array([row["motion_artifact"] for row in rows], dtype=bool)
+
+    filtered = filter_series(timestamps, raw, confidence, motion, temperature,
+                             settings.filter_max_gap_minutes)
+    minutes = np.diff(timestamps).astype("timedelta64[s]").astype(np.float64) / 60
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.concatenate([[np.nan], np.diff(filtered) / minutes])
+        raw_rate = np.concatenate([[np.nan], np.diff(raw) / minutes])
+    return {
+        "timestamp": timestamps,
+        "raw": raw,
+        "filtered": filtered,
+        "rate": rate,
+        "raw_rate": raw_rate,
+        "motion_artifact": motion,
+        "calibrated_temperature": temperature,
+    }
+
+
+# Global calibration cache and signal processor instances
+calibration_cache = CalibrationCache(ttl=settings.calibration_cache_ttl)
+signal_processor = SignalProcessor(calibration_cache, max_gap_minutes=settings.filter_max_gap_minutes)
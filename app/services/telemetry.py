@@ -0,0 +1,144 @@
+"""
+Coalesced device telemetry updates
+
+Every ingested reading reports the device's battery level and proves it is
+alive. Instead of updating ``devices.last_seen`` and ``device_battery_info``
+once per reading, the latest state of each device seen since the last flush
+is kept in memory and flushed in one batched statement per table every few
+seconds. (Signal quality is stored with each reading in ``glucose_readings``.)
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional
+
+from app.core.config import settings
+from app.core.database import database
+
+UPDATE_LAST_SEEN_QUERY = """
+    UPDATE devices d
+    SET last_seen = GREATEST(COALESCE(d.last_seen, t.last_seen), t.last_seen)
+    FROM unnest($1::varchar[], $2::timestamp[]) AS t(device_id, last_seen)
+    WHERE d.device_id = t.device_id
+    RETURNING d.device_id
+"""
+
+# One row per device (UNIQUE device_id); a level is only replaced by one
+# reported by a newer reading, whichever worker flushes first
+UPSERT_BATTERY_QUERY = """
+    INSERT INTO device_battery_info (device_id, current_level, reported_at)
+    SELECT * FROM unnest($1::varchar[], $2::integer[], $3::timestamp[])
+    ON CONFLICT (device_id) DO UPDATE
+    SET current_level = excluded.current_level,
+        reported_at = excluded.reported_at,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE device_battery_info.reported_at IS NULL
+       OR excluded.reported_at > device_battery_info.reported_at
+"""
+
+
+class DeviceTelemetry(NamedTuple):
+    last_seen: datetime
+    battery_level: int
+
+
+class TelemetryAggregator:
+    """
+    Latest telemetry per device, flushed in batches
+
+    State is per worker process and only covers devices seen since the last
+    flush, so memory does not grow with every device ID ever seen. Ordering is
+    enforced by the flush statements, which makes concurrent flushes from
+    several workers safe too: last_seen only ever moves forward, and a battery
+    level is only replaced by one observed at a later reading timestamp.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self.pending: Dict[str, DeviceTelemetry] = {}
+        self.flushes = 0
+        self.devices_flushed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, device_id: str, timestamp: datetime, battery_level: int):
+        """Record telemetry from an ingested reading (in memory, no I/O)"""
+        current = self.pending.get(device_id)
+        if current and current.last_seen > timestamp:
+            return  # late/out-of-order reading
+        self.pending[device_id] = DeviceTelemetry(timestamp, battery_level)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print("✅ Telemetry aggregator started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        print(f"🔌 Telemetry aggregator stopped ({self.devices_flushed} device updates in {self.flushes} flushes)")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all changed devices in one batch per shard; returns the number of devices written"""
+        if not self.pending or not database.pool:
+            return 0
+        batch, self.pending = self.pending, {}
+        by_shard: Dict[int, list] = {}
+        for device_id in batch:
+            shard = await database.shard_for_device(device_id)
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(device_id)
+        written = await asyncio.gather(*[
+            self._flush_shard(shard, device_ids, batch) for shard, device_ids in by_shard.items()
+        ])
+        if sum(written):
+            self.flushes += 1
+            self.devices_flushed += sum(written)
+        return sum(written)
+
+    async def _flush_shard(self, shard: int, device_ids: list, batch: Dict[str, DeviceTelemetry]) -> int:
+        try:
+            async with database.pools[shard].acquire() as connection:
+                async with connection.transaction():
+                    rows = await connection.fetch(
+                        UPDATE_LAST_SEEN_QUERY,
+                        device_ids,
+                        [batch[d].last_seen for d in device_ids],
+                    )
+                    # Battery rows reference devices: only those present on this shard
+                    found = [row["device_id"] for row in rows]
+                    await connection.execute(
+                        UPSERT_BATTERY_QUERY,
+                        found,
+                        [batch[d].battery_level for d in found],
+                        [batch[d].last_seen for d in found],
+                    )
+        except Exception as e:
+            print(f"⚠️ Failed to flush telemetry for {len(device_ids)} devices: {e}")
+            # Re-queue unless a newer observation arrived in the meantime
+            for device_id in device_ids:
+                self._requeue(device_id, batch[device_id])
+            return 0
+        # Devices missing here were routed by a stale cached owner; retry them on their shard
+        for device_id in set(device_ids) - set(found):
+            if await database.refresh_device_shard(device_id, shard) is not None:
+                self._requeue(device_id, batch[device_id])
+        return len(found)
+
+    def _requeue(self, device_id: str, state: DeviceTelemetry):
+        current = self.pending.get(device_id)
+        if current is None or current.last_seen < state.last_seen:
+            self.pending[device_id] = state
+
+
+# Global telemetry aggregator instance
+telemetry = TelemetryAggregator(flush_interval=settings.telemetry_flush_interval)
@@ -0,0 +1,153 @@
+"""
+Background cache warming and readiness
+
+Startup only connects the pools; everything a cold worker would otherwise
+load on its first requests is loaded here in the background:
+
+- device ownership (``database.device_owners``) for the most recently seen
+  active devices, so device-only requests are routed without a fan-out
+- their calibration offsets (``calibration_cache``)
+
+The hot read queries are prepared on every new pool connection instead, by
+``prepare_connection`` in the pool ``init`` hook, so connections the pool
+opens later are warm too and no request waits for the warmer to hand a
+connection back. asyncpg caches statements per connection under the query
+text, so they must be registered with the exact text the call site uses.
+
+``ready`` is what ``/health/ready`` reports: the pools are connected and
+warming has finished. Warming that fails or exceeds ``startup_warm_timeout``
+still makes the worker ready (every cache also loads lazily); the outcome is
+visible in ``status()``.
+"""
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import database
+from app.services.signal_processing import CALIBRATION_QUERY, calibration_cache
+
+RECENT_DEVICES_QUERY = """
+    SELECT device_id, user_id FROM devices
+    WHERE status = 'active'
+    ORDER BY last_seen DESC NULLS LAST
+    LIMIT $1
+"""
+
+
+class CacheWarmer:
+    """Warms per-worker caches after startup and tracks readiness"""
+
+    PENDING = "pending"
+    WARMING = "warming"
+    WARM = "warm"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
+    DISABLED = "disabled"
+
+    def __init__(self, device_limit: int, timeout: float):
+        self.device_limit = device_limit
+        self.timeout = timeout
+        self.statements: List[Tuple[str, tuple]] = []
+        self.state = self.PENDING
+        self.stopping = False
+        self.devices = 0
+        self.calibrations = 0
+        self.prepared = 0
+        self.warm_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_statement(self, query: str, *sample_args):
+        """Prepare a hot query on every new pool connection; sample_args only need the right types"""
+        self.statements.append((query, sample_args))
+
+    async def start(self, enabled: bool = True):
+        self.stopping = False
+        if not enabled:
+            self.state = self.DISABLED
+            return
+        self.state = self.WARMING
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop warming and report not ready, so load balancers drain the worker"""
+        self.stopping = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(database.pools) and not self.stopping and self.state not in (self.PENDING, self.WARMING)
+
+    async def _run(self):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._warm(), timeout=self.timeout)
+            self.state = self.WARM
+        except asyncio.TimeoutError:
+            self.state = self.TIMED_OUT
+            print(f"⚠️ Cache warming did not finish within {self.timeout}s; serving with cold caches")
+        except Exception as e:
+            self.state = self.FAILED
+            self.error = str(e)
+            print(f"⚠️ Cache warming failed: {e}")
+        self.warm_ms = round((time.perf_counter() - started) * 1000, 1)
+        if self.state == self.WARM:
+            print(f"🔥 Caches warm in {self.warm_ms:.0f} ms ({self.devices} devices, "
+                  f"{self.calibrations} calibrations, {self.prepared} prepared statements)")
+
+    async def _warm(self):
+        device_ids = await self._warm_device_owners()
+        await self._warm_calibrations(device_ids)
+
+    async def _warm_device_owners(self) -> List[str]:
+        results = await database.fan_out(lambda pool: pool.fetch(RECENT_DEVICES_QUERY, self.device_limit))
+        device_ids = []
+        for rows in results:
+            for row in rows:
+                database.device_owners[row["device_id"]] = row["user_id"]
+                device_ids.append(row["device_id"])
+        self.devices = len(device_ids)
+        return device_ids
+
+    async def _warm_calibrations(self, device_ids: List[str]):
+        if device_ids:
+            await calibration_cache.load(device_ids)
+        self.calibrations = len(device_ids)
+
+    async def prepare_connection(self, connection: asyncpg.Connection):
+        """Pool init hook: run each registered statement once so the connection caches it"""
+        try:
+            for query, sample_args in self.statements:
+                await connection.fetch(query, *sample_args)
+        except asyncpg.PostgresError as e:
+            # The connection still works; its statements are prepared on first use
+            self.error = f"preparing statements: {e}"
+            print(f"⚠️ Preparing statements on a new connection failed: {e}")
+            return
+        self.prepared += len(self.statements)
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "devices": self.devices,
+            "calibrations": self.calibrations,
+            "prepared_statements": self.prepared,
+            "warm_ms": self.warm_ms,
+            "error": self.error,
+        }
+
+
+# Global cache warmer
+cache_warmer = CacheWarmer(device_limit=settings.startup_warm_devices, timeout=settings.startup_warm_timeout)
+cache_warmer.add_statement(CALIBRATION_QUERY, [])
+if settings.startup_warm_enabled:
+    database.connection_init.append(cache_warmer.prepare_connection)
@@ -0,0 +1 @@
+# Offline data tooling (generators, imports, exports)
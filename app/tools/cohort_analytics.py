@@ -0,0 +1,43 @@
+"""
+Scheduled cohort analytics job
+
+Computes population metrics for one or more periods and stores them in
+cohort_analytics, where GET /api/v1/analytics/cohort serves them from.
+
+Usage:
+    python -m app.tools.cohort_analytics --periods 7 30 90
+    python -m app.tools.cohort_analytics --periods 30 --chunk-size 1000 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+
+from app.core.database import database
+from app.services.cohort import compute_cohort_analytics
+
+
+async def run(args):
+    if not await database.connect():
+        raise SystemExit(1)
+    try:
+        for period_days in args.periods:
+            snapshot = await compute_cohort_analytics(period_days, args.chunk_size, args.concurrency)
+            print(json.dumps(snapshot, indent=2, default=str))
+    finally:
+        await database.disconnect()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute and persist cohort analytics")
+    parser.add_argument("--periods", type=int, nargs="+", default=[30], help="Period lengths in days")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Users per aggregation chunk")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chunks aggregated in parallel")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Columnar bulk export of glucose readings for research cohorts
+
+Writes readings for a set of users and a time range as Parquet files or Arrow
+IPC streams. Users are split into parts that are exported in parallel by a
+process pool, each worker with its own connection to the shard that holds the
+part's users, producing one file per part in the output directory.
+
+Usage:
+    python -m app.tools.export_readings --users user_5678,user_9012 --days 365 --output-dir export/
+    python -m app.tools.export_readings --users-file cohort.txt --start 2025-01-01 --end 2025-07-01 \\
+        --format arrow --workers 8 --users-per-part 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from app.core.database import database
+from app.services.export import export_to_file, parse_user_ids, to_naive_utc
+
+
+async def _export_part(path: str, shard: int, user_ids: List[str], start: datetime, end: datetime,
+                       export_format: str, chunk_size: int) -> int:
+    connection = await database.open_connection(shard)
+    try:
+        return await export_to_file(connection, path, user_ids, start, end, export_format, chunk_size)
+    finally:
+        await connection.close()
+
+
+def _worker(path: str, shard: int, user_ids: List[str], start: datetime, end: datetime,
+            export_format: str, chunk_size: int) -> Tuple[str, int]:
+    """Process-pool entry point: export one part to its own file"""
+    rows = asyncio.run(_export_part(path, shard, user_ids, start, end, export_format, chunk_size))
+    return path, rows
+
+
+def load_user_ids(args) -> List[str]:
+    user_ids = parse_user_ids(args.users)
+    if args.users_file:
+        with open(args.users_file, encoding="utf-8") as f:
+            user_ids.extend(line.strip() for line in f if line.strip())
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(user_ids))
+
+
+async def run(args):
+    user_ids = load_user_ids(args)
+    if not user_ids:
+        raise SystemExit("No user IDs given (use --users or --users-file)")
+
+    end = to_naive_utc(datetime.fromisoformat(args.end)) if args.end else datetime.utcnow()
+    start = to_naive_utc(datetime.fromisoformat(args.start)) if args.start else end - timedelta(days=args.days)
+    extension = "parquet" if args.format == "parquet" else "arrows"
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # A part never spans shards
+    parts = [
+        (shard, shard_user_ids[i:i + args.users_per_part])
+        for shard, shard_user_ids in database.router.group(user_ids).items()
+        for i in range(0, len(shard_user_ids), args.users_per_part)
+    ]
+    print(f"📦 Exporting {len(user_ids)} users in {len(parts)} part(s) with {min(args.workers, len(parts))} worker(s)...")
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(parts))) as pool:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(
+                pool, _worker,
+                os.path.join(args.output_dir, f"part-{index:05d}.{extension}"),
+                shard, part, start, end, args.format, args.chunk_size,
+            )
+            for index, (shard, part) in enumerate(parts)
+        ])
+    elapsed = time.perf_counter() - started
+
+    total_rows = sum(rows for _, rows in results)
+    print(json.dumps({
+        "users": len(user_ids),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "format": args.format,
+        "files": [path for path, _ in results],
+        "rows": total_rows,
+        "elapsed_s": round(elapsed, 2),
+    }, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export glucose readings as Parquet or Arrow IPC")
+    parser.add_argument("--users", help="Comma-separated user IDs")
+    parser.add_argument("--users-file", help="File with one user ID per line")
+    parser.add_argument("--start", help="Start of range, ISO format (UTC, inclusive)")
+    parser.add_argument("--end", help="End of range, ISO format (UTC, exclusive). Defaults to now")
+    parser.add_argument("--days", type=int, default=90, help="Range length when --start is not given")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet", help="Output format")
+    parser.add_argument("--output-dir", default="export", help="Directory for the output files")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel export processes")
+    parser.add_argument("--users-per-part", type=int, default=100, help="Users per output file")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows fetched per cursor round trip")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
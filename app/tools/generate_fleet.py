@@ -0,0 +1,349 @@
+"""
+Synthetic fleet data generator
+
+Produces physiologically plausible CGM traces for N users x M devices over
+D days and streams them straight into Postgres with COPY. Users, devices and
+alert_configs are created consistently so the generated readings satisfy every
+foreign key in database_schema.sql.
+
+Each user's trace combines:
+- a personal basal level derived from HbA1c, with a circadian dawn rise
+- meal spikes (breakfast/lunch/dinner plus random snacks)
+- occasional nocturnal lows
+- autocorrelated sensor noise and motion artifacts during activity bursts
+- battery drain per device with recharges
+
+A user's M devices cover consecutive sensor sessions of the D-day window, so
+each user has a single continuous reading stream. With DB_SHARD_DSNS set,
+every user's rows are written to the shard that owns the user.
+
+Usage:
+    python -m app.tools.generate_fleet --users 1000 --devices-per-user 2 --days 30
+    python -m app.tools.generate_fleet --users 10000 --days 90 --workers 8 --replace
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator, List, Tuple
+
+from app.core.database import database
+
+READING_COLUMNS = [
+    "user_id", "device_id", "timestamp", "glucose_value", "confidence",
+    "sensor_data", "battery_level", "signal_quality",
+]
+
+FIRMWARE_VERSIONS = ["2.0.8", "2.1.1", "2.1.3", "2.1.4"]
+HARDWARE_REVISIONS = ["Rev A", "Rev B", "Rev C"]
+
+# Meal times (hour of day) and typical carbohydrate load scaling
+MEALS = [(7.5, 1.0), (12.5, 0.9), (19.0, 1.1)]
+
+
+def user_id_for(prefix: str, index: int) -> str:
+    return f"{prefix}_user_{index:07d}"
+
+
+def device_id_for(prefix: str, index: int, slot: int) -> str:
+    return f"{prefix.upper()}_{index:07d}_{slot}"
+
+
+# ---------- profiles ----------
+
+def user_profile(prefix: str, index: int, seed: int) -> dict:
+    """Deterministic demographic profile for one synthetic user"""
+    rng = random.Random(seed * 1_000_003 + index)
+    hba1c = round(min(max(rng.gauss(7.4, 1.3), 5.0), 12.5), 2)
+    return {
+        "user_id": user_id_for(prefix, index),
+        "age": rng.randint(8, 90),
+        "gender": rng.choice(["M", "F", "F", "M", "Other"]),
+        "bmi": round(min(max(rng.gauss(27.5, 5.0), 16.0), 48.0), 2),
+        "skin_tone": rng.choice(["light", "medium", "dark"]),
+        "hba1c": hba1c,
+        # Estimated average glucose from HbA1c (ADAG formula)
+        "basal": 28.7 * hba1c - 46.7,
+        "low": rng.choice([65, 70, 70, 75, 80]),
+        "high": rng.choice([160, 180, 180, 200, 250]),
+        "rapid_change": rng.choice([3.0, 3.5, 4.0, 4.0, 5.0]),
+    }
+
+
+def device_rows(prefix: str, index: int, devices_per_user: int, start: datetime, seed: int) -> List[tuple]:
+    rng = random.Random(seed * 7_919 + index)
+    rows = []
+    for slot in range(devices_per_user):
+        manufactured = (start - timedelta(days=rng.randint(30, 400))).date()
+        rows.append((
+            device_id_for(prefix, index, slot),
+            user_id_for(prefix, index),
+            f"{prefix.upper()}-{index:07d}-{slot}",
+            rng.choice(FIRMWARE_VERSIONS),
+            rng.choice(HARDWARE_REVISIONS),
+            manufactured,
+            manufactured + timedelta(days=rng.randint(1, 20)),
+            "active",
+        ))
+    return rows
+
+
+# ---------- trace synthesis ----------
+
+class DayPlan:
+    """Meals, activity bursts and nocturnal lows scheduled for one day"""
+
+    def __init__(self, rng: random.Random, day_start: datetime, severity: float):
+        self.meals = []
+        for hour, load in MEALS:
+            if rng.random() < 0.92:
+                onset = day_start + timedelta(hours=hour + rng.gauss(0, 0.6))
+                amplitude = rng.uniform(30, 70) * load * severity
+                self.meals.append((onset, amplitude, rng.uniform(40, 75)))
+        for _ in range(rng.choice([0, 0, 1, 1, 2])):
+            onset = day_start + timedelta(hours=rng.uniform(9, 22))
+            self.meals.append((onset, rng.uniform(10, 35) * severity, rng.uniform(30, 50)))
+
+        self.activity = []
+        for _ in range(rng.randint(1, 4)):
+            onset = day_start + timedelta(hours=rng.uniform(7, 21))
+            self.activity.append((onset, onset + timedelta(minutes=rng.uniform(10, 60))))
+
+        self.nocturnal_low = None
+        if rng.random() < 0.12 + 0.08 * max(0.0, 1.4 - severity):
+            center = day_start + timedelta(hours=rng.uniform(1.0, 5.0))
+            self.nocturnal_low = (center, rng.uniform(25, 60), rng.uniform(25, 60))
+
+
+def meal_response(minutes: float, amplitude: float, time_to_peak: float) -> float:
+    """Gamma-shaped post-prandial excursion peaking at time_to_peak minutes"""
+    if minutes <= 0 or minutes > 6 * time_to_peak:
+        return 0.0
+    x = minutes / time_to_peak
+    return amplitude * x * math.exp(1 - x)
+
+
+def generate_readings(profile: dict, device_ids: List[str], start: datetime, days: int,
+                      interval_s: int, seed: int) -> Iterator[tuple]:
+    """Yield COPY-ready reading tuples for one user across all their devices"""
+    rng = random.Random(seed * 31 + zlib.crc32(profile["user_id"].encode()))
+    user_id = profile["user_id"]
+    basal = profile["basal"]
+    severity = max(0.6, profile["hba1c"] / 6.5)
+
+    total_steps = int(days * 86400 // interval_s)
+    steps_per_device = max(1, math.ceil(total_steps / len(device_ids)))
+    step = timedelta(seconds=interval_s)
+    drain_per_step = interval_s / 3600 * rng.uniform(0.35, 0.6)  # % per reading
+
+    noise = 0.0
+    battery = rng.uniform(60, 100)
+    plans = {}
+    timestamp = start
+    for i in range(total_steps):
+        device_id = device_ids[min(i // steps_per_device, len(device_ids) - 1)]
+        if i % steps_per_device == 0:
+            battery = 100.0  # fresh sensor session
+
+        day = timestamp.date()
+        if day not in plans:
+            plans = {d: p for d, p in plans.items() if d >= day - timedelta(days=1)}
+            plans[day] = DayPlan(rng, datetime.combine(day, datetime.min.time()), severity)
+        today = plans[day]
+        yesterday = plans.get(day - timedelta(days=1))
+
+        hour = timestamp.hour + timestamp.minute / 60
+        # Dawn phenomenon: cortisol-driven rise between 4 and 8 am
+        value = basal + 15 * severity * math.exp(-((hour - 6.0) ** 2) / 2.0)
+        for plan in (today, yesterday):
+            if plan is None:
+                continue
+            for onset, amplitude, time_to_peak in plan.meals:
+                value += meal_response((timestamp - onset).total_seconds() / 60, amplitude, time_to_peak)
+            if plan.nocturnal_low:
+                center, depth, width = plan.nocturnal_low
+                minutes = (timestamp - center).total_seconds() / 60
+                if abs(minutes) < 4 * width:
+                    value -= depth * math.exp(-(minutes ** 2) / (2 * width ** 2))
+
+        motion = any(begin <= timestamp <= end for begin, end in today.activity) and rng.random() < 0.7
+        noise = 0.85 * noise + rng.gauss(0, 3.0)
+        value += noise + (rng.gauss(0, 12) if motion else 0.0)
+        glucose = int(min(max(round(value), 40), 400))
+
+        confidence = min(max(rng.gauss(0.93, 0.03) - (0.2 if motion else 0.0), 0.3), 0.999)
+        if confidence >= 0.9:
+            quality = "excellent"
+        elif confidence >= 0.8:
+            quality = "good"
+        elif confidence >= 0.65:
+            quality = "fair"
+        else:
+            quality = "poor"
+
+        battery -= drain_per_step
+        if battery < 10:
+            battery = 100.0  # recharged overnight-style top-up
+
+        sensor_data = json.dumps({
+            "red": round(1.6 + glucose / 180 + rng.gauss(0, 0.05), 3),
+            "infrared": round(1.2 + glucose / 260 + rng.gauss(0, 0.04), 3),
+            "green": round(2.2 + glucose / 150 + rng.gauss(0, 0.06), 3),
+            "temperature": round(36.4 + 0.4 * math.sin((hour - 4) / 24 * 2 * math.pi) + rng.gauss(0, 0.1), 1),
+            "motionArtifact": motion,
+        })
+        yield (user_id, device_id, timestamp, glucose, round(confidence, 3),
+               sensor_data, int(battery), quality)
+        timestamp += step
+
+
+# ---------- database writers ----------
+
+async def create_fleet(connection, args, start: datetime, shard: int = 0):
+    """Insert users, devices and alert_configs for the part of the fleet owned by a shard"""
+    users, configs, devices = [], [], []
+    for index in range(args.users):
+        if database.router.shard_for(user_id_for(args.prefix, index)) != shard:
+            continue
+        profile = user_profile(args.prefix, index, args.seed)
+        users.append((
+            profile["user_id"], profile["age"], profile["gender"],
+            Decimal(str(profile["bmi"])), profile["skin_tone"], Decimal(str(profile["hba1c"])),
+        ))
+        configs.append((profile["user_id"], profile["low"], profile["high"],
+                        Decimal(str(profile["rapid_change"]))))
+        devices.extend(device_rows(args.prefix, index, args.devices_per_user, start, args.seed))
+
+    async with connection.transaction():
+        await connection.copy_records_to_table(
+            "users", records=users,
+            columns=["user_id", "age", "gender", "bmi", "skin_tone", "hba1c"],
+        )
+        await connection.copy_records_to_table(
+            "alert_configs", records=configs,
+            columns=["user_id", "low_glucose", "high_glucose", "rapid_change"],
+        )
+        await connection.copy_records_to_table(
+            "devices", records=devices,
+            columns=["device_id", "user_id", "serial_number", "firmware_version",
+                     "hardware_revision", "manufacturing_date", "calibration_date", "status"],
+        )
+    print(f"👥 Created {len(users)} users, {len(devices)} devices, {len(configs)} alert configs")
+
+
+async def remove_fleet(connection, prefix: str):
+    # Devices, readings and alert configs cascade from users
+    deleted = await connection.execute("DELETE FROM users WHERE user_id LIKE $1", f"{prefix}_user_%")
+    print(f"🧹 Removed previously generated fleet ({deleted})")
+
+
+async def _copy_readings(user_indices: List[int], args_dict: dict, start: datetime) -> Tuple[int, float]:
+    # One connection and one batch per shard the slice's users live on
+    connections = {}
+    batches = {}
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for index in user_indices:
+            profile = user_profile(args_dict["prefix"], index, args_dict["seed"])
+            shard = database.router.shard_for(profile["user_id"])
+            if shard not in connections:
+                connections[shard] = await database.open_connection(shard)
+            batch = batches.setdefault(shard, [])
+            device_ids = [device_id_for(args_dict["prefix"], index, slot)
+                          for slot in range(args_dict["devices_per_user"])]
+            for record in generate_readings(profile, device_ids, start, args_dict["days"],
+                                            args_dict["interval"], args_dict["seed"]):
+                batch.append(record)
+                if len(batch) >= args_dict["batch_size"]:
+                    await connections[shard].copy_records_to_table(
+                        "glucose_readings", records=batch, columns=READING_COLUMNS
+                    )
+                    rows += len(batch)
+                    batch.clear()
+        for shard, batch in batches.items():
+            if batch:
+                await connections[shard].copy_records_to_table(
+                    "glucose_readings", records=batch, columns=READING_COLUMNS
+                )
+                rows += len(batch)
+    finally:
+        for connection in connections.values():
+            await connection.close()
+    return rows, time.perf_counter() - started
+
+
+def _worker(user_indices: List[int], args_dict: dict, start: datetime) -> Tuple[int, float]:
+    """Process-pool entry point: generate and COPY readings for a slice of users"""
+    return asyncio.run(_copy_readings(user_indices, args_dict, start))
+
+
+async def run(args):
+    end = datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+
+    for shard in range(database.shard_count):
+        connection = await database.open_connection(shard)
+        try:
+            if args.replace:
+                await remove_fleet(connection, args.prefix)
+            await create_fleet(connection, args, start, shard)
+        finally:
+            await connection.close()
+
+    slices = [list(range(worker, args.users, args.workers)) for worker in range(args.workers)]
+    slices = [s for s in slices if s]
+    args_dict = vars(args)
+    print(f"📈 Generating {args.days} days of readings every {args.interval}s "
+          f"with {len(slices)} worker(s)...")
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=len(slices)) as pool:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(pool, _worker, user_slice, args_dict, start)
+            for user_slice in slices
+        ])
+    elapsed = time.perf_counter() - started
+
+    total_rows = sum(rows for rows, _ in results)
+    print(f"✅ Inserted {total_rows:,} readings in {elapsed:.1f}s "
+          f"({total_rows / elapsed * 60:,.0f} rows/min)")
+
+    if args.analyze:
+        for shard in range(database.shard_count):
+            connection = await database.open_connection(shard)
+            try:
+                await connection.execute("ANALYZE users, devices, alert_configs, glucose_readings")
+            finally:
+                await connection.close()
+        print("📊 Table statistics refreshed")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic CGM fleet into Postgres")
+    parser.add_argument("--users", type=int, default=100, help="Number of users")
+    parser.add_argument("--devices-per-user", type=int, default=1, help="Consecutive devices per user")
+    parser.add_argument("--days", type=int, default=14, help="Days of history to generate")
+    parser.add_argument("--interval", type=int, default=300, help="Seconds between readings")
+    parser.add_argument("--workers", type=int, default=4, help="Generator/COPY processes")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per COPY")
+    parser.add_argument("--prefix", default="gen", help="Prefix for generated user/device IDs")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible traces")
+    parser.add_argument("--replace", action="store_true", help="Delete a previously generated fleet first")
+    parser.add_argument("--analyze", action="store_true", help="Run ANALYZE after loading")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
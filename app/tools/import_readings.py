@@ -0,0 +1,355 @@
+"""
+Bulk historical import of glucose readings
+
+Streams a JSON array (or newline-delimited JSON) or CSV export in the
+glucose_readings.json format, validates every row with the same rules as
+``POST /devices/{device_id}/readings`` except the 72 hour age limit, loads
+valid rows into a temporary staging table with COPY and merges them into
+``glucose_readings`` with ``ON CONFLICT DO NOTHING``. Finally the
+``glucose_analytics`` rows for every affected user/day are rebuilt and the
+affected users' data versions are bumped so cached responses are refreshed.
+
+Memory use is constant in the file size: rows are parsed incrementally and
+handled in batches. A JSON record that cannot be parsed is skipped and counted
+(with its line number in the errors file), like a CSV row that fails
+validation; the import continues with the next record.
+
+CSV files need a header row with the reading field names. Sensor channels may
+be given either flattened (red, infrared, ...) or dotted (sensorData.red, ...).
+
+Usage:
+    python -m app.tools.import_readings readings.json
+    python -m app.tools.import_readings export.csv --batch-size 20000 --errors-file rejected.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import json
+import re
+import time
+from contextlib import AsyncExitStack
+from typing import Dict, Iterator, NamedTuple, Optional, TextIO, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.core.database import database
+from app.core.redis_client import redis_client
+from app.schemas.glucose import GlucoseReadingImport
+from app.services.analytics import rebuild_daily_analytics
+from app.services.read_cache import data_versions
+
+SENSOR_FIELDS = ["red", "infrared", "green", "temperature", "motionArtifact"]
+STAGING_TABLE = "glucose_import_staging"
+STAGING_COLUMNS = [
+    "user_id", "device_id", "timestamp", "glucose_value", "confidence",
+    "sensor_data", "battery_level", "signal_quality",
+]
+
+CREATE_STAGING_QUERY = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        user_id VARCHAR(50),
+        device_id VARCHAR(50),
+        timestamp TIMESTAMP,
+        glucose_value INTEGER,
+        confidence DECIMAL(4,3),
+        sensor_data JSONB,
+        battery_level INTEGER,
+        signal_quality VARCHAR(20)
+    )
+"""
+
+ORPHAN_COUNT_QUERY = f"""
+    SELECT COUNT(*) FROM {STAGING_TABLE} s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM devices d
+        WHERE d.device_id = s.device_id AND d.user_id = s.user_id
+    )
+"""
+
+# Rows whose device does not exist or belongs to another user are skipped,
+# mirroring the foreign key checks of the ingest endpoint
+MERGE_QUERY = f"""
+    INSERT INTO glucose_readings (
+        user_id, device_id, timestamp, glucose_value,
+        confidence, sensor_data, battery_level, signal_quality
+    )
+    SELECT s.user_id, s.device_id, s.timestamp, s.glucose_value,
+           s.confidence, s.sensor_data, s.battery_level, s.signal_quality
+    FROM {STAGING_TABLE} s
+    JOIN devices d ON d.device_id = s.device_id AND d.user_id = s.user_id
+    ON CONFLICT (device_id, timestamp) DO NOTHING
+    RETURNING user_id, timestamp::date AS day
+"""
+
+
+# ---------- streaming parsers ----------
+
+# A record that has not ended after this many characters is treated as malformed
+MAX_RECORD_CHARS = 1 << 20
+# Where the parser picks up again after a record it cannot delimit: a line
+# starting with "{" (one object per line, or a pretty-printed array)
+_RECORD_START = re.compile(r"\n[ \t]*(?=\{)")
+
+
+class MalformedRecord(NamedTuple):
+    """A JSON record that could not be parsed; the parser skips it and continues"""
+    line: int
+    error: str
+    text: str  # beginning of the record
+
+
+def _record_end(buffer: str, start: int) -> int:
+    """Index just past the object or array starting at start (by bracket depth), or -1 if not in buffer"""
+    depth = 0
+    in_string = escaped = False
+    for index in range(start, len(buffer)):
+        char = buffer[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return -1
+
+
+def _malformed_end(buffer: str, position: int, eof: bool) -> Optional[int]:
+    """
+    Where a record that failed to parse ends, or None when more input is needed to tell
+
+    A complete object is skipped as a whole. One that does not end within
+    MAX_RECORD_CHARS (or before the end of the file), or text that is not an
+    object, is skipped up to the next line that starts with "{".
+    """
+    pending = len(buffer) - position
+    if buffer[position] == "{":
+        end = _record_end(buffer, position)
+        if end >= 0:
+            return end
+        if not eof and pending < MAX_RECORD_CHARS:
+            return None  # most likely just cut off by the read chunk
+    restart = _RECORD_START.search(buffer, position + 1)
+    if restart:
+        return restart.end()
+    if eof or pending >= MAX_RECORD_CHARS:
+        return len(buffer)
+    return None
+
+
+def iter_json_objects(stream: TextIO, chunk_size: int = 1 << 16) -> Iterator[Union[dict, MalformedRecord]]:
+    """
+    Incrementally yield objects from a JSON array or newline-delimited JSON
+
+    Only the current object and one read chunk are held in memory. Records
+    that fail to parse are yielded as MalformedRecord and skipped.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    lines_before = 0  # newlines in the part of the file already dropped from buffer
+    eof = False
+    while True:
+        # Skip array brackets, separators and whitespace between objects
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            position += 1
+
+        if position < len(buffer):
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+                yield obj
+                continue
+            except json.JSONDecodeError as e:
+                end = _malformed_end(buffer, position, eof)
+                if end is not None:
+                    line = lines_before + buffer.count("\n", 0, position) + 1
+                    yield MalformedRecord(line, e.msg, buffer[position:min(end, position + 200)])
+                    position = end
+                    continue
+
+        if eof:
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        lines_before += buffer.count("\n", 0, position)
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_csv_objects(stream: TextIO) -> Iterator[dict]:
+    """Yield reading dicts from a CSV export, nesting the sensor channels"""
+    for row in csv.DictReader(stream):
+        sensor_data = {}
+        for field in SENSOR_FIELDS:
+            value = row.pop(f"sensorData.{field}", None)
+            if value is None:
+                value = row.pop(field, None)
+            if value is not None:
+                sensor_data[field] = value
+        row["sensorData"] = sensor_data
+        yield row
+
+
+def iter_records(path: str, file_format: Optional[str] = None) -> Iterator[Tuple[int, Union[dict, MalformedRecord]]]:
+    """Yield (row_number, raw_dict) pairs from a JSON or CSV file (JSON records that fail to parse as MalformedRecord)"""
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "json")
+    with open(path, newline="" if file_format == "csv" else None, encoding="utf-8") as stream:
+        parser = iter_csv_objects(stream) if file_format == "csv" else iter_json_objects(stream)
+        for row_number, obj in enumerate(parser, start=1):
+            yield row_number, obj
+
+
+def to_staging_record(reading: GlucoseReadingImport) -> tuple:
+    return (
+        reading.userId,
+        reading.deviceId,
+        reading.timestamp,  # Already naive UTC from validator
+        reading.glucoseValue,
+        reading.confidence,
+        json.dumps(reading.sensorData.model_dump()),
+        reading.batteryLevel,
+        reading.signalQuality.value,
+    )
+
+
+# ---------- import ----------
+
+class ReadingImporter:
+    def __init__(self, batch_size: int = 10000, errors_file: Optional[TextIO] = None, dry_run: bool = False):
+        self.batch_size = batch_size
+        self.errors_file = errors_file
+        self.dry_run = dry_run
+        self.parsed = 0
+        self.invalid = 0
+        self.malformed = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.orphaned = 0
+        self.affected_days = set()
+
+    def reject(self, row_number: int, raw: dict, error: str):
+        self.invalid += 1
+        if self.errors_file:
+            self.errors_file.write(json.dumps({"row": row_number, "error": error, "data": raw}, default=str) + "\n")
+
+    async def load_batch(self, connection, batch):
+        """COPY one batch into staging and merge it into glucose_readings"""
+        async with connection.transaction():
+            await connection.execute(f"TRUNCATE {STAGING_TABLE}")
+            await connection.copy_records_to_table(STAGING_TABLE, records=batch, columns=STAGING_COLUMNS)
+            orphaned = await connection.fetchval(ORPHAN_COUNT_QUERY)
+            rows = await connection.fetch(MERGE_QUERY)
+        self.orphaned += orphaned
+        self.inserted += len(rows)
+        self.duplicates += len(batch) - orphaned - len(rows)
+        self.affected_days.update((row["user_id"], row["day"]) for row in rows)
+
+    async def run(self, path: str, file_format: Optional[str] = None):
+        started = time.perf_counter()
+        # Rows are batched per shard and merged on the shard that owns their user
+        batches: Dict[int, list] = {}
+        async with AsyncExitStack() as stack:
+            connections = {}
+
+            async def connection_for(shard: int):
+                if shard not in connections:
+                    connection = await stack.enter_async_context(database.pools[shard].acquire())
+                    await connection.execute(CREATE_STAGING_QUERY)
+                    connections[shard] = connection
+                return connections[shard]
+
+            for row_number, raw in iter_records(path, file_format):
+                self.parsed += 1
+                if isinstance(raw, MalformedRecord):
+                    self.malformed += 1
+                    self.reject(row_number, raw.text, f"malformed JSON at line {raw.line}: {raw.error}")
+                    if self.malformed <= 10:
+                        print(f"⚠️ Skipping malformed JSON record {row_number} at line {raw.line}: {raw.error}")
+                    continue
+                try:
+                    reading = GlucoseReadingImport(**raw)
+                    record = to_staging_record(reading)
+                except (ValidationError, TypeError) as e:
+                    self.reject(row_number, raw, str(e))
+                    continue
+                shard = database.router.shard_for(reading.userId)
+                batch = batches.setdefault(shard, [])
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    if not self.dry_run:
+                        await self.load_batch(await connection_for(shard), batch)
+                    batches[shard] = []
+                    print(f"   ... {self.parsed:,} rows read, {self.inserted:,} inserted")
+            for shard, batch in batches.items():
+                if batch and not self.dry_run:
+                    await self.load_batch(await connection_for(shard), batch)
+
+            rebuilt = 0
+            if self.affected_days:
+                print(f"📊 Rebuilding analytics for {len(self.affected_days):,} user-days...")
+                days_by_shard: Dict[int, list] = {}
+                for user_id, day in self.affected_days:
+                    days_by_shard.setdefault(database.router.shard_for(user_id), []).append((user_id, day))
+                for shard, user_days in days_by_shard.items():
+                    rebuilt += await rebuild_daily_analytics(await connection_for(shard), user_days)
+            for connection in connections.values():
+                await connection.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+        # Invalidate ETags / cached analytics of every user that received readings
+        if not await data_versions.bump(user_id for user_id, _ in self.affected_days):
+            print("⚠️ Could not update data versions: clients may keep cached history/analytics "
+                  "until their next new reading")
+
+        elapsed = time.perf_counter() - started
+        return {
+            "parsed": self.parsed,
+            "invalid": self.invalid,
+            "malformed": self.malformed,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "unknown_user_or_device": self.orphaned,
+            "analytics_days_rebuilt": rebuilt,
+            "elapsed_s": round(elapsed, 2),
+        }
+
+
+async def run(args):
+    if not await database.connect():
+        raise SystemExit(1)
+    await redis_client.connect()
+    errors_file = open(args.errors_file, "w", encoding="utf-8") if args.errors_file else None
+    try:
+        importer = ReadingImporter(args.batch_size, errors_file, args.dry_run)
+        summary = await importer.run(args.path, args.format)
+    finally:
+        if errors_file:
+            errors_file.close()
+        await database.disconnect()
+        await redis_client.disconnect()
+    print(json.dumps(summary, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical glucose readings from JSON or CSV")
+    parser.add_argument("path", help="JSON array, newline-delimited JSON or CSV file")
+    parser.add_argument("--format", choices=["json", "csv"], help="Input format (default: by file extension)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per COPY/merge batch")
+    parser.add_argument("--errors-file", help="Write rejected rows with their errors as JSON lines")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, do not write to the database")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
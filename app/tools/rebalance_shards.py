@@ -0,0 +1,181 @@
+"""
+Move users to the shard that owns them
+
+Users are placed on shards by a consistent hash ring over DB_SHARD_DSNS.
+After a shard is appended, the ring assigns about 1/N of the users to it
+while their rows are still stored on the old shards. This tool finds every
+user stored on a shard other than its owner and moves them in batches:
+
+1. Every row of the batch's users (profile, alert configs, devices and their
+   battery/calibration/settings rows, readings, alerts, daily rollups) is
+   copied to the owning shard in foreign key order, through a staging table
+   and ``INSERT ... ON CONFLICT DO NOTHING``. A copy can be repeated safely;
+   a later pass only adds rows written in the meantime.
+2. The users are deleted from the source shard (everything else cascades).
+   Their ``users`` rows are locked for the whole move, so a reading written
+   to the source concurrently is either copied or rejected, never lost.
+
+Rolling out a new shard:
+    # 1. With the NEW shard list, while the API still runs with the old one
+    DB_SHARD_DSNS=<old>,<new> python -m app.tools.rebalance_shards --copy-only
+    # 2. Deploy the API with the new shard list
+    # 3. Copy what was written in between and remove the users from their old shards
+    DB_SHARD_DSNS=<old>,<new> python -m app.tools.rebalance_shards
+
+Usage:
+    python -m app.tools.rebalance_shards --dry-run
+    python -m app.tools.rebalance_shards --users user_5678,user_9012 --batch-users 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.database import database
+from app.services.export import parse_user_ids
+
+DEVICE_FILTER = "device_id IN (SELECT device_id FROM devices WHERE user_id = ANY($1::varchar[]))"
+USER_FILTER = "user_id = ANY($1::varchar[])"
+
+# Everything stored per user, parents before children
+USER_TABLES = [
+    ("users", USER_FILTER),
+    ("alert_configs", USER_FILTER),
+    ("devices", USER_FILTER),
+    ("device_battery_info", DEVICE_FILTER),
+    ("device_sensor_calibration", DEVICE_FILTER),
+    ("device_user_settings", DEVICE_FILTER),
+    ("glucose_readings", USER_FILTER),
+    ("alert_history", USER_FILTER),
+    ("glucose_analytics", USER_FILTER),
+]
+
+
+async def find_misplaced(user_filter: Optional[set] = None) -> Dict[Tuple[int, int], List[str]]:
+    """Users stored on a shard other than their owner, keyed by (source, target) shard"""
+    moves: Dict[Tuple[int, int], List[str]] = {}
+    for shard in range(database.shard_count):
+        connection = await database.open_connection(shard)
+        try:
+            rows = await connection.fetch("SELECT user_id FROM users ORDER BY user_id")
+        finally:
+            await connection.close()
+        for row in rows:
+            user_id = row["user_id"]
+            if user_filter is not None and user_id not in user_filter:
+                continue
+            owner = database.router.shard_for(user_id)
+            if owner != shard:
+                moves.setdefault((shard, owner), []).append(user_id)
+    return moves
+
+
+COLUMNS_QUERY = """
+    SELECT column_name FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = $1
+    ORDER BY ordinal_position
+"""
+
+
+async def table_columns(connection, table: str) -> List[str]:
+    return [row["column_name"] for row in await connection.fetch(COLUMNS_QUERY, table)]
+
+
+async def copy_table(source, target, table: str, where: str, user_ids: List[str], chunk_size: int) -> int:
+    """Copy one table's rows for the users; returns the number of rows that were new on the target"""
+    # Column order differs between shards created from schema.sql and shards
+    # upgraded with ALTER TABLE ... ADD COLUMN, so every column is named
+    source_columns = await table_columns(source, table)
+    target_columns = set(await table_columns(target, table))
+    missing = [column for column in source_columns if column not in target_columns]
+    if missing:
+        raise RuntimeError(f"{table} on the target shard lacks column(s) {', '.join(missing)}; upgrade its schema first")
+    columns = ", ".join(f'"{column}"' for column in source_columns)
+
+    staging = f"rebalance_{table}"
+    await target.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS)")
+    await target.execute(f"TRUNCATE {staging}")
+    cursor = await source.cursor(f"SELECT {columns} FROM {table} WHERE {where}", user_ids, prefetch=chunk_size)
+    while True:
+        rows = await cursor.fetch(chunk_size)
+        if not rows:
+            break
+        await target.copy_records_to_table(staging, records=rows, columns=source_columns)
+    status = await target.execute(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING"
+    )
+    return int(status.split()[-1])
+
+
+async def move_users(source, target, user_ids: List[str], delete_source: bool, chunk_size: int) -> Dict[str, int]:
+    """Copy a batch of users to the target shard and (optionally) delete them from the source"""
+    copied = {}
+    async with source.transaction(readonly=not delete_source):
+        if delete_source:
+            # Blocks concurrent inserts that reference these users until the delete commits
+            await source.fetch("SELECT user_id FROM users WHERE user_id = ANY($1::varchar[]) FOR UPDATE", user_ids)
+        async with target.transaction():
+            for table, where in USER_TABLES:
+                copied[table] = await copy_table(source, target, table, where, user_ids, chunk_size)
+        if delete_source:
+            # Devices, readings, alerts and rollups cascade from users
+            await source.execute("DELETE FROM users WHERE user_id = ANY($1::varchar[])", user_ids)
+    return copied
+
+
+async def run(args):
+    if database.shard_count == 1:
+        print("ℹ️ Only one shard is configured (DB_SHARD_DSNS); nothing to rebalance")
+        return
+
+    user_filter = set(parse_user_ids(args.users)) if args.users else None
+    moves = await find_misplaced(user_filter)
+    plan = {f"{source}->{target}": len(user_ids) for (source, target), user_ids in sorted(moves.items())}
+    print(f"🧭 {sum(plan.values())} user(s) to move across {database.shard_count} shards: {plan or 'none'}")
+    if args.dry_run or not moves:
+        return
+
+    started = time.perf_counter()
+    totals: Dict[str, int] = {table: 0 for table, _ in USER_TABLES}
+    moved = 0
+    for (source_shard, target_shard), user_ids in sorted(moves.items()):
+        source = await database.open_connection(source_shard)
+        target = await database.open_connection(target_shard)
+        try:
+            for i in range(0, len(user_ids), args.batch_users):
+                batch = user_ids[i:i + args.batch_users]
+                copied = await move_users(source, target, batch, not args.copy_only, args.chunk_size)
+                for table, count in copied.items():
+                    totals[table] += count
+                moved += len(batch)
+                print(f"   ... shard {source_shard} -> {target_shard}: {i + len(batch)}/{len(user_ids)} users")
+        finally:
+            await source.close()
+            await target.close()
+
+    print(json.dumps({
+        "users": moved,
+        "moves": plan,
+        "source_rows_deleted": not args.copy_only,
+        "rows_copied": totals,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Move users to the shard that owns them on the hash ring")
+    parser.add_argument("--users", help="Only consider these comma-separated user IDs")
+    parser.add_argument("--batch-users", type=int, default=100, help="Users moved per transaction")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="Rows fetched per cursor round trip")
+    parser.add_argument("--copy-only", action="store_true", help="Copy to the owning shard but keep the source rows")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many users would move")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Bulk reprocessing of a device's stored readings
+
+Applies the current temperature calibration and the ingest Kalman filter to a
+device's history with NumPy and writes the result as CSV, alongside a summary
+of how many rapid-change alerts the raw and the filtered signal would raise.
+Stored readings are not modified.
+
+Usage:
+    python -m app.tools.reprocess_device ARGUS_001234 --days 30 --output ARGUS_001234.csv
+"""
+import argparse
+import asyncio
+import csv
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.core.database import database
+from app.services.signal_processing import reprocess_device_history
+
+DEFAULT_RAPID_CHANGE = 4.0  # mg/dL/min
+
+
+async def run(args):
+    if not await database.connect():
+        raise SystemExit(1)
+    try:
+        since = datetime.utcnow() - timedelta(days=args.days)
+        result = await reprocess_device_history(args.device_id, since)
+    finally:
+        await database.disconnect()
+
+    if args.output:
+        columns = list(result)
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in zip(*(result[column].tolist() for column in columns)):
+                writer.writerow(row)
+
+    raw_alerts = int(np.sum(np.abs(np.nan_to_num(result["raw_rate"])) >= args.rapid_change))
+    filtered_alerts = int(np.sum(np.abs(np.nan_to_num(result["rate"])) >= args.rapid_change))
+    print(json.dumps({
+        "device_id": args.device_id,
+        "readings": int(len(result["raw"])),
+        "motion_artifacts": int(np.sum(result["motion_artifact"])),
+        "rapid_change_alerts_raw": raw_alerts,
+        "rapid_change_alerts_filtered": filtered_alerts,
+        "mean_abs_correction": round(float(np.mean(np.abs(result["raw"] - result["filtered"]))), 2) if len(result["raw"]) else 0.0,
+        "output": args.output,
+    }, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute calibrated and filtered values for a device")
+    parser.add_argument("device_id", help="Device ID")
+    parser.add_argument("--days", type=int, default=30, help="Days of history to reprocess")
+    parser.add_argument("--rapid-change", type=float, default=DEFAULT_RAPID_CHANGE, help="Rapid change threshold (mg/dL/min)")
+    parser.add_argument("--output", help="Write per-reading results as CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -36,8 +36,9 @@ CREATE TABLE devices (
 -- Device battery information
 CREATE TABLE device_battery_info (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    device_id VARCHAR(50) REFERENCES devices(device_id) ON DELETE CASCADE,
+    device_id VARCHAR(50) UNIQUE REFERENCES devices(device_id) ON DELETE CASCADE,
     current_level INTEGER CHECK (current_level >= 0 AND current_level <= 100),
+    reported_at TIMESTAMP,  -- time of the reading that reported current_level
     estimated_hours_remaining INTEGER CHECK (estimated_hours_remaining >= 0),
     charge_cycles INTEGER DEFAULT 0,
     battery_health VARCHAR(20) CHECK (battery_health IN ('excellent', 'good', 'fair', 'poor')),
@@ -129,6 +130,18 @@ CREATE TABLE glucose_analytics (
     UNIQUE(user_id, date)
 );
 
+-- Cohort analytics snapshots (population metrics, computed by a background job)
+CREATE TABLE cohort_analytics (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    period_days INTEGER NOT NULL CHECK (period_days > 0),
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    users_count INTEGER DEFAULT 0,
+    readings_count BIGINT DEFAULT 0,
+    metrics JSONB NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- API audit log table
 CREATE TABLE api_audit_log (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -168,6 +181,9 @@ CREATE INDEX idx_alert_history_acknowledged ON alert_history(acknowledged);
 -- Indexes for analytics
 CREATE INDEX idx_glucose_analytics_user_date ON glucose_analytics(user_id, date DESC);
 
+-- Indexes for cohort analytics (latest snapshot per period)
+CREATE INDEX idx_cohort_analytics_period_computed ON cohort_analytics(period_days, computed_at DESC);
+
 -- Indexes for audit log
 CREATE INDEX idx_api_audit_log_timestamp ON api_audit_log(created_at DESC);
 CREATE INDEX idx_api_audit_log_user_id ON api_audit_log(user_id);
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+KOS Glucose API - Ingest Format Benchmark (JSON vs compact MessagePack)
+
+Measures, for single readings and for batches:
+- bytes on the wire per reading
+- parse + validate time per reading (json.loads + GlucoseReadingCreate vs
+  msgpack.unpackb + decode_compact_reading)
+
+and checks that both paths accept and reject the same inputs by applying a
+set of invalid mutations to every reading. No database is needed.
+
+Usage:
+    python -m benchmarks.ingest_formats --readings 5000 --batch-size 100 --output ingest_formats.json
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+from pydantic import ValidationError
+
+from app.schemas.compact import ReadingValidationError, decode_compact_reading, encode_compact_reading
+from app.schemas.glucose import GlucoseReadingCreate
+
+# (field path, invalid value) applied to a valid reading; both formats must reject each one
+MUTATIONS = [
+    (("glucoseValue",), 39),
+    (("glucoseValue",), 401),
+    (("batteryLevel",), 101),
+    (("batteryLevel",), -1),
+    (("deviceId",), ""),
+    (("userId",), "u" * 51),
+    (("sensorData", "temperature"), 29.5),
+    (("sensorData", "temperature"), 45.5),
+    (("sensorData", "red"), -1.0),
+    (("timestamp",), "future"),
+    (("timestamp",), "stale"),
+]
+
+
+def make_reading(rng: random.Random, index: int, now: datetime) -> dict:
+    timestamp = now - timedelta(seconds=rng.randint(0, 3600))
+    return {
+        "deviceId": f"ARGUS_{index % 1000:06d}",
+        "userId": f"user_{index % 1000:06d}",
+        "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+        "glucoseValue": rng.randint(45, 380),
+        "confidence": round(rng.uniform(0.6, 1.0), 3),
+        "sensorData": {
+            "red": round(rng.uniform(900, 1500), 1),
+            "infrared": round(rng.uniform(1800, 2600), 1),
+            "green": round(rng.uniform(3000, 3800), 1),
+            "temperature": round(rng.uniform(33, 38), 1),
+            "motionArtifact": rng.random() < 0.1,
+        },
+        "batteryLevel": rng.randint(5, 100),
+        "signalQuality": rng.choice(["excellent", "good", "fair", "poor"]),
+    }
+
+
+def mutate(reading: dict, path: tuple, value, now: datetime) -> dict:
+    mutated = json.loads(json.dumps(reading))
+    if value == "future":
+        value = (now + timedelta(hours=1)).isoformat()
+    elif value == "stale":
+        value = (now - timedelta(hours=73)).isoformat()
+    target = mutated
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
+    return mutated
+
+
+def validate_json(body: bytes):
+    return GlucoseReadingCreate.model_validate(json.loads(body))
+
+
+def validate_msgpack(body: bytes):
+    return decode_compact_reading(msgpack.unpackb(body))
+
+
+def validate_json_batch(body: bytes):
+    return [GlucoseReadingCreate.model_validate(item) for item in json.loads(body)]
+
+
+def validate_msgpack_batch(body: bytes):
+    return [decode_compact_reading(item) for item in msgpack.unpackb(body)]
+
+
+def time_per_reading(function, bodies, readings_per_body: int, repeat: int) -> float:
+    """Best-of-repeat time per reading in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in bodies:
+            function(body)
+        best = min(best, time.perf_counter() - started)
+    return best / (len(bodies) * readings_per_body) * 1e6
+
+
+def parity_check(readings, now: datetime) -> dict:
+    """Both validators must accept every valid reading and reject every mutation"""
+    mismatches = []
+    checked = 0
+    for reading in readings:
+        cases = [(None, reading)] + [(path, mutate(reading, path, value, now)) for path, value in MUTATIONS]
+        for path, case in cases:
+            checked += 1
+            try:
+                GlucoseReadingCreate.model_validate(case)
+                json_ok = True
+            except ValidationError:
+                json_ok = False
+            try:
+                decode_compact_reading(msgpack.unpackb(msgpack.packb(encode_compact_reading(case))))
+                compact_ok = True
+            except ReadingValidationError:
+                compact_ok = False
+            if json_ok != compact_ok or json_ok != (path is None):
+                mismatches.append({"mutation": ".".join(path) if path else None, "json": json_ok, "msgpack": compact_ok})
+    return {"cases": checked, "mismatches": mismatches[:20], "mismatch_count": len(mismatches)}
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    readings = [make_reading(rng, i, now) for i in range(args.readings)]
+    batches = [readings[i:i + args.batch_size] for i in range(0, len(readings), args.batch_size)]
+
+    bodies = {
+        "json": [json.dumps(r).encode() for r in readings],
+        "msgpack": [msgpack.packb(encode_compact_reading(r)) for r in readings],
+        "json_batch": [json.dumps(b).encode() for b in batches],
+        "msgpack_batch": [msgpack.packb([encode_compact_reading(r) for r in b]) for b in batches],
+    }
+    validators = {
+        "json": (validate_json, 1),
+        "msgpack": (validate_msgpack, 1),
+        "json_batch": (validate_json_batch, args.batch_size),
+        "msgpack_batch": (validate_msgpack_batch, args.batch_size),
+    }
+
+    results = {}
+    for name, (function, per_body) in validators.items():
+        payload = bodies[name]
+        results[name] = {
+            "bytes_per_reading": round(sum(len(b) for b in payload) / len(readings), 1),
+            "parse_validate_us_per_reading": round(time_per_reading(function, payload, per_body, args.repeat), 2),
+        }
+    for mode in ("", "_batch"):
+        json_stats, compact_stats = results[f"json{mode}"], results[f"msgpack{mode}"]
+        results[f"msgpack{mode}"]["bytes_vs_json"] = round(compact_stats["bytes_per_reading"] / json_stats["bytes_per_reading"], 3)
+        results[f"msgpack{mode}"]["speedup_vs_json"] = round(
+            json_stats["parse_validate_us_per_reading"] / compact_stats["parse_validate_us_per_reading"], 2
+        )
+
+    return {
+        "readings": args.readings,
+        "batch_size": args.batch_size,
+        "formats": results,
+        "parity": parity_check(readings[:args.parity_samples], now),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare JSON and MessagePack ingest payloads")
+    parser.add_argument("--readings", type=int, default=5000, help="Readings to encode and validate")
+    parser.add_argument("--batch-size", type=int, default=100, help="Readings per batch payload")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--parity-samples", type=int, default=200, help="Readings used for the accept/reject parity check")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📄 Report written to {args.output}")
+    else:
+        print(output)
+    if result["parity"]["mismatch_count"]:
+        print(f"❌ {result['parity']['mismatch_count']} validation mismatches between JSON and MessagePack")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
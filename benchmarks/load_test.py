@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+KOS Glucose API - Load Test & Benchmark Harness
+
+Drives a simulated ARGUS device fleet posting readings alongside app clients
+polling current/history/analytics, then reports p50/p95/p99 latency,
+throughput and error rate per endpoint as a JSON baseline.
+
+By default the FastAPI app runs in-process (httpx ASGI transport) against the
+local Postgres/Redis from config.env; pass --base-url to target a running
+server instead. Benchmark users/devices (bench_user_*/BENCH_*) are seeded
+before the run and removed afterwards unless --keep-data is given.
+
+Usage:
+    python -m benchmarks.load_test --devices 200 --clients 50 --duration 60 \\
+        --output bench_results.json
+    python -m benchmarks.load_test --compare bench_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+# Devices in a benchmark post far more often than real ones; shrink the
+# per-device rate limit window before the app settings are loaded
+os.environ.setdefault("MAX_GLUCOSE_READING_RATE", "1")
+
+import httpx
+
+API_KEY = "dev-api-key-12345"
+JWT = "Bearer bench-token-123456789"
+BENCH_USER_PREFIX = "bench_user_"
+BENCH_DEVICE_PREFIX = "BENCH_"
+
+# Relative weights of the client polling mix
+CLIENT_MIX = {
+    "current": 0.6,
+    "history": 0.25,
+    "analytics": 0.15,
+}
+
+
+def bench_user_id(index: int) -> str:
+    return f"{BENCH_USER_PREFIX}{index:06d}"
+
+
+def bench_device_id(index: int) -> str:
+    return f"{BENCH_DEVICE_PREFIX}{index:06d}"
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+class EndpointStats:
+    """Latency samples and status counts collected for one endpoint"""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.status_counts = defaultdict(int)
+        self.errors = 0
+
+    def record(self, latency_ms: float, status):
+        self.latencies_ms.append(latency_ms)
+        self.status_counts[str(status)] += 1
+        if status is None or status >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed_s: float) -> dict:
+        values = sorted(self.latencies_ms)
+        count = len(values)
+        return {
+            "requests": count,
+            "throughput_rps": round(count / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "status_counts": dict(self.status_counts),
+            "latency_ms": {
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+                "p99": round(percentile(values, 99), 2),
+                "max": round(values[-1], 2) if values else 0.0,
+                "mean": round(sum(values) / count, 2) if count else 0.0,
+            },
+        }
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.stats = defaultdict(EndpointStats)
+        self.recording = False
+        self.stop_at = 0.0
+        self.client = None
+        self.app = None
+
+    # ---------- setup / teardown ----------
+
+    async def setup(self):
+        if self.args.base_url:
+            self.client = httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout)
+        else:
+            from app.main import app
+
+            self.app = app
+            await app.router.startup()
+            transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 0))
+            self.client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=self.args.timeout)
+        await self.seed()
+
+    async def teardown(self):
+        if not self.args.keep_data:
+            await self.cleanup()
+        if self.client:
+            await self.client.aclose()
+        if self.app:
+            await self.app.router.shutdown()
+
+    async def _db(self):
+        from app.core.database import database
+
+        if not database.pool:
+            await database.connect()
+        return database
+
+    async def seed(self):
+        """Create benchmark users and devices so ingest passes FK validation"""
+        database = await self._db()
+        # Each user and its device go to the shard that owns the user
+        by_shard = {}
+        for i in range(self.args.devices):
+            by_shard.setdefault(database.router.shard_for(bench_user_id(i)), []).append(i)
+
+        async def seed_shard(shard: int, indexes):
+            async with database.pools[shard].acquire() as connection:
+                await connection.executemany(
+                    "INSERT INTO users (user_id) VALUES ($1) ON CONFLICT (user_id) DO NOTHING",
+                    [(bench_user_id(i),) for i in indexes],
+                )
+                await connection.executemany(
+                    "INSERT INTO devices (device_id, user_id) VALUES ($1, $2) ON CONFLICT (device_id) DO NOTHING",
+                    [(bench_device_id(i), bench_user_id(i)) for i in indexes],
+                )
+
+        await asyncio.gather(*[seed_shard(shard, indexes) for shard, indexes in by_shard.items()])
+        print(f"🌱 Seeded {self.args.devices} benchmark users/devices")
+
+    async def cleanup(self):
+        database = await self._db()
+        # Readings, devices and alert rows cascade from users
+        await database.fan_out(
+            lambda pool: pool.execute("DELETE FROM users WHERE user_id LIKE $1", BENCH_USER_PREFIX + "%")
+        )
+        print("🧹 Removed benchmark users/devices")
+
+    # ---------- workload ----------
+
+    async def timed(self, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        status = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception:
+            status = None
+        if self.recording:
+            self.stats[label].record((time.perf_counter() - started) * 1000, status)
+        return status
+
+    def make_reading(self, index: int, timestamp: datetime) -> dict:
+        return {
+            "deviceId": bench_device_id(index),
+            "userId": bench_user_id(index),
+            "timestamp": timestamp.isoformat() + "Z",
+            "glucoseValue": random.randint(60, 250),
+            "confidence": round(random.uniform(0.7, 0.99), 2),
+            "sensorData": {
+                "red": round(random.uniform(1.5, 3.5), 2),
+                "infrared": round(random.uniform(1.0, 2.5), 2),
+                "green": round(random.uniform(2.0, 4.0), 2),
+                "temperature": round(random.uniform(35.5, 37.5), 1),
+                "motionArtifact": random.random() < 0.05,
+            },
+            "batteryLevel": random.randint(20, 100),
+            "signalQuality": random.choice(["excellent", "good", "good", "fair"]),
+        }
+
+    async def device_loop(self, index: int):
+        """One device posting a reading every --device-interval seconds"""
+        device_id = bench_device_id(index)
+        headers = {"X-API-Key": API_KEY}
+        await asyncio.sleep(random.uniform(0, self.args.device_interval))
+        while time.perf_counter() < self.stop_at:
+            reading = self.make_reading(index, datetime.utcnow())
+            await self.timed("POST /devices/{id}/readings", "POST",
+                             f"/api/v1/devices/{device_id}/readings", json=reading, headers=headers)
+            await asyncio.sleep(self.args.device_interval)
+
+    async def client_loop(self):
+        """One app client polling a random benchmark user's data"""
+        headers = {"Authorization": JWT}
+        labels = list(CLIENT_MIX)
+        weights = list(CLIENT_MIX.values())
+        while time.perf_counter() < self.stop_at:
+            user_id = bench_user_id(random.randrange(self.args.devices))
+            kind = random.choices(labels, weights)[0]
+            if kind == "current":
+                await self.timed("GET /users/{id}/glucose/current", "GET",
+                                 f"/api/v1/users/{user_id}/glucose/current", headers=headers)
+            elif kind == "history":
+                await self.timed("GET /users/{id}/glucose/history", "GET",
+                                 f"/api/v1/users/{user_id}/glucose/history",
+                                 params={"period": "7d"}, headers=headers)
+            else:
+                await self.timed("GET /users/{id}/analytics/summary", "GET",
+                                 f"/api/v1/users/{user_id}/analytics/summary",
+                                 params={"period": "30d"}, headers=headers)
+            await asyncio.sleep(self.args.client_think_time)
+
+    async def run(self) -> dict:
+        await self.setup()
+        try:
+            self.stop_at = time.perf_counter() + self.args.warmup + self.args.duration
+            tasks = [asyncio.create_task(self.device_loop(i)) for i in range(self.args.devices)]
+            tasks += [asyncio.create_task(self.client_loop()) for _ in range(self.args.clients)]
+
+            if self.args.warmup:
+                print(f"🔥 Warming up for {self.args.warmup}s...")
+                await asyncio.sleep(self.args.warmup)
+            print(f"⏱️  Measuring for {self.args.duration}s "
+                  f"({self.args.devices} devices, {self.args.clients} clients)...")
+            self.recording = True
+            started = time.perf_counter()
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+            self.recording = False
+        finally:
+            await self.teardown()
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        total = EndpointStats()
+        for stats in self.stats.values():
+            total.latencies_ms.extend(stats.latencies_ms)
+            total.errors += stats.errors
+            for status, count in stats.status_counts.items():
+                total.status_counts[status] += count
+        return {
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "target": self.args.base_url or "in-process",
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "config": {
+                "devices": self.args.devices,
+                "clients": self.args.clients,
+                "duration_s": self.args.duration,
+                "warmup_s": self.args.warmup,
+                "device_interval_s": self.args.device_interval,
+                "client_think_time_s": self.args.client_think_time,
+                "seed": self.args.seed,
+            },
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": {label: stats.summary(elapsed) for label, stats in sorted(self.stats.items())},
+            "total": total.summary(elapsed),
+        }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Return a list of regressions of p95/p99 latency or error rate beyond tolerance"""
+    regressions = []
+    for label, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(label)
+        if not previous:
+            continue
+        for pct in ("p95", "p99"):
+            before = previous["latency_ms"][pct]
+            after = current["latency_ms"][pct]
+            if before > 0 and after > before * (1 + tolerance):
+                regressions.append(f"{label} {pct}: {before}ms -> {after}ms")
+        if current["error_rate"] > previous["error_rate"] + tolerance / 10:
+            regressions.append(f"{label} error rate: {previous['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="KOS Glucose API load test")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--devices", type=int, default=100, help="Simulated devices (one user each)")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent polling clients")
+    parser.add_argument("--duration", type=float, default=30, help="Measured run time in seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured warmup in seconds")
+    parser.add_argument("--device-interval", type=float, default=2.0, help="Seconds between readings per device")
+    parser.add_argument("--client-think-time", type=float, default=0.1, help="Seconds between client polls")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible workloads")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95/p99 increase")
+    parser.add_argument("--keep-data", action="store_true", help="Do not delete benchmark users afterwards")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    result = asyncio.run(LoadTest(args).run())
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📄 Report written to {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Performance regressions detected:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+KOS Glucose API - Startup Time Benchmark
+
+Measures, over several cold runs:
+- import time of app.main (``python -X importtime``), with the heaviest
+  modules it imports directly
+- time from launching a uvicorn server until /health/live answers (imports,
+  Postgres pools and Redis connected) and until /health/ready answers 200
+  (caches warm), against the local Postgres/Redis from config.env
+
+Usage:
+    python -m benchmarks.startup_time --runs 5 --output startup_time.json
+    python -m benchmarks.startup_time --imports-only
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+
+def _parse_importtime(stderr: str) -> tuple:
+    """app.main's cumulative import time and that of each module it imports directly (microseconds)
+
+    -X importtime lists a module after everything it imports, indented two
+    spaces deeper per level
+    """
+    block = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == "app.main":
+                return int(cumulative), {child: us for child, us, child_depth in block if child_depth == 1}
+            block = []
+        else:
+            block.append((name.strip(), int(cumulative), depth))
+    raise RuntimeError("app.main not found in -X importtime output")
+
+
+def measure_import(top: int) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import app.main failed: {result.stderr.strip().splitlines()[-1]}")
+    total_us, children = _parse_importtime(result.stderr)
+    heaviest = sorted(children.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "app_main_ms": round(total_us / 1000, 1),
+        "process_wall_ms": round(wall_ms, 1),
+        "heaviest_imports_ms": {name: round(us / 1000, 1) for name, us in heaviest},
+    }
+
+
+def measure_startup(port: int, timeout: float) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live_ms = ready_ms = None
+    readiness = None
+    try:
+        deadline = started + timeout
+        with httpx.Client(timeout=1) as client:
+            while time.perf_counter() < deadline and ready_ms is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {process.returncode} (is Postgres running?)")
+                try:
+                    if live_ms is None and client.get(f"{base_url}/health/live").status_code == 200:
+                        live_ms = (time.perf_counter() - started) * 1000
+                    if live_ms is not None:
+                        response = client.get(f"{base_url}/health/ready")
+                        readiness = response.json()
+                        if response.status_code == 200:
+                            ready_ms = (time.perf_counter() - started) * 1000
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {
+        "live_ms": round(live_ms, 1) if live_ms is not None else None,
+        "ready_ms": round(ready_ms, 1) if ready_ms is not None else None,
+        "caches": readiness["caches"] if readiness else None,
+    }
+
+
+def _summary(values: list) -> dict:
+    values = [value for value in values if value is not None]
+    if not values:
+        return {"median": None, "min": None, "max": None}
+    return {"median": round(statistics.median(values), 1), "min": min(values), "max": max(values)}
+
+
+def run(args) -> dict:
+    imports = []
+    for i in range(args.runs):
+        result = measure_import(args.top)
+        print(f"⏱️  import {i + 1}/{args.runs}: app.main {result['app_main_ms']} ms "
+              f"(process {result['process_wall_ms']} ms)")
+        imports.append(result)
+
+    startups = []
+    if not args.imports_only:
+        for i in range(args.runs):
+            result = measure_startup(args.port, args.timeout)
+            print(f"⏱️  startup {i + 1}/{args.runs}: live {result['live_ms']} ms, ready {result['ready_ms']} ms")
+            startups.append(result)
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {"runs": args.runs},
+        "import": {
+            "app_main_ms": _summary([result["app_main_ms"] for result in imports]),
+            "process_wall_ms": _summary([result["process_wall_ms"] for result in imports]),
+            "heaviest_imports_ms": imports[-1]["heaviest_imports_ms"],
+        },
+    }
+    if startups:
+        report["startup"] = {
+            "live_ms": _summary([result["live_ms"] for result in startups]),
+            "ready_ms": _summary([result["ready_ms"] for result in startups]),
+            "caches": startups[-1]["caches"],
+        }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import and startup-to-ready time of the API")
+    parser.add_argument("--runs", type=int, default=5, help="Cold runs per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest direct imports of app.main to report")
+    parser.add_argument("--port", type=int, default=8766, help="Port for the benchmark server")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for readiness per run")
+    parser.add_argument("--imports-only", action="store_true", help="Skip the server startup runs (no Postgres needed)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📄 Report written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+KOS Glucose API - Worker Scaling Benchmark (ingest path)
+
+Starts the API under gunicorn with 1, 2, 4, ... uvicorn workers and measures
+sustained POST /devices/{id}/readings throughput at each size against the
+local Postgres/Redis from config.env. Load is generated by several separate
+processes so the client is not the bottleneck.
+
+Each load connection cycles through its own set of benchmark devices and never
+reuses a device within the rate limit window (MAX_GLUCOSE_READING_RATE is set
+to 1 second for the server), so --devices bounds the offered load. Scaling
+efficiency is throughput(N) / (N * throughput(1)).
+
+Usage:
+    python -m benchmarks.worker_scaling --workers 1 2 4 8 --duration 20 --output worker_scaling.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+os.environ.setdefault("MAX_GLUCOSE_READING_RATE", "1")
+RATE_LIMIT_WINDOW = float(os.environ["MAX_GLUCOSE_READING_RATE"]) + 0.1
+
+import httpx
+
+from benchmarks.load_test import API_KEY, BENCH_USER_PREFIX, bench_device_id, bench_user_id, percentile
+
+
+def make_reading(index: int) -> dict:
+    return {
+        "deviceId": bench_device_id(index),
+        "userId": bench_user_id(index),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "glucoseValue": random.randint(70, 180),
+        "confidence": 0.95,
+        "sensorData": {"red": 2.1, "infrared": 1.6, "green": 3.2, "temperature": 36.6, "motionArtifact": False},
+        "batteryLevel": random.randint(30, 100),
+        "signalQuality": "good",
+    }
+
+
+async def _drive(base_url: str, devices: range, connections: int, warmup: float, duration: float) -> dict:
+    """Closed loop: each connection posts back to back, rotating through its devices"""
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    started_at = time.perf_counter()
+    measure_from = started_at + warmup
+    stop_at = measure_from + duration
+    latencies = []
+    statuses = {}
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30,
+                                 headers={"X-API-Key": API_KEY}) as client:
+        async def connection_loop(slot: int):
+            own = devices[slot::connections]
+            last_used = [0.0] * len(own)
+            position = 0
+            while True:
+                slot_position = position % len(own)
+                # Never reuse a device inside its rate limit window
+                wait = last_used[slot_position] + RATE_LIMIT_WINDOW - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                now = time.perf_counter()
+                if now >= stop_at:
+                    return
+                index = own[slot_position]
+                last_used[slot_position] = now
+                position += 1
+                try:
+                    response = await client.post(f"/api/v1/devices/{bench_device_id(index)}/readings",
+                                                 json=make_reading(index))
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 0
+                if now >= measure_from:
+                    latencies.append((time.perf_counter() - now) * 1000)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*[connection_loop(slot) for slot in range(connections)])
+    return {"latencies_ms": latencies, "statuses": statuses}
+
+
+def _load_process(base_url: str, start: int, stop: int, connections: int, warmup: float, duration: float) -> dict:
+    return asyncio.run(_drive(base_url, range(start, stop), connections, warmup, duration))
+
+
+async def _seed(devices: int):
+    from app.core.database import database
+
+    by_shard = {}
+    for i in range(devices):
+        by_shard.setdefault(database.router.shard_for(bench_user_id(i)), []).append(i)
+    for shard, indexes in by_shard.items():
+        connection = await database.open_connection(shard)
+        try:
+            await connection.copy_records_to_table(
+                "users", records=[(bench_user_id(i),) for i in indexes], columns=["user_id"]
+            )
+            await connection.copy_records_to_table(
+                "devices", records=[(bench_device_id(i), bench_user_id(i)) for i in indexes],
+                columns=["device_id", "user_id"]
+            )
+        finally:
+            await connection.close()
+    print(f"🌱 Seeded {devices} benchmark users/devices")
+
+
+async def _cleanup():
+    from app.core.database import database
+
+    for shard in range(database.shard_count):
+        connection = await database.open_connection(shard)
+        try:
+            # Readings, devices and alert rows cascade from users
+            await connection.execute("DELETE FROM users WHERE user_id LIKE $1", BENCH_USER_PREFIX + "%")
+        finally:
+            await connection.close()
+    print("🧹 Removed benchmark users/devices")
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py",
+         "-w", str(workers), "--bind", f"127.0.0.1:{port}"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=1).status_code == 200:
+                # Give the remaining workers time to finish their startup
+                time.sleep(1 + 0.25 * workers)
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become healthy within 60s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def measure(args, workers: int) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(workers, args.port)
+    try:
+        per_process = args.devices // args.load_processes
+        with ProcessPoolExecutor(args.load_processes) as pool:
+            futures = [
+                pool.submit(_load_process, base_url, i * per_process, (i + 1) * per_process,
+                            args.connections, args.warmup, args.duration)
+                for i in range(args.load_processes)
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        stop_server(server)
+
+    latencies = sorted(value for result in results for value in result["latencies_ms"])
+    statuses = {}
+    for result in results:
+        for status, count in result["statuses"].items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+    created = statuses.get("201", 0)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "status_counts": statuses,
+        "ingest_rps": round(created / args.duration, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+        },
+    }
+
+
+def run(args) -> dict:
+    asyncio.run(_cleanup())
+    asyncio.run(_seed(args.devices))
+    try:
+        runs = []
+        for workers in args.workers:
+            print(f"⏱️  {workers} worker(s): {args.load_processes} load processes x {args.connections} connections, "
+                  f"{args.duration}s...")
+            result = measure(args, workers)
+            print(f"   {result['ingest_rps']} readings/s, p99 {result['latency_ms']['p99']} ms")
+            runs.append(result)
+    finally:
+        if not args.keep_data:
+            asyncio.run(_cleanup())
+
+    baseline = next((r for r in runs if r["workers"] == 1), runs[0])
+    per_worker = baseline["ingest_rps"] / baseline["workers"] if baseline["ingest_rps"] else 0
+    for result in runs:
+        result["speedup"] = round(result["ingest_rps"] / baseline["ingest_rps"], 2) if baseline["ingest_rps"] else 0.0
+        result["efficiency"] = round(result["ingest_rps"] / (per_worker * result["workers"]), 2) if per_worker else 0.0
+
+    return {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "devices": args.devices,
+            "load_processes": args.load_processes,
+            "connections_per_process": args.connections,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+        },
+        "runs": runs,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest throughput vs. gunicorn worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure")
+    parser.add_argument("--devices", type=int, default=20000, help="Benchmark devices (one user each)")
+    parser.add_argument("--load-processes", type=int, default=4, help="Load generator processes")
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent connections per load process")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds per worker count")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the benchmark server")
+    parser.add_argument("--keep-data", action="store_true", help="Do not delete benchmark users afterwards")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📄 Report written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Gunicorn configuration for multi-process serving
+
+    gunicorn app.main:app -c gunicorn.conf.py            # WEB_CONCURRENCY workers
+    gunicorn app.main:app -c gunicorn.conf.py -w 8       # explicit worker count
+
+Each worker is a separate uvicorn event loop with its own Postgres pool and
+Redis client. The worker count is exported as WEB_CONCURRENCY before workers
+start, so each pool gets DB_CONNECTION_BUDGET / workers connections and the
+total stays within the budget however the count was chosen.
+"""
+import os
+
+from app.core.config import settings
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.web_concurrency
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# The app is imported in each worker after the fork: no event loop, pool or
+# client is ever shared between processes
+preload_app = False
+
+# Startup connects to Postgres/Redis; shutdown flushes audit/telemetry buffers
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers in containers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = None
+errorlog = "-"
+loglevel = "info"
+
+
+def on_starting(server):
+    # Workers size their pools from WEB_CONCURRENCY; keep it in sync with -w.
+    # Settings were already loaded by this file and are inherited by the fork.
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    settings.web_concurrency = server.cfg.workers
+    print(f"🚀 Starting {server.cfg.workers} worker(s) sharing a budget of "
+          f"{settings.db_connection_budget} Postgres connections")
@@ -0,0 +1,108 @@
+"""
+Audit log writer accounting: every buffered record ends up either written
+or counted as dropped, including across stop()
+"""
+import asyncio
+
+import asyncpg
+import pytest
+
+from app.core import audit
+from app.core.audit import AuditLogWriter
+
+
+class FakeConnection:
+    def __init__(self, copy_delay: float = 0.0, reject_endpoint: str = None):
+        self.copy_delay = copy_delay
+        self.reject_endpoint = reject_endpoint
+        self.rows = []
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        await asyncio.sleep(self.copy_delay)
+        if any(record[2] == self.reject_endpoint for record in records):
+            raise asyncpg.DataError("value too long")
+        self.rows.extend(records)
+
+    async def execute(self, query, *record):
+        if record[2] == self.reject_endpoint:
+            raise asyncpg.DataError("value too long")
+        self.rows.append(record)
+
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.connection
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquire()
+
+
+def _record(i: int) -> tuple:
+    return (None, None, f"/api/v1/{i}", "GET", 200, None, 0, 1, None, None, None)
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    connection = FakeConnection(copy_delay=0.05)
+    monkeypatch.setattr(audit.database, "pools", [FakePool(connection)])
+    return connection
+
+
+@pytest.mark.asyncio
+async def test_stop_during_a_flush_writes_every_record(connection):
+    writer = AuditLogWriter(buffer_size=1000, batch_size=10, flush_interval=60)
+    await writer.start()
+    for i in range(25):
+        writer.record(_record(i))
+    await asyncio.sleep(0.01)  # the loop is now inside the first COPY
+
+    await writer.stop()
+
+    assert writer.stats() == {"buffered": 0, "written": 25, "dropped": 0}
+    assert len(connection.rows) == 25
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_puts_its_batch_back(connection):
+    writer = AuditLogWriter(buffer_size=1000, batch_size=10, flush_interval=60)
+    for i in range(15):
+        writer.record(_record(i))
+
+    flush = asyncio.create_task(writer.flush())
+    await asyncio.sleep(0.01)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+    assert [record[2] for record in writer.buffer] == [f"/api/v1/{i}" for i in range(15)]
+    assert writer.written == 0 and writer.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_rejected_record_is_dropped_and_the_rest_written(monkeypatch):
+    connection = FakeConnection(reject_endpoint="/api/v1/3")
+    monkeypatch.setattr(audit.database, "pools", [FakePool(connection)])
+    writer = AuditLogWriter(buffer_size=1000, batch_size=10, flush_interval=60)
+    for i in range(10):
+        writer.record(_record(i))
+
+    assert await writer.flush()
+
+    assert writer.stats() == {"buffered": 0, "written": 9, "dropped": 1}
+
+
+def test_full_buffer_counts_dropped_records():
+    writer = AuditLogWriter(buffer_size=5, batch_size=100, flush_interval=60)
+    for i in range(8):
+        writer.record(_record(i))
+
+    assert writer.stats() == {"buffered": 5, "written": 0, "dropped": 3}
@@ -0,0 +1,123 @@
+"""
+decode_compact_reading must accept and reject the same readings as
+GlucoseReadingCreate (for correctly typed values; the compact format is
+strict about types by design)
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.compact import (
+    SIGNAL_QUALITY_CODES,
+    ReadingValidationError,
+    decode_compact_reading,
+    encode_compact_reading,
+)
+from app.schemas.glucose import GlucoseReadingCreate
+
+NOW = datetime.now(timezone.utc)
+
+VALID = {
+    "deviceId": "ARGUS_001234",
+    "userId": "user_5678",
+    "timestamp": (NOW - timedelta(minutes=10)).isoformat(),
+    "glucoseValue": 120,
+    "confidence": 0.95,
+    "sensorData": {"red": 1250.5, "infrared": 980.2, "green": 1100.8, "temperature": 36.5, "motionArtifact": False},
+    "batteryLevel": 85,
+    "signalQuality": "excellent",
+}
+
+# (position in the compact array, position within sensorData or None, value)
+CASES = {
+    "valid": (None, None, None),
+    "device_id_empty": (0, None, ""),
+    "device_id_max_length": (0, None, "d" * 50),
+    "device_id_too_long": (0, None, "d" * 51),
+    "user_id_too_long": (1, None, "u" * 51),
+    "timestamp_nan": (2, None, math.nan),
+    "timestamp_inf": (2, None, math.inf),
+    "timestamp_future": (2, None, (NOW + timedelta(hours=1)).timestamp()),
+    "timestamp_too_old": (2, None, (NOW - timedelta(hours=73)).timestamp()),
+    "glucose_min": (3, None, 40),
+    "glucose_max": (3, None, 400),
+    "glucose_too_low": (3, None, 39),
+    "glucose_too_high": (3, None, 401),
+    "confidence_zero": (4, None, 0),
+    "confidence_one": (4, None, 1000),
+    "confidence_above_one": (4, None, 1001),
+    "confidence_negative": (4, None, -1),
+    "red_nan": (5, 0, math.nan),
+    "red_inf": (5, 0, math.inf),
+    "red_negative": (5, 0, -0.5),
+    "green_negative_inf": (5, 2, -math.inf),
+    "temperature_nan": (5, 3, math.nan),
+    "temperature_inf": (5, 3, math.inf),
+    "temperature_too_low": (5, 3, 29.9),
+    "temperature_max": (5, 3, 45),
+    "battery_negative": (6, None, -1),
+    "battery_too_high": (6, None, 101),
+    "quality_poor": (7, None, 3),
+    "quality_unknown_code": (7, None, 4),
+    "quality_negative_code": (7, None, -1),
+}
+
+
+def _compact(case):
+    index, sensor_index, value = CASES[case]
+    item = encode_compact_reading(VALID)
+    if sensor_index is not None:
+        item[index][sensor_index] = value
+    elif index is not None:
+        item[index] = value
+    return item
+
+
+def _as_json(item):
+    """The JSON body a client would send for the same values"""
+    device_id, user_id, timestamp, glucose, confidence, sensor, battery, quality = item
+    return {
+        "deviceId": device_id,
+        "userId": user_id,
+        # Pydantic reads numbers as epoch seconds, so NaN/inf reach its own checks
+        "timestamp": timestamp,
+        "glucoseValue": glucose,
+        "confidence": confidence / 1000,
+        "sensorData": dict(zip(["red", "infrared", "green", "temperature", "motionArtifact"], sensor)),
+        "batteryLevel": battery,
+        "signalQuality": SIGNAL_QUALITY_CODES[quality].value if 0 <= quality < len(SIGNAL_QUALITY_CODES) else quality,
+    }
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_compact_matches_model_validation(case):
+    item = _compact(case)
+    try:
+        expected = GlucoseReadingCreate(**_as_json(item))
+    except ValidationError as e:
+        expected = None
+        expected_locs = {tuple(error["loc"]) for error in e.errors()}
+
+    if expected is None:
+        with pytest.raises(ReadingValidationError) as excinfo:
+            decode_compact_reading(item)
+        assert {tuple(error["loc"][1:]) for error in excinfo.value.errors} == expected_locs
+    else:
+        decoded = decode_compact_reading(item)
+        assert decoded.model_dump() == expected.model_dump()
+
+
+@pytest.mark.parametrize("item", [
+    [],
+    ["ARGUS_001234", "user_5678"],
+    encode_compact_reading(VALID) + [0],
+    encode_compact_reading(VALID)[:5] + [[1250.5, 980.2, 1100.8, 36.5]] + encode_compact_reading(VALID)[6:],
+    encode_compact_reading(VALID)[:5] + [[1250.5, 980.2, 1100.8, 36.5, False, 0]] + encode_compact_reading(VALID)[6:],
+    "not a reading",
+])
+def test_compact_rejects_wrong_array_lengths(item):
+    with pytest.raises(ReadingValidationError) as excinfo:
+        decode_compact_reading(item)
+    assert excinfo.value.errors[0]["type"] == "list_type"
@@ -0,0 +1,82 @@
+"""
+The streamed export pages through readings with keyset queries and gives the
+connection back to the pool before each page is sent, so a slow client never
+holds one
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.database import ShardRouter, database
+from app.services import export
+
+START = datetime(2024, 1, 1)
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetch(self, query, user_ids, start, end, after_user, after_timestamp, after_device, limit):
+        after = (after_user, after_timestamp, after_device)
+        rows = [
+            row for row in self.pool.rows
+            if row[0] in user_ids and start <= row[2] < end and (row[0], row[2], row[1]) > after
+        ]
+        rows.sort(key=lambda row: (row[0], row[2], row[1]))
+        self.pool.queries += 1
+        return [Record(row) for row in rows[:limit]]
+
+
+class Record(tuple):
+    KEYS = ("user_id", "device_id", "timestamp")
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self.KEYS.index(key)
+        return tuple.__getitem__(self, key)
+
+
+class FakeAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def __aenter__(self):
+        self.pool.in_use += 1
+        return FakeConnection(self.pool)
+
+    async def __aexit__(self, *exc):
+        self.pool.in_use -= 1
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.in_use = 0
+        self.queries = 0
+
+    def acquire(self):
+        return FakeAcquire(self)
+
+
+def reading(user_id, device_id, minutes):
+    return (user_id, device_id, START + timedelta(minutes=minutes), 100.0, 0.9,
+            1.0, 1.0, 1.0, 36.5, False, 80, "good")
+
+
+@pytest.mark.asyncio
+async def test_pages_release_the_connection_and_cover_every_row(monkeypatch):
+    # Two devices of one user share timestamps, so the key needs device_id
+    rows = [reading("user_a", device, minute) for minute in range(5) for device in ("dev_1", "dev_2")]
+    rows += [reading("user_b", "dev_3", minute) for minute in range(4)]
+    pool = FakePool(rows)
+    monkeypatch.setattr(database, "router", ShardRouter(1, 128))
+    monkeypatch.setattr(database, "pools", [pool])
+
+    exported = []
+    async for batch in export.iter_sharded_batches(["user_a", "user_b"], START, START + timedelta(days=1), 3):
+        assert pool.in_use == 0
+        exported.extend(zip(*(column.to_pylist() for column in batch.columns[:3])))
+
+    assert exported == sorted(((row[0], row[1], row[2]) for row in rows), key=lambda row: (row[0], row[2], row[1]))
+    assert pool.queries == 5
@@ -0,0 +1,78 @@
+"""
+The streaming JSON parser skips records it cannot parse, reports where they
+are, and carries on with the rest of the file
+"""
+import io
+import json
+
+import pytest
+
+from app.tools import import_readings
+from app.tools.import_readings import MalformedRecord, iter_json_objects
+
+
+def _reading(i: int) -> dict:
+    return {"deviceId": f"ARGUS_{i}", "userId": "user_1", "glucoseValue": 100 + i}
+
+
+def _parse(text: str, chunk_size: int = 64) -> list:
+    return list(iter_json_objects(io.StringIO(text), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", [16, 64, 1 << 16])
+def test_valid_array_and_ndjson_parse_across_chunk_boundaries(chunk_size):
+    readings = [_reading(i) for i in range(50)]
+
+    assert _parse(json.dumps(readings, indent=2), chunk_size) == readings
+    assert _parse("\n".join(json.dumps(reading) for reading in readings), chunk_size) == readings
+
+
+@pytest.mark.parametrize("chunk_size", [16, 64, 1 << 16])
+def test_malformed_ndjson_record_is_skipped(chunk_size):
+    lines = [json.dumps(_reading(i)) for i in range(6)]
+    lines[2] = '{"deviceId": "ARGUS_2", "userId": "user_1", "glucoseValue": 1O2}'
+    lines[4] = '{"deviceId": "ARGUS_4", "userId": "user_1", "glucoseValue": 104'  # never closed
+
+    parsed = _parse("\n".join(lines) + "\n", chunk_size)
+
+    assert [item for item in parsed if isinstance(item, dict)] == [_reading(i) for i in (0, 1, 3, 5)]
+    malformed = [item for item in parsed if isinstance(item, MalformedRecord)]
+    assert [record.line for record in malformed] == [3, 5]
+    assert malformed[0].text == lines[2]
+
+
+def test_malformed_record_in_pretty_printed_array_is_skipped():
+    text = json.dumps([_reading(i) for i in range(4)], indent=2)
+    broken = text.replace('"ARGUS_1",', '"ARGUS_1"', 1)  # missing comma
+
+    parsed = _parse(broken)
+
+    assert [item for item in parsed if isinstance(item, dict)] == [_reading(i) for i in (0, 2, 3)]
+    (malformed,) = [item for item in parsed if isinstance(item, MalformedRecord)]
+    assert broken.splitlines()[malformed.line - 1].strip() == "{"
+
+
+def test_unterminated_string_does_not_swallow_the_file(monkeypatch):
+    monkeypatch.setattr(import_readings, "MAX_RECORD_CHARS", 500)
+    lines = [json.dumps(_reading(i)) for i in range(200)]
+    lines[10] = '{"deviceId": "ARGUS_10, "userId": "user_1"}'
+
+    parsed = _parse("\n".join(lines), chunk_size=128)
+
+    assert len([item for item in parsed if isinstance(item, dict)]) == 199
+    assert [item.line for item in parsed if isinstance(item, MalformedRecord)] == [11]
+
+
+@pytest.mark.asyncio
+async def test_importer_counts_malformed_records_and_keeps_going(tmp_path):
+    path = tmp_path / "readings.json"
+    path.write_text('{"deviceId": "A", oops}\n{"deviceId": "B"}\n')
+    errors = io.StringIO()
+    importer = import_readings.ReadingImporter(errors_file=errors, dry_run=True)
+
+    summary = await importer.run(str(path))
+
+    assert (summary["parsed"], summary["invalid"], summary["malformed"]) == (2, 2, 1)
+    first, second = [json.loads(line) for line in errors.getvalue().splitlines()]
+    assert first["row"] == 1 and first["error"].startswith("malformed JSON at line 1:")
+    assert second["row"] == 2 and "validation error" in second["error"]
@@ -0,0 +1,125 @@
+"""
+Slow query profiler: stored plans must not keep query values, pool acquires
+are timed through the public Pool API, and admin operations need the admin key
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.core import auth
+from app.core.query_profiler import ProfiledPool, QueryProfiler, plan_without_values
+from app.main import app
+
+PLAN = {
+    "Node Type": "Nested Loop",
+    "Join Type": "Inner",
+    "Total Cost": 42.5,
+    "Actual Rows": 3,
+    "Join Filter": "(r.user_id = 'user_5678'::text)",
+    "Output": ["r.glucose_value", "'user_5678'::text"],
+    "Plans": [
+        {
+            "Node Type": "Index Scan",
+            "Relation Name": "glucose_readings",
+            "Index Name": "idx_glucose_readings_user_timestamp",
+            "Index Cond": "((user_id)::text = 'user_5678'::text)",
+            "Filter": "(glucose_value > 180)",
+            "Shared Hit Blocks": 12,
+        },
+        {"Node Type": "Sort", "Sort Key": ["r.timestamp DESC"], "Sort Method": "quicksort", "Actual Rows": 3},
+    ],
+}
+
+
+def test_plan_without_values_keeps_shape_and_numbers_only():
+    kept = plan_without_values(PLAN)
+
+    assert "user_5678" not in repr(kept) and "180" not in repr(kept)
+    assert kept == {
+        "Node Type": "Nested Loop",
+        "Join Type": "Inner",
+        "Total Cost": 42.5,
+        "Actual Rows": 3,
+        "Plans": [
+            {"Node Type": "Index Scan", "Relation Name": "glucose_readings",
+             "Index Name": "idx_glucose_readings_user_timestamp", "Shared Hit Blocks": 12},
+            {"Node Type": "Sort", "Sort Method": "quicksort", "Actual Rows": 3},
+        ],
+    }
+
+
+class FakeConnection:
+    async def fetchval(self, query, *args):
+        return f"{query} {args}"
+
+
+class FakePool:
+    """The part of asyncpg.Pool's public API that ProfiledPool uses"""
+
+    def __init__(self):
+        self.idle = [FakeConnection()]
+        self.released = []
+
+    async def acquire(self, timeout=None):
+        await asyncio.sleep(0.01)
+        return self.idle.pop()
+
+    async def release(self, connection):
+        self.released.append(connection)
+        self.idle.append(connection)
+
+    def get_size(self):
+        return 1
+
+
+def _profiler() -> QueryProfiler:
+    return QueryProfiler(threshold_ms=100, explain_sample_rate=0, explain_interval=60,
+                         explain_timeout=5, report_size=10)
+
+
+@pytest.mark.asyncio
+async def test_profiled_pool_times_acquires_and_releases():
+    profiler = _profiler()
+    fake = FakePool()
+    pool = ProfiledPool(fake, profiler)
+
+    async with pool.acquire() as connection:
+        assert isinstance(connection, FakeConnection)
+    assert await pool.fetchval("SELECT $1", 1) == "SELECT $1 (1,)"
+
+    assert profiler.acquires == 2
+    assert min(profiler.acquire_wait_ms) >= 5
+    assert len(fake.released) == 2 and len(fake.idle) == 1
+    assert pool.get_size() == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("configured", ["", auth.DEFAULT_ADMIN_API_KEY])
+async def test_admin_endpoints_refuse_the_default_key(monkeypatch, configured):
+    monkeypatch.setattr(auth.settings, "admin_api_key", configured)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await auth.verify_admin_key(configured)
+    assert excinfo.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_admin_key_is_checked_once_configured(monkeypatch):
+    monkeypatch.setattr(auth.settings, "admin_api_key", "s3cret-admin-key")
+
+    assert await auth.verify_admin_key("s3cret-admin-key") == "s3cret-admin-key"
+    with pytest.raises(HTTPException) as excinfo:
+        await auth.verify_admin_key("wrong")
+    assert excinfo.value.status_code == 403
+
+
+def test_cohort_refresh_needs_the_admin_key(monkeypatch):
+    monkeypatch.setattr(auth.settings, "admin_api_key", "s3cret-admin-key")
+    client = TestClient(app)
+
+    response = client.post("/api/v1/analytics/cohort/refresh", headers={"Authorization": "Bearer user-token"})
+    assert response.status_code == 401
+    response = client.post("/api/v1/analytics/cohort/refresh", headers={"X-Admin-Key": "wrong"})
+    assert response.status_code == 403
@@ -0,0 +1,98 @@
+"""
+Appending a shard to the hash ring must only move users to the new shard,
+and only about 1/N of them; rebalance_shards must copy their rows column by
+column name
+"""
+import pytest
+
+from app.core.database import ShardRouter
+from app.tools.rebalance_shards import copy_table
+
+USERS = [f"user_{i}" for i in range(20000)]
+VIRTUAL_NODES = 128  # the DB_SHARD_VIRTUAL_NODES default
+
+
+@pytest.mark.parametrize("shard_count", [1, 2, 3, 4, 7])
+def test_appending_a_shard_moves_users_only_to_it(shard_count):
+    before = ShardRouter(shard_count, VIRTUAL_NODES)
+    after = ShardRouter(shard_count + 1, VIRTUAL_NODES)
+
+    moved = [user for user in USERS if before.shard_for(user) != after.shard_for(user)]
+
+    assert all(after.shard_for(user) == shard_count for user in moved)
+    expected = len(USERS) / (shard_count + 1)
+    assert abs(len(moved) - expected) < 0.15 * expected
+
+
+@pytest.mark.parametrize("shard_count", [2, 4])
+def test_users_spread_evenly(shard_count):
+    groups = ShardRouter(shard_count, VIRTUAL_NODES).group(USERS)
+
+    assert sorted(groups) == list(range(shard_count))
+    expected = len(USERS) / shard_count
+    assert all(abs(len(users) - expected) < 0.15 * expected for users in groups.values())
+
+
+def test_group_keeps_order_within_shard():
+    router = ShardRouter(3, VIRTUAL_NODES)
+    for shard, users in router.group(USERS).items():
+        assert users == [user for user in USERS if router.shard_for(user) == shard]
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, n):
+        rows, self.rows = self.rows[:n], self.rows[n:]
+        return rows
+
+
+class FakeShard:
+    """Connection to a shard whose device_battery_info has the given column order"""
+
+    def __init__(self, columns, rows=()):
+        self.columns = columns
+        self.rows = list(rows)
+        self.statements = []
+        self.copied = []
+
+    async def fetch(self, query, table):
+        return [{"column_name": column} for column in self.columns]
+
+    async def cursor(self, query, *args, prefetch):
+        self.statements.append(query)
+        return FakeCursor(self.rows)
+
+    async def execute(self, query):
+        self.statements.append(query)
+        return "INSERT 0 2" if query.startswith("INSERT") else "OK"
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        self.copied.append((table, columns, records))
+
+
+@pytest.mark.asyncio
+async def test_copy_names_columns_when_shards_order_them_differently():
+    # Upgraded shard: reported_at appended by ALTER TABLE; fresh shard: mid-table
+    source = FakeShard(["id", "device_id", "battery_level", "reported_at"], rows=[(1, "A", 80, None), (2, "B", 70, None)])
+    target = FakeShard(["id", "device_id", "reported_at", "battery_level"])
+
+    copied = await copy_table(source, target, "device_battery_info", "TRUE", ["user_1"], chunk_size=1)
+
+    assert copied == 2
+    assert source.statements == ['SELECT "id", "device_id", "battery_level", "reported_at" FROM device_battery_info WHERE TRUE']
+    assert [columns for _, columns, _ in target.copied] == [source.columns, source.columns]
+    assert target.statements[-1] == (
+        'INSERT INTO device_battery_info ("id", "device_id", "battery_level", "reported_at") '
+        'SELECT "id", "device_id", "battery_level", "reported_at" FROM rebalance_device_battery_info ON CONFLICT DO NOTHING'
+    )
+
+
+@pytest.mark.asyncio
+async def test_copy_refuses_a_target_without_the_column():
+    source = FakeShard(["id", "device_id", "battery_level", "reported_at"])
+    target = FakeShard(["id", "device_id", "battery_level"])
+
+    with pytest.raises(RuntimeError, match="reported_at"):
+        await copy_table(source, target, "device_battery_info", "TRUE", ["user_1"], chunk_size=100)
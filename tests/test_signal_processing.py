@@ -0,0 +1,83 @@
+"""
+filter_series (bulk reprocessing) must produce the same filtered values as
+SignalProcessor (live ingest) for the same device history
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.schemas.glucose import GlucoseReadingCreate
+from app.services.signal_processing import CalibrationCache, SignalProcessor, filter_series
+
+TEMPERATURE_OFFSET = -0.5
+
+
+def _readings(device_id: str, start: datetime):
+    """A day-like series with noise, motion, a cold sensor, a duplicate and a long gap"""
+    rng = np.random.default_rng(7)
+    readings = []
+    timestamp = start
+    for i in range(120):
+        if i == 60:
+            timestamp += timedelta(minutes=settings.filter_max_gap_minutes + 5)
+        elif i != 30:  # reading 30 repeats the previous timestamp
+            timestamp += timedelta(minutes=5)
+        readings.append(GlucoseReadingCreate(
+            deviceId=device_id,
+            userId="user_1",
+            timestamp=timestamp,
+            glucoseValue=int(np.clip(140 + 40 * np.sin(i / 12) + rng.normal(0, 8), 40, 400)),
+            confidence=round(float(rng.uniform(0.4, 1.0)), 3),
+            sensorData={"red": 1250.5, "infrared": 980.2, "green": 1100.8,
+                        "temperature": 31.0 if i % 17 == 0 else 36.5, "motionArtifact": i % 11 == 0},
+            batteryLevel=80,
+            signalQuality="good",
+        ))
+    return readings
+
+
+def _processor(device_ids) -> SignalProcessor:
+    # Redis is not connected in tests, so filter state stays in SignalProcessor.states
+    calibration = CalibrationCache(ttl=3600)
+    calibration.entries = {device_id: (time.monotonic(), TEMPERATURE_OFFSET) for device_id in device_ids}
+    return SignalProcessor(calibration, max_gap_minutes=settings.filter_max_gap_minutes)
+
+
+def _vectorized(readings):
+    return filter_series(
+        np.array([reading.timestamp for reading in readings], dtype="datetime64[us]"),
+        np.array([reading.glucoseValue for reading in readings], dtype=np.float64),
+        np.array([reading.confidence for reading in readings], dtype=np.float64),
+        np.array([reading.sensorData.motionArtifact for reading in readings], dtype=bool),
+        np.array([reading.sensorData.temperature for reading in readings], dtype=np.float64) + TEMPERATURE_OFFSET,
+        settings.filter_max_gap_minutes,
+    )
+
+
+@pytest.mark.asyncio
+async def test_vectorized_filter_matches_scalar_filter():
+    readings = _readings("ARGUS_1", datetime.utcnow() - timedelta(hours=24))
+    processor = _processor(["ARGUS_1"])
+
+    scalar = [(await processor.process(reading)).filtered_value for reading in readings]
+
+    np.testing.assert_allclose(_vectorized(readings), scalar, rtol=1e-9)
+
+
+@pytest.mark.asyncio
+async def test_devices_of_one_user_are_filtered_separately():
+    start = datetime.utcnow() - timedelta(hours=24)
+    first = _readings("ARGUS_1", start)
+    second = _readings("ARGUS_2", start + timedelta(minutes=2))
+    processor = _processor(["ARGUS_1", "ARGUS_2"])
+
+    interleaved = sorted(first + second, key=lambda reading: reading.timestamp)
+    filtered = {}
+    for reading in interleaved:
+        filtered.setdefault(reading.deviceId, []).append((await processor.process(reading)).filtered_value)
+
+    np.testing.assert_allclose(filtered["ARGUS_1"], _vectorized(first), rtol=1e-9)
+    np.testing.assert_allclose(filtered["ARGUS_2"], _vectorized(second), rtol=1e-9)
@@ -0,0 +1,70 @@
+"""
+Hot statements are prepared on every connection a pool opens, at startup and
+when it grows later
+"""
+import pytest
+
+import app.api.glucose  # noqa: F401  registers the hot read queries
+from app.core import database as database_module
+from app.core.database import database
+from app.services.warmup import cache_warmer
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+        self.query_loggers = []
+
+    async def fetch(self, query, *args):
+        self.queries.append(query)
+        return []
+
+    def add_query_logger(self, logger):
+        self.query_loggers.append(logger)
+
+
+class FakePool:
+    """Opens connections the way asyncpg.Pool does: init runs once on each new one"""
+
+    def __init__(self, min_size, init):
+        self.min_size = min_size
+        self.init = init
+        self.connections = []
+
+    async def open_connection(self):
+        connection = FakeConnection()
+        if self.init is not None:
+            await self.init(connection)
+        self.connections.append(connection)
+        return connection
+
+
+@pytest.fixture
+def fake_create_pool(monkeypatch):
+    async def create_pool(*, min_size, init=None, **kwargs):
+        pool = FakePool(min_size, init)
+        for _ in range(min_size):
+            await pool.open_connection()
+        return pool
+
+    monkeypatch.setattr(database_module.asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(cache_warmer, "prepared", 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("profiling", [False, True])
+async def test_every_new_pool_connection_is_prepared(monkeypatch, fake_create_pool, profiling):
+    monkeypatch.setattr(database_module.settings, "query_profiling_enabled", profiling)
+    monkeypatch.setattr(database_module.settings, "db_pool_min_size", 3)
+    statements = [query for query, _ in cache_warmer.statements]
+    assert cache_warmer.prepare_connection in database.connection_init
+    assert len(statements) == 5
+
+    pool = await database._create_pool(0, max_size=10)
+    await pool.open_connection()  # the pool grows after startup
+
+    assert len(pool.connections) == 4
+    for connection in pool.connections:
+        assert connection.queries == statements
+        assert len(connection.query_loggers) == (1 if profiling else 0)
+    assert cache_warmer.prepared == 4 * len(statements)